@@ -1,27 +1,22 @@
 import streamlit as st
 import pandas as pd
-import imaplib
-import email
-from email.header import decode_header
-from email.utils import parsedate_to_datetime
 import io
-import re
-import json
+import zipfile
 import time 
+import os
+import shutil
+import csv
+import uuid
+import weakref
 from datetime import datetime, timedelta
 from urllib.parse import urlparse, parse_qsl
-
-# To prevent crashes if these aren't installed yet
-try:
-    from pypdf import PdfReader
-    import docx
-    from O365 import Account
-    from openai import OpenAI
-    import google.generativeai as genai
-    import anthropic
-    from supabase import create_client, Client
-except ImportError:
-    pass
+from scan_engine import (ENGINE_LIMITS, CACHE_DIR, BLOB_DIR, BlobStore, ScanProgress, engine_family, get_timedelta,
+                         sweep_blob_dirs, get_extraction_cache, get_result_blob_store, drive_scan, export_row,
+                         run_gmail_scan, run_outlook_scan, run_sharded_scan, rerank, RERANK_TOP, SHARD_DAYS, SHARD_CONNECTIONS)
+from scan_metrics import STAGES, to_json, to_prometheus
+from candidate_index import get_candidate_index
+from matching import RoleMatcher, experience_years
+from job_queue import ScanJobs
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="Auto Recruiter: Enterprise", layout="wide")
@@ -30,6 +25,7 @@ st.set_page_config(page_title="Auto Recruiter: Enterprise", layout="wide")
 @st.cache_resource
 def init_supabase():
     try:
+        from supabase import create_client
         url = st.secrets["SUPABASE_URL"]
         key = st.secrets["SUPABASE_KEY"]
         return create_client(url, key)
@@ -203,6 +199,7 @@ with st.sidebar:
     st.success(f"👤 {st.session_state.user_email}")
     if st.button("🚪 Log Out", use_container_width=True):
         supabase.auth.sign_out()
+        if "blob_store" in st.session_state: st.session_state.blob_store.cleanup(); del st.session_state.blob_store
         st.session_state.authenticated = False
         st.session_state.user_email = ""
         st.rerun()
@@ -222,6 +219,17 @@ with st.sidebar:
         client_id = st.text_input("Client ID (Azure)")
         client_secret = st.text_input("Client Secret (Azure)", type="password")
 
+    with st.expander("📬 More Mailboxes & Folders"):
+        sharded = st.checkbox("Parallel sharded scan", help="Scans several inboxes and folders at once, with long windows split into date slices. 'Only new since last scan' does not apply.")
+        if provider == "Gmail (Personal/App Password)":
+            extra_boxes = st.text_area("Other Gmail inboxes", placeholder="address app-password (one per line)", disabled=not sharded)
+            folders = st.text_input("Folders", "INBOX", help="Comma-separated, e.g. INBOX, Recruiting", disabled=not sharded)
+        else:
+            extra_boxes = st.text_area("Shared mailboxes", placeholder="jobs@company.com (one per line)", disabled=not sharded)
+            folders = st.text_input("Folders", "Inbox", help="Comma-separated folder names", disabled=not sharded)
+        shard_days = st.number_input("Days per shard", 0, 90, SHARD_DAYS, disabled=not sharded, help="0 keeps the window whole")
+        shard_connections = st.slider("Parallel connections", 1, 8, SHARD_CONNECTIONS, disabled=not sharded)
+
     st.header("2. Settings")
     filter_type = st.radio("Time Filter Type:", ["Recent Window", "Specific Date Range"])
     
@@ -244,8 +252,19 @@ with st.sidebar:
         with c1: start_date = st.date_input("From Date", value=datetime.today() - timedelta(days=7))
         with c2: end_date = st.date_input("To Date", value=datetime.today())
     
+    only_new = st.checkbox("Only new since last scan", help="Skips emails already processed by an earlier scan of this inbox.")
+    
     st.header("3. Job Description")
-    jd = st.text_area("JD for Ranking:", height=150, placeholder="Paste JD here (e.g. Python, AWS, 5+ years...)")
+    jd = st.text_area("JD for Ranking:", height=150, placeholder="Paste JD here (e.g. Python, AWS, 5+ years...)",
+                      help="Screening for several roles? Separate their JDs with a line of --- and start each with the role's name.")
+    triage_mode = st.radio("AI Budget:", ["Send every resume to AI", "Only top local matches to AI", "Local score only (no AI)"], help="Resumes are first scored locally against the JD by skill, title and experience overlap.")
+    triage = {"mode": "all"}
+    if triage_mode.startswith("Only top"):
+        triage = {"mode": "top", "top_k": st.number_input("Send top K resumes:", 1, 10000, 50), "min_score": st.slider("Minimum local score:", 0, 100, 0)}
+    elif triage_mode.startswith("Local"):
+        triage = {"mode": "local"}
+    rerank_top = st.number_input("AI re-rank of top matches:", 0, 50, 0, help="After the scan, the AI re-scores this many of the best matches per role from their extracted profiles. 0 = off.")
+    if rerank_top: triage["rerank_top"] = rerank_top
 
     st.header("4. AI Brain (LLM)")
     ai_choice = st.radio("Select AI Engine:", [
@@ -265,207 +284,150 @@ with st.sidebar:
             st.markdown("1. Go to [OpenAI Platform](https://platform.openai.com/api-keys).\n2. Create secret key.")
             
     api_key = st.text_input(f"Paste your Key here:", type="password")
+    ai_workers = st.slider("Parallel AI Calls:", 1, 16, ENGINE_LIMITS[engine_family(ai_choice)]["workers"])
+    ai_batch = st.slider("Resumes per AI Request:", 1, 10, 1, help="Above 1, several resumes share one prompt so the JD and instructions are only sent once.")
+    in_background = st.checkbox("Run as background job", help="Queues the scan for a worker (`python cli.py worker`) instead of running it in this tab.")
+    watch_inbox = st.checkbox("Keep watching for new resumes", disabled=not in_background or sharded,
+                              help="The worker stays on this inbox and scores resumes as they arrive, until stopped under Background Jobs. The date range is ignored.")
 
 st.title("🏢 Auto Recruiter: Dashboard")
 
-def get_timedelta(selection):
-    val = int(selection.split()[0])
-    unit = selection.split()[1].lower()
-    if "minute" in unit: return timedelta(minutes=val)
-    elif "hour" in unit: return timedelta(hours=val)
-    elif "day" in unit: return timedelta(days=val)
-    elif "week" in unit: return timedelta(weeks=val)
-    elif "month" in unit: return timedelta(days=val * 30)
-    return timedelta(days=1)
-
-def extract_details(text, jd_text, key, ai_engine):
-    if key:
-        prompt = f"""
-        You are an expert IT Recruiter. Extract candidate details from the following resume text.
-        Job Description: {jd_text if jd_text else 'None provided.'}
-        Resume Text: {text[:6000]} 
-        Respond STRICTLY with a valid JSON object containing exactly these keys. Do not include markdown formatting or any other text.
-        {{
-            "Name": "candidate full name or N/A",
-            "Email": "email or N/A",
-            "Phone": "phone or N/A",
-            "Experience": "calculate total years, e.g. 7 Years, or N/A",
-            "Skills": "comma-separated list of top 5 skills, or N/A",
-            "Match": integer from 0 to 100 representing JD fit
-        }}
-        """
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                if "Claude" in ai_engine:
-                    client = anthropic.Anthropic(api_key=key)
-                    response = client.messages.create(
-                        model="claude-3-5-sonnet-20241022", max_tokens=1000, temperature=0,
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                    raw_text = response.content[0].text.strip()
-                    if raw_text.startswith("```json"): raw_text = raw_text[7:-3].strip()
-                    data = json.loads(raw_text)
-
-                elif "Gemini" in ai_engine:
-                    genai.configure(api_key=key)
-                    model = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"})
-                    response = model.generate_content(prompt)
-                    data = json.loads(response.text)
-                else:
-                    client = OpenAI(api_key=key)
-                    response = client.chat.completions.create(
-                        model="gpt-4o-mini", messages=[{"role": "user", "content": prompt}], response_format={ "type": "json_object" } 
-                    )
-                    data = json.loads(response.choices[0].message.content)
-                
-                return {
-                    "Name": data.get("Name", "N/A"),
-                    "Email": data.get("Email", "N/A"),
-                    "Phone": data.get("Phone", "N/A"),
-                    "Experience": str(data.get("Experience", "N/A")),
-                    "Skills": str(data.get("Skills", "N/A")),
-                    "Match %": int(data.get("Match", 0) or data.get("Match %", 0)) 
-                }
-            except Exception as e:
-                error_msg = str(e).lower()
-                if "429" in error_msg and attempt < max_retries - 1:
-                    st.toast(f"Speed Limit hit! Taking a breather... (Attempt {attempt+1}/{max_retries})")
-                    time.sleep(10)
-                    continue 
-                else:
-                    st.toast(f"AI Error: {e}")
-                    break 
-
-    details = {"Name": "N/A", "Phone": "N/A", "Email": "N/A", "Experience": "N/A", "Skills": "N/A", "Match %": 0}
-    phone_pattern = r'[\+\(]?[1-9][0-9 .\-\(\)]{8,}[0-9]'
-    phones = re.findall(phone_pattern, text)
-    if phones:
-        valid_phones = [p for p in phones if len(re.sub(r'\D', '', p)) > 9]
-        if valid_phones: details["Phone"] = valid_phones[0]
-    email_pattern = r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+'
-    emails = re.findall(email_pattern, text)
-    if emails: 
-        details["Email"] = emails[0]; details["Name"] = emails[0].split('@')[0]
-    exp_pattern = r'(\d+)\+?\s*years?'
-    exps = re.findall(exp_pattern, text.lower())
-    if exps:
-        try: details["Experience"] = f"{max([int(x) for x in exps])} Years"
-        except: pass
-    return details
-
-def read_file_content(file_bytes, filename):
-    try:
-        if filename.lower().endswith(".pdf"):
-            pdf = PdfReader(io.BytesIO(file_bytes))
-            return " ".join([page.extract_text() for page in pdf.pages])
-        elif filename.lower().endswith(".docx"):
-            doc = docx.Document(io.BytesIO(file_bytes))
-            return "\n".join([para.text for para in doc.paragraphs])
-    except Exception as e: return f"DEBUG_ERROR: {str(e)}"
-    return ""
-
-def decode_fname(header_val):
-    if not header_val: return ""
-    decoded_list = decode_header(header_val)
-    filename = ""
-    for text, encoding in decoded_list:
-        if isinstance(text, bytes): filename += text.decode(encoding if encoding else "utf-8", errors="ignore")
-        else: filename += text
-    return filename
-
-def run_gmail_scan(user, password, start_dt, end_dt, jd_text, current_key, current_engine):
-    mail = imaplib.IMAP4_SSL("imap.gmail.com")
-    try: mail.login(user, password)
-    except Exception as e: return [], f"Login Failed: {e}"
-
-    mail.select("INBOX")
-    imap_after = (start_dt - timedelta(days=1)).strftime("%Y/%m/%d")
-    imap_before = (end_dt + timedelta(days=2)).strftime("%Y/%m/%d")
-    search_cmd = f'(X-GM-RAW "(filename:pdf OR filename:docx) after:{imap_after} before:{imap_before}")'
-    typ, data = mail.search(None, search_cmd)
-    
-    if not data[0]: return [], "No resumes found."
+# --- ATTACHMENT STORE ---
+def get_blob_store():
+    # One store per browser session, deleted when Streamlit drops the session state
+    if "blob_store" not in st.session_state:
+        sweep_blob_dirs()
+        store = BlobStore(os.path.join(BLOB_DIR, uuid.uuid4().hex))
+        weakref.finalize(store, shutil.rmtree, store.root, True)
+        st.session_state.blob_store = store
+    return st.session_state.blob_store
 
-    email_ids = data[0].split()
-    candidates = []
-    
-    bar = st.progress(0)
-    for idx, num in enumerate(reversed(email_ids)):
-        bar.progress((idx + 1) / len(email_ids))
-        _, msg_data = mail.fetch(num, "(RFC822)")
-        for response_part in msg_data:
-            if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
-                msg_date_header = msg.get("Date")
-                if msg_date_header:
-                    try:
-                        msg_date = parsedate_to_datetime(msg_date_header).replace(tzinfo=None)
-                        if msg_date < start_dt or msg_date > end_dt: continue 
-                    except: pass
-                
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        if "attachment" in part.get("Content-Disposition", ""):
-                            fname = part.get_filename()
-                            if fname and fname.lower().endswith(('.pdf', '.docx')):
-                                filename = decode_fname(fname)
-                                content = read_file_content(part.get_payload(decode=True), filename)
-                                if len(content) > 20:
-                                    meta = extract_details(content, jd_text, current_key, current_engine)
-                                    candidates.append({
-                                        "Name": meta.get("Name", "Candidate"), "Email": meta.get("Email", "N/A"),
-                                        "Phone": meta.get("Phone", "N/A"), "Experience": meta.get("Experience", "N/A"),
-                                        "Skills": meta.get("Skills", "N/A"), "Match %": meta.get("Match %", 0),
-                                        "Filename": filename, "Bytes": part.get_payload(decode=True)
-                                    })
-    mail.logout()
-    return candidates, "Success"
-
-def run_outlook_scan(account_obj, start_dt, end_dt, jd_text, current_key, current_engine):
-    if not account_obj.is_authenticated: return [], "Please authenticate with Outlook first."
-    inbox = account_obj.mailbox().inbox_folder()
-    messages = inbox.get_messages(limit=2000) 
-    candidates = []
-    processed = 0
-    status_text = st.empty()
-    
-    for msg in messages:
-        processed += 1
-        if processed % 25 == 0: status_text.write(f"Scanning Inbox: Checked {processed} emails...")
-        msg_date = getattr(msg, 'received', getattr(msg, 'created', None))
-        if msg_date:
-            msg_date = msg_date.replace(tzinfo=None)
-            if msg_date < start_dt or msg_date > end_dt: continue 
-                
-        if getattr(msg, 'has_attachments', False):
-            try: msg.attachments.download_attachments()
-            except: pass 
-            for att in msg.attachments:
-                if att.name and att.name.lower().endswith(('.pdf', '.docx')):
-                    file_bytes = getattr(att, 'content', None)
-                    if file_bytes:
-                        if isinstance(file_bytes, str): file_bytes = file_bytes.encode('utf-8', errors='ignore')
-                        content = read_file_content(file_bytes, att.name)
-                        if len(content) > 5: 
-                            meta = extract_details(content, jd_text, current_key, current_engine)
-                            candidates.append({
-                                "Name": meta.get("Name", "Candidate"), "Email": meta.get("Email", "N/A"),
-                                "Phone": meta.get("Phone", "N/A"), "Experience": meta.get("Experience", "N/A"),
-                                "Skills": meta.get("Skills", "N/A"), "Match %": meta.get("Match %", 0),
-                                "Filename": att.name, "Bytes": file_bytes
-                            })
-                            
-    status_text.empty()
-    if len(candidates) == 0: return [], f"Done! Scanned {processed} emails, but found 0 resumes."
-    return candidates, "Success"
+def results_blob_store():
+    # Results loaded from a background job keep their files in the shared results store
+    return get_result_blob_store() if st.session_state.get("results_job") else get_blob_store()
+
+def read_resume(handle):
+    # Index results can point at this session's files or a worker's; same hash, same bytes
+    for store in (results_blob_store(), get_result_blob_store(), get_blob_store()):
+        try: return store.read(handle)
+        except FileNotFoundError: continue
+    raise FileNotFoundError(handle)
+
+@st.cache_resource
+def get_scan_jobs():
+    return ScanJobs()
+
+# --- LIVE SCAN VIEW ---
+SCAN_DIR = os.path.join(CACHE_DIR, "scans")
+SCAN_CSV_MAX_AGE = 7 * 24 * 3600
+
+class DashboardProgress(ScanProgress):
+    def __init__(self, cands, writer, f):
+        self.cands, self.writer, self.file = cands, writer, f
+        self.stage_box, self.table = st.container(), st.empty()
+        self.bars, self.last_draw = {}, 0.0
+        self.shards, self.shard_table, self.last_shard_draw = {}, None, 0.0
+
+    def draw(self):
+        live_df = pd.DataFrame([export_row(c) for c in self.cands]).sort_values("Score (%)", ascending=False)
+        self.table.dataframe(live_df, hide_index=True, use_container_width=True)
+
+    def on_candidate(self, candidate):
+        self.cands.append(candidate)
+        self.writer.writerow(export_row(candidate)); self.file.flush()
+        if time.monotonic() - self.last_draw > 0.5:
+            self.draw(); self.last_draw = time.monotonic()
+
+    def on_progress(self, stage, done, total):
+        if stage not in self.bars: self.bars[stage] = self.stage_box.empty()
+        if total: self.bars[stage].progress(min(done / total, 1.0), text=f"{stage}: {done}/{total}")
+        else: self.bars[stage].caption(f"{stage}: {done}")
+
+    def on_notice(self, message): st.toast(message)
+    def on_error(self, message): st.warning(message)
+    def on_status(self, status): st.session_state.scan_status = status
+    def on_metrics(self, snapshot): st.session_state.scan_metrics = snapshot
+
+    def on_shard(self, label, state, found, detail):
+        self.shards[label] = {"Shard": label, "State": state, "Attachments": found, "Detail": detail}
+        if state == "running" and time.monotonic() - self.last_shard_draw < 0.5: return
+        if self.shard_table is None: self.shard_table = self.stage_box.empty()
+        self.shard_table.dataframe(pd.DataFrame(list(self.shards.values())), hide_index=True, use_container_width=True)
+        self.last_shard_draw = time.monotonic()
+
+    def close(self):
+        self.table.empty()
+        for bar in self.bars.values(): bar.empty()
+        if self.shard_table is not None: self.shard_table.empty()
+
+def sync_candidate_index():
+    # Optional mirror of the local index in Supabase; enable with SUPABASE_SYNC_CANDIDATES in secrets
+    try: enabled = supabase is not None and bool(st.secrets.get("SUPABASE_SYNC_CANDIDATES", False))
+    except Exception: enabled = False
+    if not enabled: return
+    try: pushed = get_candidate_index().sync(supabase, st.session_state.user_email)
+    except Exception as e:
+        st.toast(f"Supabase sync failed: {e}")
+        return
+    if pushed: st.toast(f"☁️ Synced {pushed} candidates to Supabase")
+
+def render_scan(events):
+    # Candidates land in session_state (and a running CSV) the moment they are scored, so a
+    # cancelled rerun or a crash still leaves the partial results behind.
+    os.makedirs(SCAN_DIR, exist_ok=True)
+    for name in os.listdir(SCAN_DIR):
+        path = os.path.join(SCAN_DIR, name)
+        if os.path.getmtime(path) < time.time() - SCAN_CSV_MAX_AGE: os.remove(path)
+    st.session_state.scanned_candidates, st.session_state.results_job, st.session_state.scan_metrics = [], None, None
+    st.session_state.scan_status = "Scan interrupted - showing partial results."
+    st.session_state.pop("rank_note", None)
+    st.session_state.scan_csv = os.path.join(SCAN_DIR, f"candidates_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}.csv")
+    with open(st.session_state.scan_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(export_row({})))
+        writer.writeheader()
+        progress = DashboardProgress(st.session_state.scanned_candidates, writer, f)
+        try: drive_scan(events, progress)
+        except Exception as e:
+            st.session_state.scan_status = f"Scan interrupted: {e}"
+    progress.close()
+    sync_candidate_index()
+
+def sharded_mailboxes():
+    # JSON-safe, so the same list can be queued; the signed-in inbox comes first
+    folder_list = [f.strip() for f in folders.split(",") if f.strip()]
+    lines = [line.strip().partition(" ") for line in extra_boxes.splitlines() if line.strip()]
+    if provider == "Gmail (Personal/App Password)":
+        return [{"provider": "gmail", "user": email_user, "password": email_pass, "folders": folder_list}] + \
+               [{"provider": "gmail", "user": address, "password": password.replace(" ", ""), "folders": folder_list} for address, _, password in lines]
+    return [{"provider": "outlook", "resource": None, "folders": folder_list}] + [{"provider": "outlook", "resource": address, "folders": folder_list} for address, _, _ in lines]
+
+# --- RESULTS GRID ---
+GRID_COLUMNS = ["Score (%)", "Name", "Phone", "Email", "Skills", "Experience", "Resume", "Copies"]
+ROLE_BEST = "Best match"
+
+def zip_resumes(cands):
+    # Stored, not deflated: PDF and DOCX payloads are already compressed
+    buf, seen = io.BytesIO(), set()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+        for c in cands:
+            name, n = c['Filename'], 1
+            stem, ext = os.path.splitext(name)
+            while name in seen:
+                n += 1
+                name = f"{stem} ({n}){ext}"
+            seen.add(name)
+            try: zf.writestr(name, read_resume(c['Blob']))
+            except FileNotFoundError: continue
+    return buf.getvalue()
 
 is_ready_to_scan = True
 outlook_account = None
 
 if provider == "Outlook / Office 365 (Corporate)":
     if client_id and client_secret:
-        if "o365_account" not in st.session_state: st.session_state.o365_account = Account((client_id, client_secret))
+        if "o365_account" not in st.session_state:
+            from O365 import Account
+            st.session_state.o365_account = Account((client_id, client_secret))
         outlook_account = st.session_state.o365_account
         
         if not outlook_account.is_authenticated:
@@ -497,42 +459,192 @@ if is_ready_to_scan:
             end_dt = datetime.combine(end_date, datetime.max.time())
             status_text = f"Mining Resumes from {start_date} to {end_date}..."
         
-        if provider == "Gmail (Personal/App Password)":
-            if not email_user or not email_pass: st.error("Credentials required in the sidebar.")
-            else:
-                with st.spinner(status_text):
-                    cands, stat = run_gmail_scan(email_user, email_pass, start_dt, end_dt, jd, api_key, ai_choice)
-                    st.session_state.scanned_candidates = cands; st.session_state.scan_status = stat
+        if provider == "Gmail (Personal/App Password)" and (not email_user or not email_pass): st.error("Credentials required in the sidebar.")
+        elif in_background:
+            # Same parameters the CLI queues; secrets stay in the queue only until a worker claims the job
+            params = {"start": start_dt.isoformat(), "end": end_dt.isoformat(), "jd": jd, "api_key": api_key, "engine": engine_family(ai_choice),
+                      "workers": ai_workers, "incremental": only_new, "triage": triage, "batch_size": ai_batch, "owner": st.session_state.user_email}
+            if watch_inbox and not sharded: params["watch"] = True
+            if sharded:
+                secrets = {} if provider == "Gmail (Personal/App Password)" else {"client_id": client_id, "client_secret": client_secret}
+                job_id = get_scan_jobs().enqueue("multi", {**params, **secrets, "mailboxes": sharded_mailboxes(), "shard_days": shard_days, "connections": shard_connections})
+            elif provider == "Gmail (Personal/App Password)": job_id = get_scan_jobs().enqueue("gmail", {**params, "user": email_user, "password": email_pass})
+            else: job_id = get_scan_jobs().enqueue("outlook", {**params, "client_id": client_id, "client_secret": client_secret})
+            st.success(f"🗂️ Queued job {job_id}. A worker (`python cli.py worker`) will pick it up - see Background Jobs below.")
+        elif sharded:
+            with st.spinner(status_text):
+                get_blob_store().clear()
+                boxes = [{**box, "account": outlook_account} if box["provider"] == "outlook" else box for box in sharded_mailboxes()]
+                render_scan(run_sharded_scan(boxes, start_dt, end_dt, jd, api_key, ai_choice, ai_workers, triage, ai_batch, store=get_blob_store(),
+                                             index=get_candidate_index().writer(st.session_state.user_email, jd), shard_days=shard_days, connections=shard_connections))
+        elif provider == "Gmail (Personal/App Password)":
+            with st.spinner(status_text):
+                get_blob_store().clear()
+                render_scan(run_gmail_scan(email_user, email_pass, start_dt, end_dt, jd, api_key, ai_choice, ai_workers, only_new, triage, ai_batch, store=get_blob_store(),
+                                           index=get_candidate_index().writer(st.session_state.user_email, jd)))
         elif provider == "Outlook / Office 365 (Corporate)":
             with st.spinner(status_text):
-                cands, stat = run_outlook_scan(outlook_account, start_dt, end_dt, jd, api_key, ai_choice)
-                st.session_state.scanned_candidates = cands; st.session_state.scan_status = stat
+                get_blob_store().clear()
+                render_scan(run_outlook_scan(outlook_account, start_dt, end_dt, jd, api_key, ai_choice, ai_workers, only_new, triage, ai_batch, store=get_blob_store(),
+                                             index=get_candidate_index().writer(st.session_state.user_email, jd)))
+
+# --- BACKGROUND JOBS ---
+recent_jobs = get_scan_jobs().recent(10)
+if recent_jobs:
+    with st.expander(f"🗂️ Background Jobs ({sum(j['status'] in ('queued', 'running', 'stopping') for j in recent_jobs)} active)"):
+        jobs_df = pd.DataFrame([{
+            "Job": j["id"], "Source": j["provider"] + (" (watch)" if j["watch"] else ""), "Status": j["status"], "Candidates": j["candidates"],
+            "Progress": " · ".join(f"{stage} {done}/{total}" if total else f"{stage} {done}" for stage, (done, total) in j["progress"].items()),
+            "Queued": datetime.fromtimestamp(j["created"]).strftime("%Y-%m-%d %H:%M"), "Message": j["message"] or ""
+        } for j in recent_jobs])
+        st.dataframe(jobs_df, hide_index=True, use_container_width=True)
+        j1, j2, _ = st.columns([2, 1, 1])
+        with j1: load_id = st.selectbox("Job results", [j["id"] for j in recent_jobs if j["candidates"]] or ["-"], label_visibility="collapsed")
+        with j2:
+            if st.button("📂 Load Results", use_container_width=True, disabled=load_id == "-"):
+                job = get_scan_jobs().get(load_id)
+                st.session_state.scanned_candidates = get_scan_jobs().results(load_id)
+                st.session_state.results_job = load_id
+                st.session_state.scan_metrics = get_scan_jobs().metrics(load_id)
+                st.session_state.scan_status = job["message"] or "Success"
+                st.session_state.pop("zip_bundle", None); st.session_state.pop("rank_note", None)
+                st.rerun()
+            if st.button("🔄 Refresh", use_container_width=True): st.rerun()
+        watching = [j["id"] for j in recent_jobs if j["watch"] and j["status"] == "running"]
+        if watching:
+            w1, w2, _ = st.columns([2, 1, 1])
+            with w1: stop_id = st.selectbox("Running watches", watching, label_visibility="collapsed")
+            with w2:
+                if st.button("⏹️ Stop Watch", use_container_width=True):
+                    get_scan_jobs().stop(stop_id)
+                    st.rerun()
+
+# --- CANDIDATE INDEX ---
+indexed = get_candidate_index().count(st.session_state.user_email)
+if indexed:
+    with st.expander(f"🔎 Search Past Candidates ({indexed} saved)"):
+        # Answered from the local index: no mailbox access and no AI calls
+        with st.form("index_search"):
+            s1, s2, s3, s4 = st.columns([3, 1, 1, 2])
+            with s1: index_terms = st.text_input("Skills or keywords (comma-separated, all required)")
+            with s2: index_years = st.number_input("Min Years", 0, 60, 0, key="index_years")
+            with s3: index_score = st.number_input("Min Score", 0, 100, 0, key="index_score")
+            with s4: index_dates = st.date_input("Received between", value=[], key="index_dates")
+            searched = st.form_submit_button("🔎 Search", use_container_width=True)
+        if searched:
+            since = datetime.combine(index_dates[0], datetime.min.time()) if len(index_dates) > 0 else None
+            until = datetime.combine(index_dates[1], datetime.max.time()) if len(index_dates) > 1 else None
+            found = get_candidate_index().search(st.session_state.user_email, index_terms.split(","), index_years, index_score, since, until)
+            st.session_state.scanned_candidates, st.session_state.results_job, st.session_state.scan_metrics = found, "index", None
+            st.session_state.scan_status = "Success" if found else "No saved candidates match that search."
+            st.session_state.pop("zip_bundle", None); st.session_state.pop("rank_note", None)
+            st.rerun()
+
+# --- SCAN DIAGNOSTICS ---
+if st.session_state.get("scan_metrics"):
+    snap = st.session_state.scan_metrics
+    with st.sidebar:
+        st.divider()
+        with st.expander("📈 Scan Diagnostics", expanded=False):
+            tokens = snap["tokens"]
+            st.caption(f"⏱️ {snap['elapsed_s']:.1f}s total · {sum(t['requests'] for t in tokens.values())} AI requests · ${snap['cost_usd']:.4f} est. cost")
+            st.dataframe(pd.DataFrame([{
+                "Stage": stage, "Calls": s["count"], "Total (s)": round(s["total_s"], 2), "p50 (ms)": round(s["p50_s"] * 1000, 1),
+                "p95 (ms)": round(s["p95_s"] * 1000, 1), "Max (ms)": round(s["max_s"] * 1000, 1)
+            } for stage, s in sorted(snap["stages"].items(), key=lambda x: -x[1]["total_s"])]), hide_index=True, use_container_width=True,
+                column_config={"Stage": st.column_config.TextColumn("Stage", help=" · ".join(f"{k}: {v}" for k, v in STAGES.items()))})
+            if snap["counters"]: st.dataframe(pd.DataFrame([{"Event": k, "Count": v} for k, v in sorted(snap["counters"].items())]), hide_index=True, use_container_width=True)
+            if tokens:
+                st.dataframe(pd.DataFrame([{"Engine": family, "Requests": t["requests"], "Input": t["input"], "Cached": t["cached"] + t["cache_write"],
+                                            "Output": t["output"], "Cost ($)": round(t["cost_usd"], 4)} for family, t in tokens.items()]), hide_index=True, use_container_width=True)
+            m1, m2 = st.columns(2)
+            with m1: st.download_button("JSON", data=to_json(snap), file_name="scan_metrics.json", mime="application/json", use_container_width=True)
+            with m2: st.download_button("Prometheus", data=to_prometheus(snap, {"job": st.session_state.get("results_job") or "dashboard"}), file_name="scan_metrics.prom", mime="text/plain", use_container_width=True)
 
 if "scanned_candidates" in st.session_state and st.session_state.scanned_candidates:
     display_cands = st.session_state.scanned_candidates
     display_cands.sort(key=lambda x: x.get("Match %", 0), reverse=True)
 
     top_col1, top_col2 = st.columns([3, 1])
-    with top_col1: st.success(f"✅ Found {len(display_cands)} Candidates")
+    with top_col1:
+        if st.session_state.get("scan_status", "Success") != "Success": st.info(st.session_state.scan_status)
+        st.success(f"✅ Found {len(display_cands)} Candidates")
+        if api_key:
+            cache = get_extraction_cache()
+            st.caption(f"♻️ Extraction cache: {cache.hits} hits · {cache.misses} misses · {cache.evictions} evicted")
     with top_col2:
-        export_df = pd.DataFrame([{"Score (%)": c.get('Match %', 0), "Name": c.get('Name', 'N/A'), "Phone": c.get('Phone', 'N/A'), "Email": c.get('Email', 'N/A'), "Experience": c.get('Experience', 'N/A'), "Skills": c.get('Skills', 'N/A')} for c in display_cands])
+        export_df = pd.DataFrame([export_row(c) for c in display_cands])
         st.download_button(label="📊 Download to Excel", data=export_df.to_csv(index=False).encode('utf-8'), file_name=f"candidates_{datetime.now().strftime('%Y%m%d')}.csv", mime="text/csv", use_container_width=True)
+
+    # Matching runs on the stored profiles, so a new or edited JD needs no AI calls and no mailbox
+    with st.expander("🎯 Re-rank Against a JD"):
+        with st.form("rerank_form"):
+            rank_jd = st.text_area("JD (separate several roles with a line of ---)", value=jd, height=150)
+            rank_ai = st.checkbox(f"AI second opinion on the top {RERANK_TOP} per role", disabled=not api_key)
+            ranked = st.form_submit_button("🎯 Re-rank", use_container_width=True)
+        if ranked:
+            matcher = RoleMatcher(rank_jd)
+            start = time.perf_counter()
+            matcher.apply(display_cands)
+            note = f"Re-ranked {len(display_cands)} candidates against {len(matcher.roles)} role(s) in {(time.perf_counter() - start) * 1000:.0f} ms"
+            if rank_ai and matcher:
+                with st.spinner("Asking the AI about the shortlist..."): note += f" · AI re-scored {rerank(display_cands, matcher, api_key, ai_choice, RERANK_TOP, st.toast)}"
+            st.session_state.rank_note = note
+            st.session_state.pop("zip_bundle", None)
+            st.rerun()
+        if st.session_state.get("rank_note"): st.caption(st.session_state.rank_note)
     st.divider()
 
-    h1, h2, h3, h4, h5, h6, h7 = st.columns([1, 1.5, 1.5, 2, 2, 1, 1])
-    h1.markdown("**Score**"); h2.markdown("**Name**"); h3.markdown("**Phone**"); h4.markdown("**Email**"); h5.markdown("**Skills**"); h6.markdown("**Exp**"); h7.markdown("**Resume**")
-    st.markdown("---")
-
-    for i, c in enumerate(display_cands):
-        col1, col2, col3, col4, col5, col6, col7 = st.columns([1, 1.5, 1.5, 2, 2, 1, 1])
-        with col1: st.write(f"**{c.get('Match %', 0)}%**")
-        with col2: st.write(c.get('Name', 'N/A'))
-        with col3: st.write(c.get('Phone', 'N/A'))
-        with col4: st.caption(c.get('Email', 'N/A'))
-        with col5: st.caption(c.get('Skills', 'N/A'))
-        with col6: st.write(c.get('Experience', 'N/A'))
-        with col7: st.download_button(label="📥 PDF", data=c['Bytes'], file_name=c['Filename'], mime="application/octet-stream", key=f"dl_{i}_{c['Filename']}")
-        st.markdown("<hr style='margin: 0px; opacity: 0.2;'>", unsafe_allow_html=True)
+    # One grid for the current page only; filtering, sorting and paging happen here on the server
+    grid_df = pd.DataFrame([{**export_row(c), "Resume": c.get('Filename', ''), "Copies": 1 + len(c.get('Duplicates', [])), "Role": c.get('Role', ''), "Row": i} for i, c in enumerate(display_cands)])
+    grid_df["Years"] = grid_df["Experience"].map(experience_years)
+    roles = list(dict.fromkeys(role for c in display_cands for role in c.get("Matches", {})))
+    columns = GRID_COLUMNS[:1] + ["Role"] + GRID_COLUMNS[1:] if roles else GRID_COLUMNS
+    if roles:
+        score_for = st.selectbox("Score for role", [ROLE_BEST] + roles)
+        if score_for != ROLE_BEST: grid_df["Score (%)"] = [c.get("Matches", {}).get(score_for, 0) for c in display_cands]
+
+    f1, f2, f3, f4, f5 = st.columns([1, 2, 1, 1.5, 1])
+    with f1: min_score = st.number_input("Min Score", 0, 100, 0)
+    with f2: skill_filter = st.text_input("Skills (comma-separated, all required)")
+    with f3: min_years = st.number_input("Min Years", 0, 60, 0)
+    with f4: sort_choice = st.selectbox("Sort By", ["Score (high-low)", "Score (low-high)", "Experience (high-low)", "Name (A-Z)"])
+    with f5: page_size = st.selectbox("Rows", [25, 50, 100, 250])
+
+    view = grid_df[(grid_df["Score (%)"] >= min_score) & (grid_df["Years"] >= min_years)]
+    for skill in [x.strip() for x in skill_filter.split(",") if x.strip()]:
+        view = view[view["Skills"].astype(str).str.contains(skill, case=False, regex=False)]
+    sort_col, ascending = {"Score (high-low)": ("Score (%)", False), "Score (low-high)": ("Score (%)", True), "Experience (high-low)": ("Years", False), "Name (A-Z)": ("Name", True)}[sort_choice]
+    view = view.sort_values(sort_col, ascending=ascending, kind="stable")
+
+    pages = max(1, -(-len(view) // page_size))
+    st.session_state.grid_page = min(st.session_state.get("grid_page", 1), pages)
+    p1, p2 = st.columns([1, 5])
+    with p1: page = st.number_input("Page", 1, pages, key="grid_page")
+    with p2: st.caption(f"Showing {min(len(view), (page - 1) * page_size + 1)}-{min(len(view), page * page_size)} of {len(view)} matching candidates")
+    page_df = view.iloc[(page - 1) * page_size: page * page_size]
+
+    grid = st.dataframe(
+        page_df[columns], hide_index=True, use_container_width=True,
+        on_select="rerun", selection_mode="multi-row", key=f"results_grid_{page}",
+        column_config={"Score (%)": st.column_config.ProgressColumn("Score", min_value=0, max_value=100, format="%d%%")}
+    )
+    chosen = [display_cands[int(page_df.iloc[r]["Row"])] for r in grid.selection.rows]
+
+    if chosen:
+        # Resume bytes are only read from disk for the rows the user selected
+        a1, a2, _ = st.columns([1, 1, 2])
+        if len(chosen) == 1:
+            with a1:
+                try: st.download_button(label="📥 Download Resume", data=read_resume(chosen[0]['Blob']), file_name=chosen[0]['Filename'], mime="application/octet-stream", use_container_width=True)
+                except FileNotFoundError: st.caption("Resume file expired - rescan to download.")
+        with a2:
+            bundle_key = tuple(c['Blob'] for c in chosen)
+            bundle = st.session_state.get("zip_bundle")
+            if bundle and bundle[0] == bundle_key:
+                st.download_button(label=f"💾 Save ZIP ({len(chosen)})", data=bundle[1], file_name=f"resumes_{datetime.now().strftime('%Y%m%d')}.zip", mime="application/zip", use_container_width=True)
+            elif st.button(f"📦 Download {len(chosen)} Selected as ZIP", use_container_width=True):
+                st.session_state.zip_bundle = (bundle_key, zip_resumes(chosen)); st.rerun()
 
 elif "scan_status" in st.session_state and st.session_state.scan_status != "Success":
     st.warning(st.session_state.scan_status)
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# Cold start: fresh-interpreter import time of the pipeline modules the dashboard loads.
+# Per call: call_llm against a local stub API (OPENAI_BASE_URL / ANTHROPIC_BASE_URL), counting
+# the TCP connections the SDK opens. Plain HTTP, so real TLS handshakes would widen the gap.
+#   python benchmarks/client_overhead.py --calls 200
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from fakes import LLMHandler, llm_server
+
+def cold_start(modules, runs):
+    code = f"import time; t = time.perf_counter(); import {', '.join(modules)}; print(time.perf_counter() - t)"
+    times = [float(subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout) for _ in range(runs)]
+    return statistics.median(times)
+
+def per_call(engine, calls, fresh_client):
+    import scan_engine
+    before = LLMHandler.connections
+    times = []
+    for _ in range(calls):
+        if fresh_client and hasattr(scan_engine, "get_llm_client"): scan_engine.get_llm_client.clear()
+        t = time.perf_counter()
+        scan_engine.call_llm("resume", "sk-test", engine)
+        times.append(time.perf_counter() - t)
+    return statistics.median(times) * 1000, sorted(times)[int(len(times) * 0.95)] * 1000, LLMHandler.connections - before
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"cold import scan_engine: {cold_start(['scan_engine'], args.runs) * 1000:.0f} ms (median of {args.runs})")
+    server = llm_server()
+    base = f"http://127.0.0.1:{server.server_port}"
+    os.environ["OPENAI_BASE_URL"], os.environ["ANTHROPIC_BASE_URL"] = f"{base}/v1", base
+    import scan_engine
+    scan_engine.ENGINE_LIMITS = {k: {**v, "rpm": 10 ** 9} for k, v in scan_engine.ENGINE_LIMITS.items()}
+    for engine in ("OpenAI", "Claude"):
+        per_call(engine, 5, False)
+        for label, fresh in (("new client per call", True), ("pooled client", False)):
+            p50, p95, conns = per_call(engine, args.calls, fresh)
+            print(f"{engine:<7} {label:<20} p50 {p50:6.2f} ms  p95 {p95:6.2f} ms  {conns} connections / {args.calls} calls")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import io
+import random
+import zipfile
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+# Deterministic synthetic mailbox: message i is rebuilt identically from (seed, i), so the server
+# process and the benchmark process agree on the corpus without ever shipping it between them.
+FIRST = "James Mary Robert Patricia John Jennifer Michael Linda David Elizabeth Priya Arjun Wei Mei Ahmed Fatima Carlos Sofia Olu Amara".split()
+LAST = "Smith Johnson Williams Brown Jones Garcia Miller Davis Patel Sharma Chen Wang Khan Ali Silva Santos Okafor Mensah Novak Kowalski".split()
+SKILLS = ("Python Java JavaScript TypeScript C++ C# .NET Golang SQL PostgreSQL MySQL MongoDB Redis Kafka Spark Airflow AWS Azure GCP "
+          "Docker Kubernetes Terraform Jenkins Git Linux React Angular Node.js Django Flask FastAPI Spring Boot Pandas NumPy PyTorch "
+          "TensorFlow Tableau Power BI Excel Salesforce SAP Agile Scrum Selenium").split()
+TITLES = ["Software Engineer", "Data Engineer", "Data Scientist", "DevOps Engineer", "Backend Developer", "Frontend Developer",
+          "QA Engineer", "Business Analyst", "Project Manager", "Cloud Engineer"]
+FILLER = ("designed built delivered led improved migrated automated maintained owned scaled reduced latency cost throughput "
+          "service platform pipeline dashboard team stakeholders customers release reliability monitoring features api "
+          "the a and with for across of to in on using").split()
+JD = "Backend Engineer with 5+ years of Python, Django, PostgreSQL, AWS, Docker and Kubernetes. Kafka and Terraform a plus."
+
+def resume_text(rng, pages):
+    name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+    lines = [name, f"{rng.choice(TITLES)}", f"{name.lower().replace(' ', '.')}{rng.randint(1, 999)}@example.com | +1 (555) {rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+             f"{rng.randint(1, 20)}+ years of experience. Skills: {', '.join(rng.sample(SKILLS, 8))}", ""]
+    year = 2024
+    for _ in range(pages * 6):
+        start = year - rng.randint(1, 4)
+        lines.append(f"{rng.choice(TITLES)}, Company {rng.randint(1, 5000)}  {start} - {year}")
+        for _ in range(4): lines.append(" ".join(rng.choice(SKILLS) if rng.random() < 0.1 else rng.choice(FILLER) for _ in range(rng.randint(8, 14))))
+        year = start
+    return lines
+
+def pdf_escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(lines, per_page=45):
+    # Smallest valid text PDF: one Helvetica content stream per page, with a correct xref table
+    pages = [lines[i:i + per_page] for i in range(0, len(lines), per_page)] or [[]]
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        body = "BT /F1 10 Tf 12 TL 50 770 Td " + " ".join(f"({pdf_escape(line)}) Tj T*" for line in page) + " ET"
+        stream = body.encode("latin-1", "replace")
+        objs.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objs.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objs))
+        kids.append(len(objs))
+    objs[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    out, offsets = io.BytesIO(), []
+    out.write(b"%PDF-1.4\n")
+    for n, obj in enumerate(objs, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (n, obj))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1))
+    for off in offsets: out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref))
+    return out.getvalue()
+
+DOCX_TYPES = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+              '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/><Default Extension="xml" ContentType="application/xml"/>'
+              '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+DOCX_RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+             '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/></Relationships>')
+
+def make_docx(lines):
+    paras = "".join(f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(line)}</w:t></w:r></w:p>" for line in lines)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", DOCX_TYPES)
+        zf.writestr("_rels/.rels", DOCX_RELS)
+        zf.writestr("word/document.xml", f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>{paras}</w:body></w:document>')
+    return buf.getvalue()
+
+def message(seed, i, now, attach_rate=0.7, resend_rate=0.05):
+    # {"uid", "date", "attachments": [(filename, content_type, bytes)]}; a few are re-sends of an
+    # earlier resume (same text, other format) so duplicate collapsing is exercised too
+    rng = random.Random(seed * 1_000_003 + i)
+    date = now - timedelta(days=rng.random() * 28, minutes=rng.randint(0, 1440))
+    attachments = []
+    if rng.random() < attach_rate:
+        for n in range(1 if rng.random() < 0.9 else 2):
+            src = i
+            if i > 10 and rng.random() < resend_rate: src = rng.randrange(i)
+            text = resume_text(random.Random(seed * 7_919 + src * 31 + n), pages=1 + random.Random(src).randint(0, 3))
+            if rng.random() < 0.6: attachments.append((f"resume_{src}_{n}.pdf", "application/pdf", make_pdf(text)))
+            else: attachments.append((f"resume_{src}_{n}.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", make_docx(text)))
+    return {"uid": i + 1, "date": date, "attachments": attachments}
+
+def mailbox(size, seed=7, now=None):
+    now = now or datetime.now().replace(microsecond=0)
+    return [message(seed, i, now) for i in range(size)]
@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import time
+import argparse
+import hashlib
+import imaplib
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from datetime import datetime, timedelta
+
+# End-to-end scan benchmark against a synthetic mailbox: a local IMAP server (Gmail path) and a
+# Graph stand-in (Outlook path) serve generated PDF/DOCX resumes, and stub LLM endpoints answer
+# with configurable latency and 429s; Gemini reaches its stub over the SDK's REST transport. Every (provider, size) runs in a fresh process so peak
+# memory and caches never leak between runs; the same seed always builds the same mailbox.
+#   python benchmarks/e2e.py --sizes 100,1000,10000 --json run.json
+#   python benchmarks/e2e.py --engine openai --llm-latency 0.8 --llm-429 0.02 --batch-size 5 --compare run.json
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+ENGINES = {"offline": None, "openai": "OpenAI", "claude": "Claude", "gemini": "Gemini"}
+PARSE_SAMPLE = 40
+
+def percentiles(values):
+    if not values: return {"n": 0}
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return {"n": len(values), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": values[-1] * 1000}
+
+def start_server(ctx, target, *args):
+    ready = ctx.Queue()
+    proc = ctx.Process(target=target, args=args + (ready,), daemon=True)
+    proc.start()
+    return proc, ready.get(timeout=600)
+
+def run_once(cfg):
+    # Child side: servers in their own processes, the scanner in this one
+    ctx = multiprocessing.get_context("spawn")
+    sys.path.insert(0, HERE)
+    import fakes, corpus
+    now = datetime.now().replace(microsecond=0)
+    t = time.perf_counter()
+    servers = []
+    proc, (imap_port, graph_port) = start_server(ctx, fakes.serve_mailbox, cfg["size"], cfg["seed"], now.isoformat(), cfg["imap_latency"], cfg["graph_latency"])
+    servers.append(proc)
+    setup = time.perf_counter() - t
+    engine = ENGINES[cfg["engine"]]
+    if engine:
+        proc, llm_port = start_server(ctx, fakes.serve_llm, cfg["llm_latency"], cfg["llm_jitter"], cfg["llm_429"], cfg["seed"])
+        servers.append(proc)
+        os.environ["OPENAI_BASE_URL"], os.environ["ANTHROPIC_BASE_URL"] = f"http://127.0.0.1:{llm_port}/v1", f"http://127.0.0.1:{llm_port}"
+    os.environ["RECRUITER_CACHE_DIR"] = tempfile.mkdtemp(prefix="recruiter-bench-")
+
+    import scan_engine
+    from doc_parser import read_file_content
+    for limits in scan_engine.ENGINE_LIMITS.values(): limits["rpm"] = cfg["rpm"] or 10 ** 9
+    scan_engine.imaplib.IMAP4_SSL = lambda host: imaplib.IMAP4("127.0.0.1", imap_port)
+    if engine == "Gemini":
+        import google.generativeai as genai
+        configure = genai.configure
+        genai.configure = lambda **kwargs: configure(**kwargs, transport="rest", client_options={"api_endpoint": f"http://127.0.0.1:{llm_port}"})
+
+    lock, stages, fetched, parsed = threading.Lock(), {"fetch": [], "plan": [], "extract": [], "llm": []}, {}, {}
+    def record(stage, seconds):
+        with lock: stages[stage].append(seconds)
+
+    def timed(stage, fn):
+        def wrapper(*args, **kwargs):
+            t = time.perf_counter()
+            try: return fn(*args, **kwargs)
+            finally: record(stage, time.perf_counter() - t)
+        return wrapper
+
+    fetch_imap = scan_engine.fetch_imap_attachments
+    def fetch_imap_attachments(mail, plan):
+        t = time.perf_counter()
+        for filename, data, received in fetch_imap(mail, plan):
+            done = time.perf_counter()
+            record("fetch", done - t)
+            fetched.setdefault(hashlib.sha256(data).hexdigest(), done)
+            yield filename, data, received
+            t = time.perf_counter()
+
+    fetch_outlook = scan_engine.outlook_resume_attachments
+    def outlook_resume_attachments(*args):
+        t = time.perf_counter()
+        found = fetch_outlook(*args)
+        done = time.perf_counter()
+        for _ in found: record("fetch", (done - t) / len(found))
+        for _, data, _ in found: fetched.setdefault(hashlib.sha256(data).hexdigest(), done)
+        return found
+
+    class TimedStore(scan_engine.BlobStore):
+        # put() runs right after a document's text comes back from the parse pool
+        def put(self, data):
+            handle = super().put(data)
+            parsed.setdefault(handle, time.perf_counter())
+            return handle
+
+    scan_engine.fetch_imap_attachments = fetch_imap_attachments
+    scan_engine.outlook_resume_attachments = outlook_resume_attachments
+    scan_engine.plan_imap_attachments = timed("plan", scan_engine.plan_imap_attachments)
+    scan_engine.extract_details = timed("extract", scan_engine.extract_details)
+    scan_engine.local_meta = timed("extract", scan_engine.local_meta)
+    scan_engine.call_llm = timed("llm", scan_engine.call_llm)
+    store = TimedStore(os.path.join(os.environ["RECRUITER_CACHE_DIR"], "bench-blobs"))
+
+    end_dt = now + timedelta(days=1)
+    start_dt = now - timedelta(days=31)
+    key = "sk-bench" if engine else None
+    options = (start_dt, end_dt, corpus.JD, key, engine or "OpenAI", cfg["workers"], False, {"mode": cfg["triage"]}, cfg["batch_size"])
+    if cfg["provider"] == "gmail": events = scan_engine.run_gmail_scan("bench@example.com", "secret", *options, store=store)
+    elif cfg["provider"] == "sharded":
+        # The Gmail path over a pool of IMAP connections, one shard per --shard-days slice
+        mailboxes = [{"provider": "gmail", "user": "bench@example.com", "password": "secret", "folders": ["INBOX"]}]
+        events = scan_engine.run_sharded_scan(mailboxes, start_dt, end_dt, *options[2:6], options[7], options[8], store=store, shard_days=cfg["shard_days"], connections=cfg["connections"])
+    else: events = scan_engine.run_outlook_scan(fakes.FakeAccount(graph_port), *options, store=store)
+
+    wall_start = time.perf_counter()
+    done_at, errors, notices, status, first, metrics = {}, [], 0, None, None, None
+    for event in events:
+        if event[0] == "candidate":
+            done_at.setdefault(event[1]["Blob"], time.perf_counter())
+            first = first or time.perf_counter() - wall_start
+        elif event[0] == "error": errors.append(event[1])
+        elif event[0] == "notice": notices += 1
+        elif event[0] == "status": status = event[1]
+        elif event[0] == "metrics": metrics = event[1]
+    wall = time.perf_counter() - wall_start
+    scan_engine.get_parse_pool().shutdown()
+    parse_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    e2e = [done_at[h] - fetched[h] for h in done_at if h in fetched]
+    parse_wait = [parsed[h] - fetched[h] for h in parsed if h in fetched]
+    # Parse cost on its own, without pool queueing: a fixed sample of the same corpus
+    sample = [a for i in range(min(cfg["size"], PARSE_SAMPLE * 2)) for a in corpus.message(cfg["seed"], i, now)["attachments"]][:PARSE_SAMPLE]
+    parse_cost = {}
+    for name, _, data in sample:
+        t = time.perf_counter()
+        read_file_content(data, name)
+        parse_cost.setdefault(name.rsplit(".", 1)[-1], []).append(time.perf_counter() - t)
+    for proc in servers: proc.terminate()
+
+    return {
+        "provider": cfg["provider"], "size": cfg["size"], "engine": cfg["engine"], "status": status, "errors": errors[:5], "notices": notices,
+        "resumes": len(done_at), "attachments": len(fetched), "wall_s": wall, "setup_s": setup, "first_candidate_s": first,
+        "messages_per_s": cfg["size"] / wall if wall else None, "resumes_per_s": len(done_at) / wall if wall else None,
+        "latency_ms": {"end_to_end": percentiles(e2e), "fetch": percentiles(stages["fetch"]), "fetch_to_parsed": percentiles(parse_wait),
+                       "extract": percentiles(stages["extract"]), "llm": percentiles(stages["llm"]), "plan": percentiles(stages["plan"]),
+                       **{f"parse_{ext}": percentiles(v) for ext, v in parse_cost.items()}},
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "parse_worker_peak_mb": parse_peak / 1024,
+        "scan_metrics": metrics,
+    }
+
+def fmt(value, spec=".1f"):
+    return format(value, spec) if isinstance(value, (int, float)) else "-"
+
+def report(results, baseline=None):
+    base = {(r["provider"], r["size"], r["engine"]): r for r in baseline or []}
+    print(f"{'provider':<8} {'msgs':>6} {'engine':<8} {'resumes':>7} {'wall s':>7} {'msg/s':>7} {'res/s':>7} {'e2e p50':>8} {'e2e p95':>8} {'fetch p50':>9} {'extract p50':>11} {'llm p95':>8} {'peak MB':>8}")
+    for r in results:
+        lat = r["latency_ms"]
+        print(f"{r['provider']:<8} {r['size']:>6} {r['engine']:<8} {r['resumes']:>7} {fmt(r['wall_s'], '.2f'):>7} {fmt(r['messages_per_s']):>7} {fmt(r['resumes_per_s']):>7} "
+              f"{fmt(lat['end_to_end'].get('p50')):>8} {fmt(lat['end_to_end'].get('p95')):>8} {fmt(lat['fetch'].get('p50'), '.2f'):>9} "
+              f"{fmt(lat['extract'].get('p50'), '.2f'):>11} {fmt(lat['llm'].get('p95')):>8} {fmt(r['peak_rss_mb'], '.0f'):>8}")
+        if r["errors"]: print(f"         errors: {r['errors']}")
+        old = base.get((r["provider"], r["size"], r["engine"]))
+        if old:
+            ratio = lambda new, was: f"{(new / was - 1) * 100:+.0f}%" if new and was else "-"
+            print(f"         vs baseline: res/s {ratio(r['resumes_per_s'], old['resumes_per_s'])}, e2e p95 {ratio(lat['end_to_end'].get('p95'), old['latency_ms']['end_to_end'].get('p95'))}, "
+                  f"peak MB {ratio(r['peak_rss_mb'], old['peak_rss_mb'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end scan benchmark on a synthetic mailbox")
+    parser.add_argument("--sizes", default="100,1000,10000", help="mailbox sizes (messages), comma separated")
+    parser.add_argument("--providers", default="gmail,outlook", help="gmail, outlook, sharded (Gmail over parallel date shards)")
+    parser.add_argument("--engine", choices=list(ENGINES), default="offline", help="offline, or a stubbed LLM API")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workers", type=int, help="parallel AI calls (default: the engine's limit)")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--triage", choices=["all", "top", "local"], default="all")
+    parser.add_argument("--rpm", type=int, default=0, help="requests/minute cap for the stub engine (default: uncapped)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM seconds per request")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-429", type=float, default=0.0, help="probability a stub LLM request is rate limited")
+    parser.add_argument("--imap-latency", type=float, default=0.005, help="seconds added to every IMAP command")
+    parser.add_argument("--graph-latency", type=float, default=0.02, help="seconds added to every Graph request")
+    parser.add_argument("--shard-days", type=int, default=7, help="days per shard for the sharded provider")
+    parser.add_argument("--connections", type=int, default=4, help="parallel IMAP connections for the sharded provider")
+    parser.add_argument("--json", help="write results (with the run's settings) to this file")
+    parser.add_argument("--compare", help="earlier --json output to compare against")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(run_once(json.loads(args.child))))
+        return
+
+    settings = {k: v for k, v in vars(args).items() if k not in ("json", "compare", "child", "sizes", "providers")}
+    results = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for provider in args.providers.split(","):
+            cfg = {**settings, "size": size, "provider": provider}
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(cfg)], cwd=ROOT, capture_output=True, text=True)
+            if out.returncode:
+                print(f"{provider} x{size} failed:\n{out.stderr[-2000:]}", file=sys.stderr)
+                continue
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+            print(f"{provider} x{size}: {results[-1]['wall_s']:.1f} s", file=sys.stderr)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: baseline = json.load(f)["results"]
+    report(results, baseline)
+    if args.json:
+        meta = {"python": platform.python_version(), "cpus": os.cpu_count(), "machine": platform.machine(), "when": datetime.now().isoformat(timespec="seconds")}
+        with open(args.json, "w", encoding="utf-8") as f: json.dump({"settings": settings, "environment": meta, "results": results}, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import re
+import json
+import socket
+import select
+import time
+import base64
+import random
+import socketserver
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import corpus
+
+# Local stand-ins for Gmail IMAP, Microsoft Graph and the LLM APIs. Each runs in its own process
+# so corpus memory and request handling do not count against the scanner being measured.
+
+# --- IMAP ---
+def imap_quote(value):
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def bodystructure(msg):
+    parts = ['("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 12 1 NIL NIL NIL NIL)']
+    for name, ctype, data in msg["attachments"]:
+        major, minor = ctype.split("/")
+        size = len(base64.b64encode(data))
+        parts.append(f'("{major}" "{minor}" ("name" {imap_quote(name)}) NIL NIL "base64" {size} NIL ("attachment" ("filename" {imap_quote(name)})) NIL NIL)')
+    return "(" + "".join(parts) + ' "mixed" ("boundary" "b1") NIL NIL NIL)'
+
+def uid_set(spec, uids):
+    found = []
+    for piece in spec.split(","):
+        lo, _, hi = piece.partition(":")
+        if not hi: found.append(int(lo))
+        else: found += [u for u in uids if u >= int(lo) and (hi == "*" or u <= int(hi))]
+    return found
+
+class IMAPHandler(socketserver.StreamRequestHandler):
+    # Just enough IMAP4rev1 for imaplib and the scanners: LOGIN, SELECT, UID SEARCH, UID FETCH, IDLE
+    def send(self, data):
+        self.wfile.write(data if isinstance(data, bytes) else data.encode())
+
+    def setup(self):
+        super().setup()
+        with self.server.lock: self.server.clients.add(self.connection)
+
+    def finish(self):
+        with self.server.lock: self.server.clients.discard(self.connection)
+        try: super().finish()
+        except OSError: pass
+
+    def handle(self):
+        try: self.serve()
+        except OSError: pass
+
+    def serve(self):
+        box, latency = self.server.box, self.server.latency
+        by_uid, known = {m["uid"]: m for m in box}, len(box)
+        self.send("* OK IMAP4rev1 stand-in ready\r\n")
+        while True:
+            line = self.rfile.readline()
+            if not line: return
+            tag, _, rest = line.decode().strip().partition(" ")
+            cmd = rest.split(" ", 1)[0].upper()
+            if latency: time.sleep(latency)
+            if len(by_uid) != len(box): by_uid = {m["uid"]: m for m in box}
+            if cmd == "CAPABILITY": self.send(f"* CAPABILITY IMAP4rev1 X-GM-EXT-1\r\n{tag} OK done\r\n")
+            elif cmd == "LOGIN": self.send(f"{tag} OK logged in\r\n")
+            elif cmd == "SELECT":
+                known = len(box)
+                self.send(f"* {len(box)} EXISTS\r\n* OK [UIDVALIDITY 1] ok\r\n* OK [UIDNEXT {len(box) + 1}] ok\r\n{tag} OK [READ-WRITE] done\r\n")
+            elif cmd == "IDLE":
+                # Reports new mail as "* n EXISTS" until the client sends DONE. Mail that arrived
+                # since the last report goes out in the same packet as the continuation, as
+                # servers often do, so the client finds it already buffered.
+                self.send("+ idling\r\n" + (f"* {len(box)} EXISTS\r\n" if len(box) > known else ""))
+                known = len(box)
+                while not select.select([self.connection], [], [], 0.02)[0]:
+                    if len(box) > known:
+                        known = len(box)
+                        self.send(f"* {known} EXISTS\r\n")
+                if not self.rfile.readline(): return
+                self.send(f"{tag} OK IDLE terminated\r\n")
+            elif cmd == "LOGOUT":
+                self.send(f"* BYE\r\n{tag} OK bye\r\n")
+                return
+            elif cmd == "UID" and rest.split()[1].upper() == "SEARCH":
+                # X-GM-RAW is taken as "has a pdf/docx attachment" plus its after:/before: dates; a leading UID range is honoured
+                rng = re.search(r"UID (\d+):\*", rest)
+                after, before = (re.search(rf"{word}:(\d{{4}}/\d\d/\d\d)", rest) for word in ("after", "before"))
+                after, before = (datetime.strptime(m.group(1), "%Y/%m/%d").date() if m else None for m in (after, before))
+                hits = [m["uid"] for m in box if m["attachments"] and (not rng or m["uid"] >= int(rng.group(1)))
+                        and (not after or m["date"].date() >= after) and (not before or m["date"].date() < before)]
+                self.send(f"* SEARCH {' '.join(map(str, hits))}\r\n{tag} OK done\r\n")
+            elif cmd == "UID" and rest.split()[1].upper() == "FETCH":
+                _, _, spec, items = rest.split(" ", 3)
+                sections = re.findall(r"BODY\.PEEK\[([\d.]+)\]", items)
+                out = bytearray()
+                for uid in uid_set(spec, list(by_uid)):
+                    msg = by_uid.get(uid)
+                    if not msg: continue
+                    out += f"* {uid} FETCH (UID {uid}".encode()
+                    if "BODYSTRUCTURE" in items.upper():
+                        header = f"Date: {format_datetime(msg['date'])}\r\n\r\n".encode()
+                        out += f" BODYSTRUCTURE {bodystructure(msg)} BODY[HEADER.FIELDS (DATE)] {{{len(header)}}}\r\n".encode() + header
+                    for section in sections:
+                        idx = int(section.split(".")[0]) - 2
+                        payload = base64.encodebytes(msg["attachments"][idx][2]) if 0 <= idx < len(msg["attachments"]) else b""
+                        out += f" BODY[{section}] {{{len(payload)}}}\r\n".encode() + payload
+                    out += b")\r\n"
+                self.send(bytes(out) + f"{tag} OK done\r\n".encode())
+            else: self.send(f"{tag} BAD unsupported\r\n")
+
+class IMAPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = allow_reuse_address = True
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.lock, self.clients = threading.Lock(), set()
+
+    def drop_connections(self):
+        # What a network blip or a server-side timeout looks like to the client
+        with self.lock: clients = list(self.clients)
+        for conn in clients:
+            try: conn.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
+
+# --- MICROSOFT GRAPH ---
+class GraphHandler(BaseHTTPRequestHandler):
+    # /me/messages pages, /me/messages/{id}/attachments listings, /$value downloads and an inbox
+    # delta query whose link hands out messages added since it was issued
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+
+    def reply(self, body, ctype="application/json"):
+        if not isinstance(body, bytes): body = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.server.latency: time.sleep(self.server.latency)
+        box, url = self.server.box, urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if parts[-1] == "me": return self.reply({"id": "bench-user", "userPrincipalName": "bench@example.com"})
+        if parts[-1] == "delta":
+            since = parse_qs(url.query).get("since")
+            page = [{"id": str(m["uid"]), "receivedDateTime": m["date"].astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                     "hasAttachments": bool(m["attachments"])} for m in box[int(since[0]):]] if since else []
+            return self.reply({"value": page, "@odata.deltaLink": f"http://{self.headers['Host']}{url.path}?since={len(box)}"})
+        if parts[-1] == "messages":
+            q = parse_qs(url.query)
+            skip, top = int(q.get("skip", ["0"])[0]), int(q.get("top", ["50"])[0])
+            page = [{"id": str(m["uid"]), "receivedDateTime": m["date"].astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                     "hasAttachments": bool(m["attachments"])} for m in box[skip:skip + top]]
+            return self.reply({"value": page, "more": skip + top < len(box)})
+        msg = box[int(parts[parts.index("messages") + 1]) - 1]
+        if parts[-1] == "attachments":
+            return self.reply({"value": [{"@odata.type": "#microsoft.graph.fileAttachment", "id": str(n), "name": name, "contentType": ctype, "size": len(data)}
+                                         for n, (name, ctype, data) in enumerate(msg["attachments"])]})
+        return self.reply(msg["attachments"][int(parts[-2])][2], "application/octet-stream")
+
+    def log_message(self, *args): pass
+
+class GraphServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+def mailbox_servers(box, imap_latency=0.0, graph_latency=0.0):
+    # IMAP and Graph stand-ins over one shared message list, on background threads
+    imap = IMAPServer(("127.0.0.1", 0), IMAPHandler)
+    graph = GraphServer(("127.0.0.1", 0), GraphHandler)
+    for server, latency in ((imap, imap_latency), (graph, graph_latency)):
+        server.box, server.latency = box, latency
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return imap, graph
+
+def deliver(box, seed, now=None):
+    # A new message with a fresh resume (never a re-send), as if it arrived just now
+    now = now or datetime.now().replace(microsecond=0)
+    msg = {**corpus.message(seed, len(box), now, attach_rate=1.0, resend_rate=0.0), "date": now}
+    box.append(msg)
+    return msg
+
+def serve_mailbox(size, seed, now_iso, imap_latency, graph_latency, ready):
+    imap, graph = mailbox_servers(corpus.mailbox(size, seed, datetime.fromisoformat(now_iso)), imap_latency, graph_latency)
+    ready.put((imap.server_address[1], graph.server_address[1]))
+    threading.Event().wait()
+
+# --- FAKE O365 ACCOUNT ---
+class FakeConnection:
+    # One keep-alive session per download thread, as O365's Connection would pool them
+    def __init__(self):
+        self.local = threading.local()
+
+    def get(self, url, params=None, headers=None):
+        import requests
+        if not hasattr(self.local, "session"): self.local.session = requests.Session()
+        resp = self.local.session.get(url, params=params, headers=headers)
+        resp.raise_for_status()
+        return resp
+
+class FakeQuery:
+    def __getattr__(self, name): return lambda *args, **kwargs: self
+
+class FakeMessage:
+    def __init__(self, item):
+        self.object_id = item["id"]
+        self.received = datetime.strptime(item["receivedDateTime"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).astimezone()
+        self.created = self.received
+        self.has_attachments = item["hasAttachments"]
+
+class FakeFolder:
+    _cloud_data_key = "__cloud_data__"
+
+    def __init__(self, account): self.account = account
+    def new_query(self): return FakeQuery()
+    def message_constructor(self, parent=None, **kwargs): return FakeMessage(kwargs[self._cloud_data_key])
+
+    def get_messages(self, limit=None, query=None, batch=50):
+        skip = 0
+        while True:
+            page = self.account.con.get(f"{self.account.protocol.service_url}me/messages", params={"skip": skip, "top": batch}).json()
+            for item in page["value"]: yield FakeMessage(item)
+            if not page["more"]: return
+            skip += batch
+
+class FakeMailbox:
+    # Every shared mailbox and folder serves the same corpus
+    def __init__(self, account): self.account = account
+    def inbox_folder(self): return FakeFolder(self.account)
+    def get_folder(self, folder_name=None): return FakeFolder(self.account)
+
+class FakeProtocol:
+    def __init__(self, base): self.service_url = base
+
+class FakeAccount:
+    # The slice of O365.Account that run_outlook_scan touches, backed by the Graph stand-in
+    is_authenticated = True
+
+    def __init__(self, port):
+        self.protocol, self.con = FakeProtocol(f"http://127.0.0.1:{port}/v1.0/"), FakeConnection()
+
+    def mailbox(self, resource=None): return FakeMailbox(self)
+
+# --- LLM PROVIDERS ---
+FIELDS = {"Name": "Stub Candidate", "Email": "stub@example.com", "Phone": "N/A", "Experience": "5 Years", "Skills": "Python, AWS", "Titles": "Backend Engineer"}
+
+class LLMHandler(BaseHTTPRequestHandler):
+    # OpenAI chat completions, Anthropic messages and Gemini generateContent (the SDK's REST
+    # transport) with configurable latency and 429s
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+    connections = 0
+
+    def setup(self):
+        LLMHandler.connections += 1
+        super().setup()
+
+    def reply(self, status, body, headers=()):
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in headers: self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        cfg = self.server.cfg
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if cfg["latency"]: time.sleep(max(0.0, random.gauss(cfg["latency"], cfg["jitter"])))
+        if random.random() < cfg["rate_429"]:
+            return self.reply(429, {"error": {"type": "rate_limit_error", "message": "Rate limit reached"}}, [("retry-after", str(cfg["retry_after"]))])
+        prompt = " ".join(m["content"] if isinstance(m.get("content"), str) else json.dumps(m.get("content")) for m in request.get("messages", []))
+        prompt += " ".join(p.get("text", "") for c in request.get("contents", []) + [request.get("systemInstruction") or {}] for p in c.get("parts", []))
+        # Resume batches get profiles back; re-rank requests (<candidate> tags) get scores
+        ids = re.findall(r'<resume id="(R\d+)">', prompt)
+        scored = re.findall(r'<candidate id="(C\d+)">', prompt)
+        if scored: content = json.dumps({"results": [{"id": i, "Match": random.randint(0, 100)} for i in scored]})
+        else: content = json.dumps({"results": [{"id": i, **FIELDS} for i in ids]} if ids else FIELDS)
+        if self.path.split("?")[0].endswith(":generateContent"):
+            return self.reply(200, {"candidates": [{"content": {"role": "model", "parts": [{"text": content}]}, "finishReason": "STOP", "index": 0}],
+                                    "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(content) // 4, "totalTokenCount": (len(prompt) + len(content)) // 4}})
+        if self.path.split("?")[0].endswith("/chat/completions"):
+            return self.reply(200, {"id": "c", "object": "chat.completion", "created": 0, "model": request.get("model", ""),
+                                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(prompt) + len(content)) // 4}})
+        return self.reply(200, {"id": "m", "type": "message", "role": "assistant", "model": request.get("model", ""), "content": [{"type": "text", "text": content}],
+                                "stop_reason": "end_turn", "usage": {"input_tokens": len(prompt) // 4, "output_tokens": len(content) // 4}})
+
+    def log_message(self, *args): pass
+
+def llm_server(latency=0.0, jitter=0.0, rate_429=0.0, retry_after=0.2):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LLMHandler)
+    server.daemon_threads = True
+    server.cfg = {"latency": latency, "jitter": jitter, "rate_429": rate_429, "retry_after": retry_after}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def serve_llm(latency, jitter, rate_429, seed, ready):
+    random.seed(seed)
+    ready.put(llm_server(latency, jitter, rate_429).server_address[1])
+    threading.Event().wait()
@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+# Single-core throughput of the offline extractor, and of JD scoring, on synthetic ~6000-char resumes (PROMPT_CHARS)
+#   python benchmarks/offline_throughput.py --docs 2000
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from offline_extract import get_offline_extractor, load_taxonomy
+from matching import RoleMatcher
+
+FILLER = "the a managed led built designed team project client delivered improved performance system data service platform using with and for in of".split()
+JD = "Backend Engineer, 5+ years of Python, Django, AWS, Kubernetes and PostgreSQL."
+
+def synthetic_resume(rng, aliases, chars=6000):
+    lines = ["John A Smith", "john.smith@example.com | +44 20 7946 0958"]
+    while sum(map(len, lines)) < chars:
+        lines.append(" ".join(rng.choice(aliases) if rng.random() < 0.08 else rng.choice(FILLER) for _ in range(14)) + ".")
+    lines.append("Acme Ltd 2015 - Present")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    args = parser.parse_args()
+    rng = random.Random(7)
+    aliases = [a for names in load_taxonomy()["skills"].values() for a in names]
+    docs = [synthetic_resume(rng, aliases) for _ in range(args.docs)]
+    extractor = get_offline_extractor()
+    extractor.extract(docs[0])
+    start = time.perf_counter()
+    metas = [extractor.extract(doc) for doc in docs]
+    elapsed = time.perf_counter() - start
+    print(f"{args.docs} resumes in {elapsed:.2f} s: {args.docs / elapsed:.0f} resumes/s, {elapsed / args.docs * 1000:.3f} ms each")
+    start = time.perf_counter()
+    RoleMatcher(JD).apply(metas)
+    print(f"Scored against the JD in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
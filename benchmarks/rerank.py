@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+# Re-ranking a finished scan: N extracted profiles scored against one JD, an edited JD and three
+# roles at once, then the optional AI second opinion on the top matches against a local stub API.
+#   python benchmarks/rerank.py --candidates 5000
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import corpus
+from fakes import llm_server
+
+ROLES = [corpus.JD,
+         "Data Scientist\n3+ years of Python, Pandas, NumPy, PyTorch and SQL. Tableau a plus.",
+         "Frontend Developer\nReact, TypeScript and Node.js; 2 years minimum."]
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return statistics.median(times) * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candidates", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="candidates per role for the AI re-rank")
+    args = parser.parse_args()
+    from offline_extract import get_offline_extractor
+    from matching import RoleMatcher
+    rng, extractor = random.Random(7), get_offline_extractor()
+    start = time.perf_counter()
+    cands = [{**extractor.extract("\n".join(corpus.resume_text(rng, 1))), "Filename": f"{i}.pdf"} for i in range(args.candidates)]
+    print(f"{args.candidates} profiles extracted offline in {time.perf_counter() - start:.2f} s (once per resume, whatever the JD)")
+    edited = corpus.JD.replace("5+ years", "8+ years").replace("Kafka", "Go")
+    for label, jd in (("one JD", corpus.JD), ("edited JD", edited), ("three roles, one pass", "\n---\n".join(ROLES))):
+        matcher = RoleMatcher(jd)
+        print(f"re-rank, {label:<22} {timed(lambda: matcher.apply(cands), args.runs):7.1f} ms (median of {args.runs})")
+
+    server = llm_server(latency=0.3)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    import scan_engine
+    scan_engine.ENGINE_LIMITS = {k: {**v, "rpm": 10 ** 9} for k, v in scan_engine.ENGINE_LIMITS.items()}
+    scan_engine.call_llm("warm-up", "sk-test", "OpenAI")
+    matcher = RoleMatcher("\n---\n".join(ROLES))
+    matcher.apply(cands)
+    start = time.perf_counter()
+    changed = scan_engine.rerank(cands, matcher, "sk-test", "OpenAI", args.top)
+    print(f"AI re-rank of the top {args.top} per role ({changed} candidates, 300 ms stub latency): {(time.perf_counter() - start) * 1000:.0f} ms")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
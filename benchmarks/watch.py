@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import imaplib
+import argparse
+import tempfile
+import threading
+
+# Continuous ingestion: resumes delivered to a watched inbox at a steady rate, timed from arrival
+# to scored candidate, for Gmail (IMAP IDLE) and Outlook (Graph delta polling). --drop-every cuts
+# every IMAP connection after that many deliveries to exercise reconnects.
+#   python benchmarks/watch.py --messages 100 --rate 5 --drop-every 40
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["RECRUITER_CACHE_DIR"] = tempfile.mkdtemp(prefix="recruiter-watch-")
+import corpus
+import fakes
+import scan_engine
+from fakes import llm_server
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else float("nan")
+
+class Arrivals(scan_engine.ScanProgress):
+    def __init__(self):
+        self.seen, self.ready, self.status, self.reconnects = {}, threading.Event(), None, 0
+    def on_candidate(self, candidate): self.seen.setdefault(candidate["Filename"], time.perf_counter())
+    def on_status(self, status): self.status = status
+    def on_progress(self, stage, done, total):
+        if stage == "Inbox checks": self.ready.set()
+        if stage == "Reconnects": self.reconnects += 1
+
+def run(provider, args, key, engine):
+    box = corpus.mailbox(args.backlog, args.seed)
+    imap, graph = fakes.mailbox_servers(box)
+    scan_engine.imaplib.IMAP4_SSL = lambda host: imaplib.IMAP4("127.0.0.1", imap.server_address[1])
+    stop = threading.Event()
+    if provider == "gmail": events = scan_engine.watch_gmail_inbox("watch@example.com", "secret", corpus.JD, key, engine, stop=stop)
+    else: events = scan_engine.watch_outlook_inbox(fakes.FakeAccount(graph.server_address[1]), corpus.JD, key, engine, stop=stop, poll=args.poll)
+    progress = Arrivals()
+    watcher = threading.Thread(target=scan_engine.drive_scan, args=(events, progress), daemon=True)
+    watcher.start()
+    progress.ready.wait(30)
+
+    delivered = {}
+    for i in range(args.messages):
+        for name, _, _ in fakes.deliver(box, args.seed)["attachments"]: delivered[name] = time.perf_counter()
+        if provider == "gmail" and args.drop_every and (i + 1) % args.drop_every == 0: imap.drop_connections()
+        time.sleep(1 / args.rate)
+    deadline = time.monotonic() + args.timeout
+    while len(progress.seen) < len(delivered) and time.monotonic() < deadline: time.sleep(0.05)
+    start = time.perf_counter()
+    stop.set()
+    watcher.join(args.timeout)
+    latency = [progress.seen[name] - t for name, t in delivered.items() if name in progress.seen]
+    print(f"{provider:<8} {len(latency):>4}/{len(delivered):<4} scored   arrival -> candidate p50 {percentile(latency, 0.5):7.0f} ms  "
+          f"p95 {percentile(latency, 0.95):7.0f} ms  max {percentile(latency, 1.0):7.0f} ms   reconnects {progress.reconnects}   "
+          f"stop {(time.perf_counter() - start) * 1000:.0f} ms ({progress.status})")
+    imap.shutdown(); graph.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--providers", default="gmail,outlook")
+    parser.add_argument("--messages", type=int, default=60, help="resumes delivered while watching")
+    parser.add_argument("--rate", type=float, default=5.0, help="deliveries per second")
+    parser.add_argument("--backlog", type=int, default=50, help="mail already in the inbox, which a new watch skips")
+    parser.add_argument("--poll", type=float, default=2.0, help="Outlook delta poll interval, seconds")
+    parser.add_argument("--drop-every", type=int, default=0, help="cut IMAP connections after every N deliveries")
+    parser.add_argument("--engine", choices=["offline", "openai"], default="offline")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    # Reconnects back off from a fraction of a second here, not the production 5 s
+    scan_engine.WATCH_BACKOFF = (0.2, 2.0)
+    key, engine = None, "OpenAI"
+    if args.engine == "openai":
+        server = llm_server(latency=args.llm_latency)
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+        scan_engine.ENGINE_LIMITS = {k: {**v, "rpm": 10 ** 9} for k, v in scan_engine.ENGINE_LIMITS.items()}
+        key = "sk-test"
+        scan_engine.call_llm("warm-up", key, engine)
+    for provider in args.providers.split(","): run(provider, args, key, engine)
+
+if __name__ == "__main__":
+    main()
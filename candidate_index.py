@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime, date
+from scan_engine import CACHE_DIR, shared
+from matching import experience_years
+
+# Every scored candidate, kept across scans and sessions so past results can be searched without
+# touching the mailbox. Rows are keyed by (owner, content hash of the resume file); a rescan of
+# the same file updates its row instead of adding another. Skills and resume text are indexed
+# with FTS5 where the SQLite build has it, and matched with LIKE where it does not.
+INDEX_DB = os.path.join(CACHE_DIR, "candidates.db")
+INDEX_BATCH = 100
+INDEX_TEXT_CHARS = 20000
+SEARCH_LIMIT = 2000
+SUPABASE_TABLE = "candidates"
+SYNC_BATCH = 500
+COLUMNS = ("owner", "hash", "name", "email", "phone", "experience", "years", "skills", "score", "filename", "duplicates", "received", "jd", "scanned", "profile", "text")
+
+def fts_query(terms):
+    # "kubernetes, c++" -> "kubernetes" AND "c++"; every term is a quoted phrase, so FTS syntax in user input is inert
+    return " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+class CandidateIndex:
+    def __init__(self, path=INDEX_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS candidates (owner TEXT NOT NULL, hash TEXT NOT NULL, name TEXT, email TEXT, phone TEXT,
+            experience TEXT, years REAL NOT NULL DEFAULT 0, skills TEXT, score INTEGER NOT NULL DEFAULT 0, filename TEXT, duplicates TEXT,
+            received TEXT, jd TEXT, scanned REAL NOT NULL, profile TEXT, text TEXT, synced REAL, PRIMARY KEY (owner, hash))""")
+        # The JD-independent profile lets saved candidates be re-ranked against a new JD; older indexes gain the column
+        try: self.db.execute("ALTER TABLE candidates ADD COLUMN profile TEXT")
+        except sqlite3.OperationalError: pass
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_candidates_score ON candidates(owner, score)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_candidates_received ON candidates(owner, received)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_candidates_synced ON candidates(synced)")
+        try:
+            # External-content FTS table kept in step by triggers; "+" and "#" stay inside tokens so c++ and c# are searchable
+            self.db.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS candidates_fts USING fts5(name, skills, text,
+                content='candidates', content_rowid='rowid', tokenize="unicode61 tokenchars '+#'")""")
+            self.db.execute("""CREATE TRIGGER IF NOT EXISTS candidates_ai AFTER INSERT ON candidates BEGIN
+                INSERT INTO candidates_fts(rowid, name, skills, text) VALUES (new.rowid, new.name, new.skills, new.text); END""")
+            self.db.execute("""CREATE TRIGGER IF NOT EXISTS candidates_ad AFTER DELETE ON candidates BEGIN
+                INSERT INTO candidates_fts(candidates_fts, rowid, name, skills, text) VALUES ('delete', old.rowid, old.name, old.skills, old.text); END""")
+            self.db.execute("""CREATE TRIGGER IF NOT EXISTS candidates_au AFTER UPDATE OF name, skills, text ON candidates BEGIN
+                INSERT INTO candidates_fts(candidates_fts, rowid, name, skills, text) VALUES ('delete', old.rowid, old.name, old.skills, old.text);
+                INSERT INTO candidates_fts(rowid, name, skills, text) VALUES (new.rowid, new.name, new.skills, new.text); END""")
+            self.fts = True
+        except sqlite3.OperationalError: self.fts = False
+        self.lock = threading.Lock()
+
+    def upsert(self, owner, entries, jd_text=""):
+        # entries: [(candidate, resume text)]; one transaction per batch
+        now, jd = time.time(), (jd_text or "")[:2000]
+        rows = []
+        for c, text in entries:
+            received = c.get("Received")
+            rows.append((owner, c["Blob"], c.get("Name"), c.get("Email"), c.get("Phone"), c.get("Experience"), experience_years(c.get("Experience")),
+                         c.get("Skills"), int(c.get("Match %") or 0), c.get("Filename"), json.dumps(c.get("Duplicates") or []),
+                         received.isoformat() if isinstance(received, (datetime, date)) else received, jd, now,
+                         json.dumps(c.get("Profile")) if c.get("Profile") else None, (text or "")[:INDEX_TEXT_CHARS]))
+        if not rows: return 0
+        updates = ", ".join(f"{col} = excluded.{col}" for col in COLUMNS[2:])
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                self.db.executemany(f"INSERT INTO candidates ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+                                    f"ON CONFLICT(owner, hash) DO UPDATE SET {updates}, synced = NULL", rows)
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def remove(self, owner, hashes):
+        with self.lock:
+            self.db.executemany("DELETE FROM candidates WHERE owner = ? AND hash = ?", [(owner, h) for h in hashes])
+
+    def search(self, owner, terms=(), min_years=0, min_score=0, since=None, until=None, limit=SEARCH_LIMIT):
+        # Returns candidates in the scanner's shape, best score first. Every term must appear in
+        # the name, skills or resume text; since/until bound the email's received date.
+        where, args, join = ["c.owner = ?", "c.score >= ?", "c.years >= ?"], [owner, min_score, min_years], ""
+        terms = [t.strip() for t in terms if t and t.strip()]
+        if terms and self.fts:
+            join = "JOIN candidates_fts f ON f.rowid = c.rowid"
+            where.append("candidates_fts MATCH ?"); args.append(fts_query(terms))
+        for t in terms if not self.fts else ():
+            where.append("(c.skills LIKE ? OR c.text LIKE ? OR c.name LIKE ?)"); args += [f"%{t}%"] * 3
+        if since: where.append("c.received >= ?"); args.append(since.isoformat())
+        if until: where.append("c.received <= ?"); args.append(until.isoformat())
+        sql = (f"SELECT c.name, c.email, c.phone, c.experience, c.skills, c.score, c.filename, c.hash, c.received, c.duplicates, c.profile "
+               f"FROM candidates c {join} WHERE {' AND '.join(where)} ORDER BY c.score DESC, c.received DESC LIMIT ?")
+        with self.lock: rows = self.db.execute(sql, args + [limit]).fetchall()
+        return [{"Name": r[0], "Email": r[1], "Phone": r[2], "Experience": r[3], "Skills": r[4], "Match %": r[5], "Filename": r[6], "Blob": r[7],
+                 "Received": datetime.fromisoformat(r[8]) if r[8] else None, "Duplicates": json.loads(r[9] or "[]"), "Profile": json.loads(r[10]) if r[10] else None} for r in rows]
+
+    def count(self, owner):
+        with self.lock: return self.db.execute("SELECT COUNT(*) FROM candidates WHERE owner = ?", (owner,)).fetchone()[0]
+
+    def sync(self, remote, owner):
+        # Pushes rows changed since the last sync to Supabase in bulk upserts. Resume text stays
+        # local; the remote table needs a unique (owner, hash) constraint.
+        pushed = 0
+        while True:
+            with self.lock:
+                rows = self.db.execute(f"SELECT rowid, {', '.join(COLUMNS[:-1])} FROM candidates WHERE owner = ? AND synced IS NULL LIMIT ?", (owner, SYNC_BATCH)).fetchall()
+            if not rows: return pushed
+            payload = [dict(zip(COLUMNS[:-1], r[1:]), duplicates=json.loads(r[11] or "[]"), profile=json.loads(r[15]) if r[15] else None) for r in rows]
+            remote.table(SUPABASE_TABLE).upsert(payload, on_conflict="owner,hash").execute()
+            with self.lock:
+                self.db.execute("BEGIN")
+                # A row rescanned while the push was in flight stays unsynced for the next round
+                self.db.executemany("UPDATE candidates SET synced = ? WHERE rowid = ? AND scanned = ?", [(time.time(), r[0], r[14]) for r in rows])
+                self.db.execute("COMMIT")
+            pushed += len(rows)
+
+    def writer(self, owner, jd_text=""):
+        return IndexWriter(self, owner, jd_text)
+
+class IndexWriter:
+    # Per-scan sink for stream_scan: buffers candidates by content hash and writes them in batches.
+    # A duplicate found later re-adds its group, so the stored row ends up with every copy listed.
+    def __init__(self, index, owner, jd_text):
+        self.index, self.owner, self.jd_text = index, owner, jd_text
+        self.pending, self.dropped = {}, set()
+        self.lock, self.flush_lock = threading.Lock(), threading.Lock()
+
+    def add(self, candidate, text):
+        with self.lock:
+            self.pending[candidate["Blob"]] = (dict(candidate), text)
+            self.dropped.discard(candidate["Blob"])
+            full = len(self.pending) >= INDEX_BATCH
+        if full: self.flush()
+
+    def drop(self, content_hash):
+        # The group now keeps a newer file, so the row stored under the old one goes
+        with self.lock:
+            self.pending.pop(content_hash, None)
+            self.dropped.add(content_hash)
+
+    def flush(self):
+        # Flushes run one at a time, so a newer version of a row is never overwritten by an older one
+        with self.flush_lock:
+            with self.lock:
+                entries, dropped = list(self.pending.values()), list(self.dropped)
+                self.pending, self.dropped = {}, set()
+            if dropped: self.index.remove(self.owner, dropped)
+            self.index.upsert(self.owner, entries, self.jd_text)
+
+@shared
+def get_candidate_index():
+    return CandidateIndex()
@@ -0,0 +1,234 @@
+import sys
+import csv
+import socket
+import os
+import argparse
+import time
+import signal
+import threading
+from datetime import datetime
+from scan_engine import export_row, get_timedelta, rerank, RERANK_TOP, SHARD_DAYS, SHARD_CONNECTIONS
+from scan_metrics import summary, to_json, to_prometheus
+from candidate_index import get_candidate_index, SEARCH_LIMIT
+from matching import RoleMatcher
+from job_queue import ScanJobs, JobProgress, run_job, work
+
+# Headless entry point: run a scan in this shell, queue one for a worker, or be the worker.
+#   python cli.py scan gmail --user me@x.com --window "7 Days" --jd-file jd.txt --engine claude --out results.csv
+#   python cli.py enqueue outlook --client-id ... --window "1 Day"
+#   python cli.py scan multi --mailbox gmail:a@x.com --mailbox gmail:b@x.com:INBOX,Jobs --window "3 Months"
+#   python cli.py scan gmail --user me@x.com --watch      # score new resumes as they arrive, until Ctrl-C
+#   python cli.py stop <job id>                            # end a background watch
+#   python cli.py worker
+#   python cli.py metrics <job id> --format prometheus
+#   python cli.py search --skills "kubernetes, python" --min-years 5 --from 2026-07-01
+#   python cli.py rank <job id> --jd-file backend.txt --jd-file data.txt --out ranked.csv
+# Secrets come from RECRUITER_EMAIL_PASSWORD, RECRUITER_CLIENT_SECRET and RECRUITER_API_KEY; for several
+# Gmail inboxes, RECRUITER_EMAIL_PASSWORDS holds a JSON object of address -> app password.
+# Outlook reuses the token the dashboard saved (o365_token.txt), so run from the same directory.
+ENGINES = {"claude": "Claude", "openai": "OpenAI", "gemini": "Gemini"}
+
+class ConsoleProgress(JobProgress):
+    # Stores results like a worker would, and also reports to stderr
+    def __init__(self, jobs, job_id, live=False):
+        super().__init__(jobs, job_id)
+        self.last_line, self.live = 0.0, live
+
+    def on_candidate(self, candidate):
+        super().on_candidate(candidate)
+        if self.live: print(f"New candidate: {candidate.get('Name', 'N/A')} ({candidate.get('Match %', 0)}%) from {candidate.get('Filename', '')}", file=sys.stderr)
+
+    def on_progress(self, stage, done, total):
+        super().on_progress(stage, done, total)
+        if time.monotonic() - self.last_line > 2:
+            print(" | ".join(f"{s}: {d}/{t}" if t else f"{s}: {d}" for s, (d, t) in self.stages.items()), file=sys.stderr)
+            self.last_line = time.monotonic()
+
+    def on_notice(self, message): print(message, file=sys.stderr)
+
+    def on_shard(self, label, state, found, detail):
+        super().on_shard(label, state, found, detail)
+        if state in ("done", "failed", "retrying"): print(f"Shard {label}: {state}, {found} attachments" + (f" ({detail})" if detail else ""), file=sys.stderr)
+
+    def on_metrics(self, snapshot):
+        super().on_metrics(snapshot)
+        print(f"Timing: {summary(snapshot)}", file=sys.stderr)
+
+    def on_error(self, message):
+        super().on_error(message)
+        print(f"ERROR: {message}", file=sys.stderr)
+
+def export_metrics(snapshot, fmt, labels):
+    return to_prometheus(snapshot, labels) if fmt == "prometheus" else to_json(snapshot)
+
+def parse_mailbox(spec):
+    # gmail:ADDRESS[:FOLDER,...] or outlook:ADDRESS[:FOLDER,...]; "outlook:me" is the signed-in user's own mailbox
+    provider, _, rest = spec.partition(":")
+    address, _, folders = rest.partition(":")
+    if provider not in ("gmail", "outlook") or not address: raise argparse.ArgumentTypeError(f"expected gmail:ADDRESS[:FOLDERS] or outlook:ADDRESS[:FOLDERS], got {spec!r}")
+    box = {"provider": provider, "folders": [f.strip() for f in folders.split(",") if f.strip()]}
+    if provider == "gmail": box["user"] = address
+    else: box["resource"] = None if address == "me" else address
+    return box
+
+def read_jd(paths):
+    # Each --jd-file is one role, named by its first line
+    texts = []
+    for path in paths or ():
+        with open(path, encoding="utf-8") as f: texts.append(f.read().strip())
+    return "\n---\n".join(texts)
+
+def scan_params(args):
+    if args.date_from:
+        start_dt = datetime.combine(datetime.strptime(args.date_from, "%Y-%m-%d"), datetime.min.time())
+        end_dt = datetime.combine(datetime.strptime(args.date_to, "%Y-%m-%d") if args.date_to else datetime.today(), datetime.max.time())
+    else:
+        end_dt = datetime.now()
+        start_dt = end_dt - get_timedelta(args.window)
+    triage = {"mode": args.triage}
+    if args.triage == "top": triage.update(top_k=args.top_k, min_score=args.min_score)
+    if args.rerank_top: triage["rerank_top"] = args.rerank_top
+    params = {"start": start_dt.isoformat(), "end": end_dt.isoformat(), "jd": read_jd(args.jd_file), "engine": ENGINES[args.engine],
+              "workers": args.workers, "incremental": args.only_new, "triage": triage, "batch_size": args.batch_size, "owner": args.owner}
+    if args.watch: params["watch"] = True
+    if args.provider == "gmail": params["user"] = args.user
+    elif args.provider == "multi": params.update(mailboxes=args.mailbox, client_id=args.client_id, shard_days=args.shard_days, connections=args.connections)
+    else: params["client_id"] = args.client_id
+    return params
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auto Recruiter headless scanner")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("scan", "enqueue"):
+        cmd = commands.add_parser(name, help="run a scan now" if name == "scan" else "queue a scan for a worker")
+        cmd.add_argument("provider", choices=["gmail", "outlook", "multi"], help="multi: several mailboxes and folders, scanned in parallel shards")
+        cmd.add_argument("--user", help="Gmail address")
+        cmd.add_argument("--client-id", help="Azure app client id (Outlook)")
+        cmd.add_argument("--mailbox", action="append", type=parse_mailbox, help="multi: gmail:ADDRESS[:FOLDERS] or outlook:ADDRESS[:FOLDERS]; repeat for each")
+        cmd.add_argument("--shard-days", type=int, default=SHARD_DAYS, help="multi: split the window into slices of this many days (0: no split)")
+        cmd.add_argument("--connections", type=int, default=SHARD_CONNECTIONS, help="multi: shards fetched at once")
+        cmd.add_argument("--window", default="7 Days", help='look-back window, e.g. "4 Hours", "2 Weeks"')
+        cmd.add_argument("--from", dest="date_from", help="start date YYYY-MM-DD (overrides --window)")
+        cmd.add_argument("--to", dest="date_to", help="end date YYYY-MM-DD")
+        cmd.add_argument("--jd-file", action="append", help="job description to rank against; repeat for several roles")
+        cmd.add_argument("--engine", choices=list(ENGINES), default="openai")
+        cmd.add_argument("--workers", type=int, help="parallel AI calls")
+        cmd.add_argument("--batch-size", type=int, default=1, help="resumes per AI request")
+        cmd.add_argument("--triage", choices=["all", "top", "local"], default="all")
+        cmd.add_argument("--top-k", type=int, default=50)
+        cmd.add_argument("--min-score", type=int, default=0)
+        cmd.add_argument("--rerank-top", type=int, default=0, help="AI re-scores this many of the best matches per role after the scan")
+        cmd.add_argument("--only-new", action="store_true", help="skip emails processed by an earlier scan")
+        cmd.add_argument("--watch", action="store_true", help="gmail/outlook: keep running and score new resumes as they arrive (the window is ignored)")
+        cmd.add_argument("--owner", default="", help="dashboard login to file the candidates under (default: shared CLI index)")
+        if name == "scan":
+            cmd.add_argument("--out", help="CSV file for the results (default: stdout)")
+            cmd.add_argument("--metrics", help="write stage timings, token usage and cost here (.prom for Prometheus text, else JSON)")
+    worker = commands.add_parser("worker", help="process queued scans")
+    worker.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    worker.add_argument("--poll", type=float, default=5.0, help="seconds between queue checks")
+    stop_cmd = commands.add_parser("stop", help="end a background watch")
+    stop_cmd.add_argument("job_id")
+    jobs_cmd = commands.add_parser("jobs", help="list recent jobs")
+    jobs_cmd.add_argument("--limit", type=int, default=20)
+    search = commands.add_parser("search", help="query candidates saved by earlier scans")
+    search.add_argument("--skills", default="", help="comma-separated terms, all required (skills or resume text)")
+    search.add_argument("--min-years", type=float, default=0)
+    search.add_argument("--min-score", type=int, default=0)
+    search.add_argument("--from", dest="date_from", help="received on or after YYYY-MM-DD")
+    search.add_argument("--to", dest="date_to", help="received on or before YYYY-MM-DD")
+    search.add_argument("--owner", default="")
+    search.add_argument("--limit", type=int, default=200)
+    rank = commands.add_parser("rank", help="re-rank a job's candidates, or every saved one, against new JDs without re-extracting")
+    rank.add_argument("job_id", nargs="?", help="job to re-rank (default: candidates saved under --owner)")
+    rank.add_argument("--jd-file", action="append", required=True, help="repeat for several roles; scored in one pass")
+    rank.add_argument("--owner", default="")
+    rank.add_argument("--limit", type=int, default=SEARCH_LIMIT, help="saved candidates to load when no job is given")
+    rank.add_argument("--rerank-top", type=int, default=0, help=f"AI re-scores this many of the best matches per role (e.g. {RERANK_TOP})")
+    rank.add_argument("--engine", choices=list(ENGINES), default="openai")
+    rank.add_argument("--out", help="CSV file for the results (default: stdout)")
+    metrics_cmd = commands.add_parser("metrics", help="print a finished job's timings, token usage and cost")
+    metrics_cmd.add_argument("job_id")
+    metrics_cmd.add_argument("--format", choices=["json", "prometheus"], default="json")
+    args = parser.parse_args(argv)
+
+    jobs = ScanJobs()
+    if args.command in ("scan", "enqueue"):
+        if args.provider == "gmail" and not args.user: parser.error("--user is required for gmail")
+        if args.provider == "outlook" and not args.client_id: parser.error("--client-id is required for outlook")
+        if args.provider == "multi" and not args.mailbox: parser.error("--mailbox is required for multi")
+        if args.provider == "multi" and not args.client_id and any(box["provider"] == "outlook" for box in args.mailbox): parser.error("--client-id is required for outlook mailboxes")
+        if args.provider == "multi" and args.watch: parser.error("--watch takes a single gmail or outlook inbox")
+        if args.command == "enqueue":
+            print(jobs.enqueue(args.provider, scan_params(args)))
+            return 0
+        job = jobs.start(args.provider, scan_params(args), f"{socket.gethostname()}:{os.getpid()}:cli")
+        job_id = job["id"]
+        progress, stop = ConsoleProgress(jobs, job_id, live=args.watch), threading.Event()
+        if args.watch:
+            # The first Ctrl-C lets resumes already fetched finish scoring; a second one aborts
+            def halt(signum, frame):
+                if stop.is_set(): raise KeyboardInterrupt
+                print("Stopping the watch once resumes in flight are scored (Ctrl-C again to abort)", file=sys.stderr)
+                stop.set()
+            for sig in (signal.SIGINT, signal.SIGTERM): signal.signal(sig, halt)
+            print(f"Watching {args.user or 'the Outlook inbox'} for new resumes (job {job_id}); Ctrl-C to stop", file=sys.stderr)
+        run_job(jobs, job, progress, stop)
+        status = jobs.get(job_id)
+        print(f"{status['message']} ({len(progress.cands)} candidates, job {job_id})", file=sys.stderr)
+        out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+        try:
+            writer = csv.DictWriter(out, fieldnames=list(export_row({})))
+            writer.writeheader()
+            for c in sorted(progress.cands, key=lambda c: c.get("Match %", 0), reverse=True): writer.writerow(export_row(c))
+        finally:
+            if args.out: out.close()
+        if args.metrics and progress.metrics:
+            fmt = "prometheus" if args.metrics.endswith(".prom") else "json"
+            with open(args.metrics, "w", encoding="utf-8") as f: f.write(export_metrics(progress.metrics, fmt, {"job": job_id, "provider": args.provider}))
+        return 0 if status["status"] == "done" else 1
+    elif args.command == "worker":
+        work(jobs, once=args.once, poll=args.poll)
+    elif args.command == "stop":
+        if not jobs.stop(args.job_id):
+            print(f"Job {args.job_id} is not running", file=sys.stderr)
+            return 1
+        print(f"Asked job {args.job_id} to stop", file=sys.stderr)
+    elif args.command == "search":
+        since = datetime.strptime(args.date_from, "%Y-%m-%d") if args.date_from else None
+        until = datetime.combine(datetime.strptime(args.date_to, "%Y-%m-%d"), datetime.max.time()) if args.date_to else None
+        found = get_candidate_index().search(args.owner, args.skills.split(","), args.min_years, args.min_score, since, until, args.limit)
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(export_row({})) + ["Received", "Resume"])
+        writer.writeheader()
+        for c in found: writer.writerow({**export_row(c), "Received": c["Received"].strftime("%Y-%m-%d") if c["Received"] else "", "Resume": c["Filename"]})
+    elif args.command == "rank":
+        cands = jobs.results(args.job_id) if args.job_id else get_candidate_index().search(args.owner, limit=args.limit)
+        matcher = RoleMatcher(read_jd(args.jd_file))
+        start = time.perf_counter()
+        matcher.apply(cands)
+        print(f"Re-ranked {len(cands)} candidates against {len(matcher.roles)} role(s) in {(time.perf_counter() - start) * 1000:.0f} ms", file=sys.stderr)
+        key = os.environ.get("RECRUITER_API_KEY")
+        if args.rerank_top and key: print(f"AI re-scored {rerank(cands, matcher, key, ENGINES[args.engine], args.rerank_top, lambda m: print(m, file=sys.stderr))}", file=sys.stderr)
+        roles = [name for name, _ in matcher.roles] if len(matcher.roles) > 1 else []
+        out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+        try:
+            writer = csv.DictWriter(out, fieldnames=list(export_row({})) + (["Role"] + roles if roles else []) + ["Resume"])
+            writer.writeheader()
+            for c in sorted(cands, key=lambda c: c.get("Match %", 0), reverse=True):
+                writer.writerow({**export_row(c), **({"Role": c.get("Role", ""), **c.get("Matches", {})} if roles else {}), "Resume": c.get("Filename", "")})
+        finally:
+            if args.out: out.close()
+    elif args.command == "metrics":
+        job, snapshot = jobs.get(args.job_id), jobs.metrics(args.job_id)
+        if not snapshot:
+            print(f"No metrics recorded for job {args.job_id}", file=sys.stderr)
+            return 1
+        sys.stdout.write(export_metrics(snapshot, args.format, {"job": args.job_id, "provider": job["provider"] if job else ""}) + ("" if args.format == "prometheus" else "\n"))
+    else:
+        for j in jobs.recent(args.limit):
+            created = datetime.fromtimestamp(j["created"]).strftime("%Y-%m-%d %H:%M")
+            print(f"{j['id']}  {created}  {j['provider']:<8} {j['status']:<8} {j['candidates']:>5} candidates  {j['message'] or ''}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import io
+import signal
+import threading
+from contextlib import contextmanager
+
+# Runs inside ProcessPoolExecutor workers, so keep this module free of Streamlit imports.
+# pypdf / python-docx load inside read_file_content: only pool workers ever parse.
+
+# Only the first PROMPT_CHARS characters of a resume are ever sent to the LLM
+PROMPT_CHARS = 6000
+MAX_DOC_BYTES = 20 * 1024 * 1024
+PARSE_TIMEOUT = 20
+
+class ParseTimeout(Exception):
+    pass
+
+@contextmanager
+def time_limit(seconds):
+    # SIGALRM gives a hard stop inside a single slow page; pool workers parse on their main thread
+    if not seconds or not hasattr(signal, "SIGALRM") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    def expire(signum, frame): raise ParseTimeout()
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try: yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def read_file_content(file_bytes, filename, max_chars=PROMPT_CHARS, timeout=PARSE_TIMEOUT):
+    # Oversized or unparseable files come back empty, so the scanner counts them as unreadable
+    # instead of sending an error message to the extractor as if it were a resume
+    if len(file_bytes) > MAX_DOC_BYTES: return ""
+    chunks, collected, sep = [], 0, " "
+    try:
+        with time_limit(timeout):
+            if filename.lower().endswith(".pdf"):
+                from pypdf import PdfReader
+                pdf = PdfReader(io.BytesIO(file_bytes))
+                for page in pdf.pages:
+                    chunks.append(page.extract_text() or "")
+                    collected += len(chunks[-1]) + 1
+                    if collected >= max_chars: break
+            elif filename.lower().endswith(".docx"):
+                sep = "\n"
+                import docx
+                doc = docx.Document(io.BytesIO(file_bytes))
+                for para in doc.paragraphs:
+                    chunks.append(para.text)
+                    collected += len(para.text) + 1
+                    if collected >= max_chars: break
+    except ParseTimeout: pass
+    except Exception: return ""
+    return sep.join(chunks)
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import sqlite3
+import socket
+import threading
+import uuid
+from datetime import datetime
+from scan_engine import ScanProgress, RESULTS_DIR, drive_scan, scan_events, get_result_blob_store, sweep_result_blobs
+from candidate_index import get_candidate_index
+
+# Local scan queue and results store: the dashboard and CLI enqueue, any number of worker
+# processes claim jobs, and finished candidates are kept here for the dashboard to load.
+JOB_DB = os.path.join(RESULTS_DIR, "jobs.db")
+JOB_STALE_AFTER = 10 * 60
+# Running jobs touch their row this often, so a long quiet stage is not mistaken for a dead worker
+JOB_HEARTBEAT = 60.0
+# How often a running watch checks whether someone asked it to stop
+WATCH_STOP_POLL = 5.0
+RESULT_MAX_AGE = 30 * 24 * 3600
+SECRET_PARAMS = ("password", "api_key", "client_secret")
+
+def without_secrets(value):
+    # Sharded scans carry a password per mailbox, so secrets are dropped at any depth
+    if isinstance(value, dict): return {k: without_secrets(v) for k, v in value.items() if k not in SECRET_PARAMS}
+    if isinstance(value, list): return [without_secrets(v) for v in value]
+    return value
+
+def to_json(value):
+    return json.dumps(value, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+
+class ScanJobs:
+    def __init__(self, path=JOB_DB):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # Zero freed space in the database file; claim() also empties the WAL, which keeps every
+        # page version written since the last checkpoint, the one holding a typed password included
+        self.db.execute("PRAGMA secure_delete=ON")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, provider TEXT NOT NULL, params TEXT NOT NULL,
+            status TEXT NOT NULL, worker TEXT, progress TEXT NOT NULL DEFAULT '{}', message TEXT,
+            created REAL NOT NULL, started REAL, updated REAL NOT NULL, finished REAL)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS candidates (job_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (job_id, seq))")
+        self.db.execute("CREATE TABLE IF NOT EXISTS metrics (job_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self.lock = threading.Lock()
+
+    def enqueue(self, provider, params):
+        job_id, now = uuid.uuid4().hex[:12], time.time()
+        with self.lock:
+            self.db.execute("INSERT INTO jobs (id, provider, params, status, created, updated) VALUES (?, ?, ?, 'queued', ?, ?)", (job_id, provider, to_json(params), now, now))
+        return job_id
+
+    def start(self, provider, params, worker):
+        # A job run by the process that creates it (the CLI's scan) goes in already running, so a
+        # worker polling the same queue can never claim it first
+        job_id, now = uuid.uuid4().hex[:12], time.time()
+        with self.lock:
+            self.db.execute("INSERT INTO jobs (id, provider, params, status, worker, created, started, updated) VALUES (?, ?, ?, 'running', ?, ?, ?, ?)",
+                            (job_id, provider, to_json(without_secrets(params)), worker, now, now, now))
+        return {"id": job_id, "provider": provider, "params": params}
+
+    def claim(self, worker, job_id=None):
+        # BEGIN IMMEDIATE takes the write lock first, so two workers can never claim the same job.
+        # Running jobs whose worker stopped reporting are handed out again; a watch that was asked
+        # to stop and lost its worker on the way is simply closed. Credentials typed into the
+        # dashboard are removed from the queue here and live only in the claiming worker's memory,
+        # so a job handed out again runs on the new worker's RECRUITER_* environment.
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND updated < ?", (now - JOB_STALE_AFTER,))
+                self.db.execute("UPDATE jobs SET status = 'done', message = 'Watch stopped', finished = ? WHERE status = 'stopping' AND updated < ?", (now, now - JOB_STALE_AFTER))
+                if job_id: row = self.db.execute("SELECT id, provider, params FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)).fetchone()
+                else: row = self.db.execute("SELECT id, provider, params FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row:
+                    params = json.loads(row[2])
+                    # A watch carries on where its last worker stopped; any other job starts over
+                    if not params.get("watch"): self.db.execute("DELETE FROM candidates WHERE job_id = ?", (row[0],))
+                    self.db.execute("UPDATE jobs SET status = 'running', worker = ?, started = ?, updated = ?, progress = '{}', params = ? WHERE id = ?",
+                                    (worker, now, now, to_json(without_secrets(params)), row[0]))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+            # Copies the scrubbed pages into the file and truncates the WAL, waiting out readers
+            if row and without_secrets(params) != params: self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return {"id": row[0], "provider": row[1], "params": params} if row else None
+
+    def report(self, job_id, progress=None, candidates=(), message=None, offset=0):
+        with self.lock:
+            self.db.execute("BEGIN")
+            self.db.executemany("INSERT OR REPLACE INTO candidates VALUES (?, ?, ?)", [(job_id, offset + i, to_json(c)) for i, c in enumerate(candidates)])
+            self.db.execute("UPDATE jobs SET progress = COALESCE(?, progress), message = COALESCE(?, message), updated = ? WHERE id = ?", (to_json(progress) if progress is not None else None, message, time.time(), job_id))
+            self.db.execute("COMMIT")
+
+    def finish(self, job_id, status, message=None):
+        now = time.time()
+        with self.lock:
+            self.db.execute("UPDATE jobs SET status = ?, message = COALESCE(?, message), finished = ?, updated = ? WHERE id = ?", (status, message, now, now, job_id))
+
+    def touch(self, job_id):
+        with self.lock:
+            self.db.execute("UPDATE jobs SET updated = ? WHERE id = ? AND status IN ('running', 'stopping')", (time.time(), job_id))
+
+    def stop(self, job_id):
+        # Watches run until stopped; the worker notices within WATCH_STOP_POLL seconds
+        with self.lock:
+            return self.db.execute("UPDATE jobs SET status = 'stopping' WHERE id = ? AND status = 'running'", (job_id,)).rowcount > 0
+
+    def status(self, job_id):
+        with self.lock:
+            row = self.db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def save_metrics(self, job_id, snapshot):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO metrics VALUES (?, ?)", (job_id, to_json(snapshot)))
+
+    def metrics(self, job_id):
+        with self.lock:
+            row = self.db.execute("SELECT data FROM metrics WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _select(self, where, args):
+        with self.lock:
+            rows = self.db.execute(f"""SELECT j.id, j.provider, j.status, j.worker, j.progress, j.message, j.created, j.finished,
+                (SELECT COUNT(*) FROM candidates c WHERE c.job_id = j.id), j.params FROM jobs j {where}""", args).fetchall()
+        keys = ("id", "provider", "status", "worker", "progress", "message", "created", "finished", "candidates")
+        return [{**dict(zip(keys, row)), "progress": json.loads(row[4]), "watch": bool(json.loads(row[9]).get("watch"))} for row in rows]
+
+    def get(self, job_id):
+        found = self._select("WHERE j.id = ?", (job_id,))
+        return found[0] if found else None
+
+    def recent(self, limit=20):
+        return self._select("ORDER BY j.created DESC LIMIT ?", (limit,))
+
+    def results(self, job_id):
+        with self.lock:
+            rows = self.db.execute("SELECT data FROM candidates WHERE job_id = ? ORDER BY seq", (job_id,)).fetchall()
+        cands = [json.loads(row[0]) for row in rows]
+        for c in cands:
+            if c.get("Received"): c["Received"] = datetime.fromisoformat(c["Received"])
+        return cands
+
+    def purge(self, max_age=RESULT_MAX_AGE):
+        cutoff = time.time() - max_age
+        with self.lock:
+            self.db.execute("BEGIN")
+            self.db.execute("DELETE FROM candidates WHERE job_id IN (SELECT id FROM jobs WHERE finished < ?)", (cutoff,))
+            self.db.execute("DELETE FROM metrics WHERE job_id IN (SELECT id FROM jobs WHERE finished < ?)", (cutoff,))
+            self.db.execute("DELETE FROM jobs WHERE finished < ?", (cutoff,))
+            self.db.execute("COMMIT")
+        sweep_result_blobs(max_age)
+
+class JobProgress(ScanProgress):
+    # Writes a running job's progress and candidates to the store, at most once a second
+    def __init__(self, jobs, job_id, flush_every=1.0):
+        self.jobs, self.job_id, self.flush_every = jobs, job_id, flush_every
+        self.stages, self.cands, self.saved, self.last_flush = {}, [], 0, 0.0
+        self.message, self.metrics, self.shards = None, None, {}
+
+    def flush(self, force=False):
+        # The final flush rewrites every row: duplicates found later may have updated earlier candidates
+        if not force and time.monotonic() - self.last_flush < self.flush_every: return
+        start = 0 if force else self.saved
+        self.jobs.report(self.job_id, self.stages, self.cands[start:], self.message, offset=start)
+        self.saved, self.last_flush = len(self.cands), time.monotonic()
+
+    def resume(self, cands):
+        # A re-claimed watch keeps the candidates its earlier worker saved. Watches write every
+        # event through: the inbox can go quiet for hours right after a candidate arrives.
+        self.cands, self.saved, self.flush_every = cands, len(cands), 0.0
+
+    def on_progress(self, stage, done, total):
+        self.stages[stage] = [done, total]
+        self.flush()
+
+    def on_candidate(self, candidate):
+        self.cands.append(candidate)
+        self.flush()
+
+    def on_error(self, message):
+        self.message = message
+
+    def on_status(self, status):
+        self.message = status
+
+    def on_metrics(self, snapshot):
+        self.metrics = snapshot
+        self.jobs.save_metrics(self.job_id, snapshot)
+
+    def on_shard(self, label, state, found, detail):
+        # Shown as one "Shards finished/total" stage; failures are named in the final status
+        self.shards[label] = state
+        self.stages["Shards"] = [sum(s in ("done", "failed") for s in self.shards.values()), len(self.shards)]
+        self.flush()
+
+def heartbeat(jobs, job_id, stop):
+    while not stop.wait(JOB_HEARTBEAT): jobs.touch(job_id)
+
+def watch_for_stop(jobs, job_id, stop):
+    while not stop.wait(WATCH_STOP_POLL):
+        if jobs.status(job_id) == "stopping": stop.set()
+
+def run_job(jobs, job, progress=None, stop=None):
+    # Runs one claimed job to completion; a job that raises is marked failed, never left running.
+    # A watch job runs until `stop` is set or someone calls ScanJobs.stop on it.
+    progress = progress or JobProgress(jobs, job["id"])
+    stop = stop or threading.Event()
+    threading.Thread(target=heartbeat, args=(jobs, job["id"], stop), daemon=True).start()
+    if job["params"].get("watch"):
+        progress.resume(jobs.results(job["id"]))
+        threading.Thread(target=watch_for_stop, args=(jobs, job["id"], stop), daemon=True).start()
+    try:
+        status = drive_scan(scan_events(job["provider"], job["params"], get_result_blob_store(), get_candidate_index(), stop), progress)
+        progress.flush(force=True)
+        jobs.finish(job["id"], "done" if status else "failed", status or "Scan interrupted - showing partial results.")
+    except BaseException as e:
+        progress.flush(force=True)
+        jobs.finish(job["id"], "failed", f"Scan interrupted: {e}")
+        if not isinstance(e, Exception): raise
+    finally: stop.set()
+    return job["id"]
+
+def work(jobs=None, once=False, poll=5.0, worker=None):
+    # Worker loop: claim, run, repeat. Start one per core (or per machine sharing the cache dir).
+    jobs = jobs or ScanJobs()
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    jobs.purge()
+    while True:
+        job = jobs.claim(worker)
+        if job: run_job(jobs, job)
+        elif once: return
+        else: time.sleep(poll)
@@ -0,0 +1,136 @@
+import re
+import numpy as np
+from offline_extract import get_offline_extractor, MAX_SKILLS
+
+# JD matching as its own stage. Extraction stores a JD-independent profile per resume (taxonomy
+# skills, job titles, years, keywords); scoring every profile against one JD or several is a
+# few array operations over a sparse candidates x features matrix, so a new or edited JD re-ranks
+# a finished scan without another LLM call.
+SKILL_WEIGHT, TERM_WEIGHT, TITLE_WEIGHT, YEARS_WEIGHT = 0.55, 0.15, 0.15, 0.15
+# Several open roles share one JD box, separated by a line of three or more dashes
+ROLE_SPLIT_RE = re.compile(r"^\s*-{3,}\s*$", re.M)
+ROLE_NAME_CHARS = 60
+YEARS_RE = re.compile(r'\d+(?:\.\d+)?')
+BRIEF_SKILLS = 20
+
+def experience_years(value):
+    found = YEARS_RE.search(str(value))
+    return float(found.group()) if found else 0.0
+
+def parse_roles(jd_text):
+    # [(role name, JD text)]; each role is named by its first line
+    roles, seen = [], set()
+    for block in ROLE_SPLIT_RE.split(jd_text or ""):
+        block = block.strip()
+        if not block: continue
+        name = base = block.splitlines()[0].strip()[:ROLE_NAME_CHARS]
+        n = 1
+        while name in seen:
+            n += 1
+            name = f"{base} ({n})"
+        seen.add(name)
+        roles.append((name, block))
+    return roles
+
+def listed(value):
+    return [s.strip() for s in str(value or "").split(",") if s.strip() and s.strip().upper() != "N/A"]
+
+def with_profile(meta, text=None):
+    # Adds the profile to an extraction result. Offline results carry one already; for AI results the
+    # skills and titles the model listed are mapped onto the taxonomy and merged with what the text
+    # mentions, and the model's years win. Without text (older saved results) the listed skills are all there is.
+    if meta.get("Profile"): return meta
+    ex = get_offline_extractor()
+    skills, titles, years, terms = ex.features(text) if text else ({}, set(), None, [])
+    named, named_titles = ex.canonical(listed(meta.get("Skills")), "skills"), ex.canonical(listed(meta.get("Titles")), "titles")
+    profile = {
+        "skills": named + [s for s in sorted(skills, key=lambda s: (-skills[s], s)) if s not in named],
+        "titles": named_titles + [t for t in sorted(titles) if t not in named_titles],
+        "years": experience_years(meta.get("Experience")) or years,
+        "terms": terms,
+    }
+    meta = {k: v for k, v in meta.items() if k != "Titles"}
+    return {**meta, "Skills": ", ".join(listed(meta.get("Skills"))[:MAX_SKILLS]) or "N/A", "Profile": profile}
+
+def profile_of(candidate):
+    if not candidate.get("Profile"): candidate["Profile"] = with_profile(candidate)["Profile"]
+    return candidate["Profile"]
+
+def brief(candidate):
+    # What an LLM re-rank sees of a candidate: no name, no contact details, no resume text
+    p = profile_of(candidate)
+    return {"Experience": candidate.get("Experience", "N/A"), "Skills": p["skills"][:BRIEF_SKILLS], "Titles": p["titles"][:5]}
+
+# --- SPARSE SCORING ---
+def csr(rows):
+    # Rows of feature strings -> (vocabulary, column indices, row offsets)
+    vocab, indices, indptr = {}, [], [0]
+    for row in rows:
+        indices += [vocab.setdefault(f, len(vocab)) for f in row]
+        indptr.append(len(indices))
+    return vocab, np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)
+
+def row_hits(matrix, wanted):
+    # wanted: (roles, vocabulary) 0/1 -> (roles, candidates) count of wanted features each candidate has
+    vocab, indices, indptr = matrix
+    hits = np.zeros((wanted.shape[0], len(indices) + 1), dtype=np.int64)
+    np.cumsum(wanted[:, indices], axis=1, out=hits[:, 1:])
+    return hits[:, indptr[1:]] - hits[:, indptr[:-1]]
+
+class ProfileMatrix:
+    # Built once per candidate list; scoring reuses it for every JD. Skills and keywords share one
+    # lower-cased vocabulary, so a JD's words outside the taxonomy are found in the resume's text too.
+    def __init__(self, profiles):
+        self.skills = csr({s.lower() for s in p.get("skills", ())} | set(p.get("terms", ())) for p in profiles)
+        self.titles = csr(set(p.get("titles", ())) for p in profiles)
+        self.years = np.array([p.get("years") or 0.0 for p in profiles], dtype=np.float64)
+
+    def score(self, jds):
+        # (roles, candidates) scores 0-100 against offline_extract profiles of the JDs, all roles in one pass
+        m, vocab = len(jds), self.skills[0]
+        need, need_terms = np.zeros((m, len(vocab)), dtype=np.int64), np.zeros((m, len(vocab)), dtype=np.int64)
+        need_titles = np.zeros((m, len(self.titles[0])), dtype=np.int64)
+        sizes, term_sizes, jd_years, weights = np.ones(m), np.ones(m), np.ones(m), np.zeros((4, m))
+        for r, jd in enumerate(jds):
+            skills = {s.lower() for s in jd["skills"]}
+            terms = set(jd["terms"]) - skills
+            need[r, [vocab[f] for f in skills if f in vocab]] = 1
+            need_terms[r, [vocab[f] for f in terms if f in vocab]] = 1
+            need_titles[r, [self.titles[0][t] for t in jd["titles"] if t in self.titles[0]]] = 1
+            if skills: sizes[r], weights[0, r] = len(skills), SKILL_WEIGHT
+            # Without taxonomy skills the JD's keywords carry the skills' weight as well
+            if terms: term_sizes[r], weights[1, r] = len(terms), TERM_WEIGHT if skills else SKILL_WEIGHT + TERM_WEIGHT
+            if jd["titles"]: weights[2, r] = TITLE_WEIGHT
+            if jd["years"]: jd_years[r], weights[3, r] = jd["years"], YEARS_WEIGHT
+        parts = (row_hits(self.skills, need) / sizes[:, None], row_hits(self.skills, need_terms) / term_sizes[:, None],
+                 row_hits(self.titles, need_titles) > 0, np.minimum(self.years[None, :] / jd_years[:, None], 1.0))
+        total = weights.sum(axis=0)
+        score = sum(w[:, None] * part for w, part in zip(weights, parts)) / np.where(total > 0, total, 1.0)[:, None]
+        return np.rint(100 * score).astype(np.int64)
+
+class RoleMatcher:
+    # One or several JDs, each parsed once. `jd` is JD text (roles split by a --- line) or [(name, text)].
+    def __init__(self, jd):
+        self.roles = parse_roles(jd) if jd is None or isinstance(jd, str) else list(jd)
+        extractor = get_offline_extractor()
+        self.wanted = [extractor.profile(text) for _, text in self.roles]
+
+    def __bool__(self):
+        return bool(self.roles)
+
+    def scores(self, profiles):
+        if not self.roles or not profiles: return np.zeros((len(self.roles), len(profiles)), dtype=np.int64)
+        return ProfileMatrix(profiles).score(self.wanted)
+
+    def apply(self, cands):
+        # Sets each candidate's "Match %" to its best role's score; with several roles also the
+        # role's name under "Role" and every role's score under "Matches"
+        scores = self.scores([profile_of(c) for c in cands])
+        best = scores.argmax(axis=0).tolist() if self.roles else [0] * len(cands)
+        table, names = scores.T.tolist(), [name for name, _ in self.roles]
+        for c, row, b in zip(cands, table, best):
+            c["Match %"] = row[b] if row else 0
+            c.pop("Reranked", None)
+            if len(names) > 1: c["Role"], c["Matches"] = names[b], dict(zip(names, row))
+            else: c.pop("Role", None); c.pop("Matches", None)
+        return cands
@@ -0,0 +1,190 @@
+import os
+import re
+import json
+import functools
+from collections import Counter
+import threading
+from datetime import datetime
+
+# Zero-cost extraction for scans without an API key and for local pre-ranking: precompiled
+# patterns plus one Aho-Corasick pass over the resume's tokens for every skill and job title.
+# Results are JD-independent; matching.py scores them against JDs.
+TAXONOMY_PATH = os.environ.get("RECRUITER_TAXONOMY", os.path.join(os.path.dirname(os.path.abspath(__file__)), "skills_taxonomy.json"))
+MAX_SKILLS = 5
+
+# Tokens keep "c++", "c#", ".net", "node.js" whole; "/" and "-" split, so "ci/cd" is the phrase "ci cd".
+# str.translate + split runs ~3x faster than a findall over the same text.
+TOKEN_CHARS = set("abcdefghijklmnopqrstuvwxyz0123456789+#.")
+TOKEN_TABLE = {c: " " for c in range(128) if chr(c) not in TOKEN_CHARS}
+CONTACT_CHARS = 2000
+EMAIL_RE = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+PHONE_RE = re.compile(r"[\+\(]?[1-9][0-9 .\-\(\)]{8,}[0-9]")
+NON_DIGIT_RE = re.compile(r"\D")
+# Years are found from the cheap "yr"/"year" literal backwards rather than by trying every digit
+YEAR_WORD_RE = re.compile(r"y(?:ears?|rs?)\b")
+YEAR_COUNT_RE = re.compile(r"(\d{1,2}(?:\.\d)?)\s*\+?\s*$")
+SPAN_RE = re.compile(r"((?:19|20)\d\d)\s*(?:-|–|—|to|till|until)\s*((?:19|20)\d\d|present|current|now|date|today)\b")
+NAME_RE = re.compile(r"[A-Z][a-zA-Z'.\-]*(?:\s+[A-Z][a-zA-Z'.\-]*){1,3}")
+STOP_WORDS = frozenset("""a an and are as at be by for from has have in is it its of on or our that the their this to we will with you your
+    who what which work working years year experience strong ability skills knowledge team role candidate required requirements preferred
+    plus must should including etc using use good excellent responsibilities job description looking join""".split())
+HEADING_WORDS = frozenset("resume curriculum vitae cv summary profile objective experience education skills contact projects professional personal details".split())
+
+def tokenize(text):
+    # Expects lower-cased text; trailing sentence dots stay on and are only stripped when a lookup misses
+    return text.translate(TOKEN_TABLE).split()
+
+def year_claims(low, cap):
+    found = []
+    for m in YEAR_WORD_RE.finditer(low):
+        n = YEAR_COUNT_RE.search(low, max(0, m.start() - 10), m.start())
+        if n and float(n.group(1)) <= cap: found.append(float(n.group(1)))
+    return found
+
+def first_match(pattern, text, valid=None):
+    # Contact details sit at the top of a resume, so try the head before the whole text
+    for start, end in ((0, CONTACT_CHARS), (CONTACT_CHARS, len(text))):
+        for m in pattern.finditer(text, start, end):
+            if valid is None or valid(m.group()): return m.group()
+    return None
+
+class PhraseMatcher:
+    # Aho-Corasick automaton over tokens rather than characters: a token outside the taxonomy's
+    # vocabulary sends the scan straight back to the root, so most of a resume costs one set lookup.
+    def __init__(self, phrases):
+        self.goto, self.fail, self.out = [{}], [0], [[]]
+        self.vocab = set()
+        for phrase, label in phrases:
+            state = 0
+            for tok in phrase:
+                self.vocab.add(tok)
+                if tok not in self.goto[state]:
+                    self.goto.append({}); self.fail.append(0); self.out.append([])
+                    self.goto[state][tok] = len(self.goto) - 1
+                state = self.goto[state][tok]
+            if label not in self.out[state]: self.out[state].append(label)
+        queue = list(self.goto[0].values())
+        while queue:
+            state = queue.pop(0)
+            for tok, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and tok not in self.goto[f]: f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(tok, 0)
+                self.out[nxt] = self.out[nxt] + [x for x in self.out[self.fail[nxt]] if x not in self.out[nxt]]
+
+    def counts(self, tokens):
+        # {label: occurrences}; a match ends where its last token is, so overlapping phrases all count
+        goto, fail, out, vocab = self.goto, self.fail, self.out, self.vocab
+        found, state = {}, 0
+        for tok in tokens:
+            if tok not in vocab:
+                if tok[-1] != "." or tok.rstrip(".") not in vocab:
+                    state = 0
+                    continue
+                tok = tok.rstrip(".")
+            while state and tok not in goto[state]: state = fail[state]
+            state = goto[state].get(tok, 0)
+            for label in out[state]: found[label] = found.get(label, 0) + 1
+        return found
+
+def load_taxonomy(path=TAXONOMY_PATH):
+    with open(path, encoding="utf-8") as f: return json.load(f)
+
+class OfflineExtractor:
+    def __init__(self, taxonomy):
+        phrases = []
+        for kind in ("skills", "titles"):
+            for name, aliases in taxonomy.get(kind, {}).items():
+                for alias in {name, *aliases}:
+                    toks = tokenize(alias.lower())
+                    if toks: phrases.append((tuple(toks), (kind, name)))
+        self.matcher = PhraseMatcher(phrases)
+        self.profiles, self.lock = {}, threading.Lock()
+
+    def experience(self, low):
+        # An explicit "N years" claim wins; otherwise the union of year ranges like "2016 - Present"
+        claims = year_claims(low, 50)
+        if claims: return max(claims)
+        now, spans = datetime.now().year, []
+        for start, end in SPAN_RE.findall(low):
+            end = int(end) if end[0].isdigit() else now
+            if int(start) <= end <= now: spans.append((int(start), end))
+        total, reach = 0, 0
+        for start, end in sorted(spans):
+            start = max(start, reach)
+            if end > start: total += end - start
+            reach = max(reach, end)
+        return float(total) if total else None
+
+    def profile(self, jd_text):
+        # What a JD asks for, parsed once per distinct JD
+        jd_text = (jd_text or "").strip()
+        with self.lock:
+            if jd_text in self.profiles: return self.profiles[jd_text]
+        toks = [t.rstrip(".") for t in tokenize(jd_text.lower())]
+        hits = self.matcher.counts(toks)
+        claims = year_claims(jd_text.lower(), 30)
+        profile = {
+            "skills": {name for kind, name in hits if kind == "skills"},
+            "titles": {name for kind, name in hits if kind == "titles"},
+            "years": max(claims) if claims else None,
+            # Words the taxonomy does not know (a niche tool, a domain) are matched against resume text
+            "terms": {t for t in toks if len(t) > 2 and not t.isdigit() and t not in STOP_WORDS and t not in self.matcher.vocab},
+        }
+        with self.lock:
+            if len(self.profiles) > 32: self.profiles.clear()
+            self.profiles[jd_text] = profile
+        return profile
+
+    def name(self, text, email):
+        for line in text.splitlines()[:8]:
+            line = line.strip()
+            if not NAME_RE.fullmatch(line): continue
+            toks = tokenize(line.lower())
+            if HEADING_WORDS.isdisjoint(toks) and not any(kind == "titles" for kind, _ in self.matcher.counts(toks)): return line
+        return email.split('@')[0] if email else "N/A"
+
+    def features(self, text):
+        # Every taxonomy skill ({name: mentions}) and title in the text, years, and every keyword, most frequent first
+        low = text.lower()
+        tokens = tokenize(low)
+        hits = self.matcher.counts(tokens)
+        skills = {name: n for (kind, name), n in hits.items() if kind == "skills"}
+        titles = {name for kind, name in hits if kind == "titles"}
+        # Counted in C, then filtered once per distinct token rather than once per occurrence;
+        # an alphabetical sort followed by a stable count sort breaks ties by name without a key lambda
+        counts = Counter(tokens)
+        for tok in [t for t in counts if t[-1] == "."]: counts[tok.rstrip(".")] += counts.pop(tok)
+        terms = [t for t in counts.keys() - STOP_WORDS if len(t) > 2 and not t.isdigit()]
+        terms.sort()
+        terms.sort(key=counts.__getitem__, reverse=True)
+        return skills, titles, self.experience(low), terms
+
+    def canonical(self, values, kind):
+        # Skills or titles as an LLM listed them, mapped onto taxonomy names; unknown ones are kept as written
+        out = []
+        for value in values:
+            names = [name for k, name in self.matcher.counts(tokenize(value.lower())) if k == kind]
+            for name in names or [value]:
+                if name not in out: out.append(name)
+        return out
+
+    def extract(self, text):
+        skills, titles, years, terms = self.features(text)
+        ranked = sorted(skills, key=lambda s: (-skills[s], s))
+        email = first_match(EMAIL_RE, text) if "@" in text else None
+        phone = first_match(PHONE_RE, text, lambda p: len(NON_DIGIT_RE.sub("", p)) > 9)
+        return {
+            "Name": self.name(text, email),
+            "Email": email or "N/A",
+            "Phone": phone or "N/A",
+            "Experience": f"{years:g} Years" if years else "N/A",
+            "Skills": ", ".join(ranked[:MAX_SKILLS]) if ranked else "N/A",
+            "Source": "Offline",
+            "Profile": {"skills": ranked, "titles": sorted(titles), "years": years, "terms": terms},
+        }
+
+@functools.lru_cache(maxsize=None)
+def get_offline_extractor(path=TAXONOMY_PATH):
+    return OfflineExtractor(load_taxonomy(path))
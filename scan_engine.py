@@ -0,0 +1,1572 @@
+import imaplib
+import email
+from email.header import decode_header
+from email.utils import parsedate_to_datetime, decode_rfc2231
+import base64
+import quopri
+import re
+import json
+import time
+import zlib
+import os
+import random
+import select
+import ssl
+import hashlib
+import sqlite3
+import shutil
+import queue
+import threading
+import uuid
+import functools
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from urllib.parse import unquote
+from doc_parser import read_file_content, PROMPT_CHARS
+from offline_extract import get_offline_extractor
+from scan_metrics import ScanMetrics
+from matching import RoleMatcher, with_profile, brief
+
+# Scan pipeline shared by the dashboard, the CLI and background workers, so keep it free of Streamlit.
+# Provider SDKs and O365 are imported where first used: each costs 0.2-1.3 s cold.
+
+def shared(factory):
+    # Process-wide memo for long-lived resources (what st.cache_resource did inside the app)
+    made, lock = {}, threading.Lock()
+    @functools.wraps(factory)
+    def get(*args):
+        with lock:
+            if args not in made: made[args] = factory(*args)
+            return made[args]
+    get.clear = made.clear
+    return get
+
+# Parallel calls kept in flight and requests/minute allowed per AI engine
+ENGINE_LIMITS = {
+    "Claude": {"workers": 4, "rpm": 50},
+    "OpenAI": {"workers": 8, "rpm": 500},
+    "Gemini": {"workers": 2, "rpm": 10},
+}
+
+def engine_family(ai_engine):
+    if "Claude" in ai_engine: return "Claude"
+    elif "Gemini" in ai_engine: return "Gemini"
+    return "OpenAI"
+
+def get_timedelta(selection):
+    val = int(selection.split()[0])
+    unit = selection.split()[1].lower()
+    if "minute" in unit: return timedelta(minutes=val)
+    elif "hour" in unit: return timedelta(hours=val)
+    elif "day" in unit: return timedelta(days=val)
+    elif "week" in unit: return timedelta(weeks=val)
+    elif "month" in unit: return timedelta(days=val * 30)
+    return timedelta(days=1)
+
+# --- RATE LIMITING ---
+def parse_wait(value):
+    # Retry-After / reset headers come as seconds, ISO or HTTP dates, or durations like "6m0s"
+    if value is None: return None
+    value = str(value).strip()
+    try: return max(float(value), 0.0)
+    except ValueError: pass
+    try:
+        reset = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if reset.tzinfo is None: reset = reset.replace(tzinfo=timezone.utc)
+        return max((reset - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except ValueError: pass
+    try: return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except Exception: pass
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|s|m|h)', value)
+    if parts: return sum(float(n) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[u] for n, u in parts)
+    return None
+
+def is_rate_limited(error):
+    if getattr(error, "status_code", None) == 429: return True
+    error_msg = str(error).lower()
+    return "429" in error_msg or "rate limit" in error_msg or "resource exhausted" in error_msg
+
+class RateLimiter:
+    # Token bucket shared by every worker calling the same engine with the same key
+    def __init__(self, rpm, burst):
+        self.rate = rpm / 60.0
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Returns (seconds paced by the requests/minute budget, seconds held by a 429 backoff)
+        paced = backed_off = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return paced, backed_off
+                blocked = now < self.blocked_until
+                wait = min(max(self.blocked_until - now, (1 - self.tokens) / self.rate), 1.0)
+            time.sleep(wait)
+            if blocked: backed_off += wait
+            else: paced += wait
+
+    def backoff(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+    def observe(self, headers):
+        if not headers: return
+        remaining = headers.get("x-ratelimit-remaining-requests") or headers.get("anthropic-ratelimit-requests-remaining")
+        reset = headers.get("x-ratelimit-reset-requests") or headers.get("anthropic-ratelimit-requests-reset")
+        try:
+            if remaining is not None and int(remaining) <= 0: self.backoff(parse_wait(reset) or 1.0)
+        except ValueError: pass
+
+    def penalize(self, error, attempt):
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        wait = parse_wait(headers.get("retry-after-ms"))
+        wait = wait / 1000 if wait is not None else parse_wait(headers.get("retry-after"))
+        if wait is None:
+            hint = re.search(r'retry_delay\s*\{\s*seconds:\s*(\d+)', str(error))
+            wait = float(hint.group(1)) if hint else min(60.0, 2.0 ** (attempt + 2))
+        self.backoff(wait)
+        return wait
+
+@shared
+def get_rate_limiter(family, key):
+    limits = ENGINE_LIMITS[family]
+    return RateLimiter(limits["rpm"], limits["workers"])
+
+# --- EXTRACTION CACHE ---
+# Bump PROMPT_VERSION whenever the extraction prompt or the stored profile changes so stale answers are not reused
+PROMPT_VERSION = "v3"
+CACHE_DIR = os.environ.get("RECRUITER_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".recruiter_cache"))
+
+class ExtractionCache:
+    def __init__(self, path, max_age_days=30, max_bytes=50 * 1024 * 1024):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS extractions (key TEXT PRIMARY KEY, meta TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_extractions_accessed ON extractions(accessed)")
+        self.db.commit()
+        self.max_age = max_age_days * 86400
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.writes = 0
+        with self.lock: self._evict()
+
+    @staticmethod
+    def make_key(content_hash, ai_engine):
+        # Profiles do not depend on the JD, so a new or edited JD reuses every cached answer
+        h = hashlib.sha256()
+        for part in (bytes.fromhex(content_hash), engine_family(ai_engine).encode("utf-8"), PROMPT_VERSION.encode("utf-8")):
+            h.update(len(part).to_bytes(8, "big")); h.update(part)
+        return h.hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT meta FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.db.execute("UPDATE extractions SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, meta):
+        blob = json.dumps(meta)
+        now = time.time()
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?)", (key, blob, len(blob), now, now))
+            self.db.commit()
+            self.writes += 1
+            if self.writes % 100 == 0: self._evict()
+
+    def _evict(self):
+        # Age limit first, then drop least-recently-used rows until under the size budget
+        removed = self.db.execute("DELETE FROM extractions WHERE accessed < ?", (time.time() - self.max_age,)).rowcount
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        if total > self.max_bytes:
+            removed += self.db.execute("""
+                DELETE FROM extractions WHERE key IN (
+                    SELECT key FROM (SELECT key, size, SUM(size) OVER (ORDER BY accessed, key) AS running FROM extractions)
+                    WHERE running - size < ?)""", (total - self.max_bytes,)).rowcount
+        self.db.commit()
+        self.evictions += removed
+
+@shared
+def get_extraction_cache():
+    return ExtractionCache(os.path.join(CACHE_DIR, "extractions.db"))
+
+# --- LLM CLIENTS ---
+GEMINI_MODEL_CACHE = 16
+
+class GeminiClient:
+    # genai holds its API key globally, so reconfigure only when the key changes and keep
+    # one model per system prompt (the JD block) instead of rebuilding it per resume. Each model
+    # is bound to its key's service client under the lock; generate_content would otherwise
+    # bind, outside the lock, to whichever key another user configured last.
+    lock = threading.Lock()
+    active_key = None
+
+    def __init__(self, key):
+        self.key, self.models = key, {}
+
+    def generate(self, prompt, prefix=None):
+        import google.generativeai as genai
+        from google.generativeai import client as genai_client
+        with GeminiClient.lock:
+            if GeminiClient.active_key != self.key:
+                genai.configure(api_key=self.key)
+                GeminiClient.active_key = self.key
+            model = self.models.get(prefix)
+            if model is None:
+                if len(self.models) >= GEMINI_MODEL_CACHE: self.models.clear()
+                model = self.models[prefix] = genai.GenerativeModel('gemini-2.5-flash', generation_config={"response_mime_type": "application/json"}, system_instruction=prefix)
+                model._client = genai_client.get_default_generative_client()
+        return model.generate_content(prompt)
+
+@shared
+def get_llm_client(family, key):
+    # One client per (engine, key) for the life of the process, so every call after the first
+    # reuses the SDK's keep-alive connection pool instead of a fresh TCP + TLS handshake
+    if family == "Claude":
+        import anthropic
+        return anthropic.Anthropic(api_key=key, max_retries=0)
+    elif family == "Gemini":
+        return GeminiClient(key)
+    from openai import OpenAI
+    return OpenAI(api_key=key, max_retries=0)
+
+def llm_usage(family, response):
+    # Token counts from a provider response as {input, cached, cache_write, output}; "input"
+    # excludes cached tokens, which every provider bills at a lower rate
+    if family == "Claude":
+        u = getattr(response, "usage", None)
+        if u is None: return None
+        return {"input": u.input_tokens, "cached": getattr(u, "cache_read_input_tokens", 0) or 0,
+                "cache_write": getattr(u, "cache_creation_input_tokens", 0) or 0, "output": u.output_tokens}
+    elif family == "Gemini":
+        u = getattr(response, "usage_metadata", None)
+        if u is None: return None
+        cached = getattr(u, "cached_content_token_count", 0) or 0
+        return {"input": (u.prompt_token_count or 0) - cached, "cached": cached, "output": u.candidates_token_count or 0}
+    u = getattr(response, "usage", None)
+    if u is None: return None
+    cached = getattr(getattr(u, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+    return {"input": (u.prompt_tokens or 0) - cached, "cached": cached, "output": u.completion_tokens or 0}
+
+def call_llm(prompt, key, ai_engine, prefix=None, max_tokens=1000, notify=None, metrics=None):
+    # Returns the model's raw JSON text. `prefix` is the shared instructions/JD block, sent
+    # as the system prompt.
+    # `notify(message)` receives user-facing notices such as rate-limit backoffs; `metrics`
+    # collects request latency, limiter waits, retries and token usage.
+    family = engine_family(ai_engine)
+    limiter = get_rate_limiter(family, key)
+    metrics = metrics or ScanMetrics()
+    max_retries = 5
+    for attempt in range(max_retries):
+        try:
+            paced, backed_off = limiter.acquire()
+            if paced: metrics.observe("rate_limit_wait", paced)
+            if backed_off: metrics.observe("backoff_wait", backed_off)
+            client = get_llm_client(family, key)
+            with metrics.timer("llm"):
+                if family == "Claude":
+                    extra = {"system": prefix} if prefix else {}
+                    raw = client.messages.with_raw_response.create(
+                        model="claude-3-5-sonnet-20241022", max_tokens=max_tokens, temperature=0,
+                        messages=[{"role": "user", "content": prompt}], **extra
+                    )
+                    limiter.observe(raw.headers)
+                    response = raw.parse()
+                    raw_text = response.content[0].text.strip()
+                    if raw_text.startswith("```json"): raw_text = raw_text[7:-3].strip()
+                elif family == "Gemini":
+                    response = client.generate(prompt, prefix)
+                    raw_text = response.text
+                else:
+                    messages = ([{"role": "system", "content": prefix}] if prefix else []) + [{"role": "user", "content": prompt}]
+                    raw = client.chat.completions.with_raw_response.create(
+                        model="gpt-4o-mini", messages=messages, max_tokens=max_tokens, response_format={ "type": "json_object" } 
+                    )
+                    limiter.observe(raw.headers)
+                    response = raw.parse()
+                    raw_text = response.choices[0].message.content
+            metrics.add_usage(family, llm_usage(family, response))
+            return raw_text
+        except Exception as e:
+            if is_rate_limited(e):
+                metrics.count("llm_429")
+                if attempt < max_retries - 1:
+                    wait = limiter.penalize(e, attempt)
+                    metrics.count("llm_retries")
+                    if notify: notify(f"Speed Limit hit! Backing off {wait:.0f}s... (Attempt {attempt+1}/{max_retries})")
+                    continue 
+            metrics.count("llm_errors")
+            raise
+
+def normalize_meta(data, source):
+    return {
+        "Name": data.get("Name", "N/A"),
+        "Email": data.get("Email", "N/A"),
+        "Phone": data.get("Phone", "N/A"),
+        "Experience": str(data.get("Experience", "N/A")),
+        "Skills": str(data.get("Skills", "N/A")),
+        "Titles": str(data.get("Titles", "N/A")),
+        "Source": source
+    }
+
+def extract_details(text, key, ai_engine, notify=None, metrics=None):
+    # A JD-independent profile; matching.RoleMatcher scores it against JDs afterwards
+    metrics = metrics or ScanMetrics()
+    if key:
+        prompt = f"""
+        You are an expert IT Recruiter. Extract the candidate's profile from the following resume text.
+        Resume Text: {text[:PROMPT_CHARS]} 
+        Respond STRICTLY with a valid JSON object containing exactly these keys. Do not include markdown formatting or any other text.
+        {{
+            "Name": "candidate full name or N/A",
+            "Email": "email or N/A",
+            "Phone": "phone or N/A",
+            "Experience": "calculate total years, e.g. 7 Years, or N/A",
+            "Skills": "comma-separated list of up to 15 skills and technologies, most significant first, or N/A",
+            "Titles": "comma-separated list of job titles held, most recent first, or N/A"
+        }}
+        """
+        try: return normalize_meta(json.loads(call_llm(prompt, key, ai_engine, notify=notify, metrics=metrics)), engine_family(ai_engine))
+        except Exception as e:
+            metrics.count("ai_fallbacks")
+            if notify: notify(f"AI Error: {e}")
+
+    with metrics.timer("offline_extract"): return get_offline_extractor().extract(text)
+
+# --- ATTACHMENT STORE ---
+BLOB_DIR = os.path.join(CACHE_DIR, "blobs")
+BLOB_MAX_AGE = 24 * 3600
+RESULTS_DIR = os.path.join(CACHE_DIR, "results")
+
+class BlobStore:
+    # Content-addressed attachment files on local disk; candidates only carry the sha256 handle
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, handle):
+        return os.path.join(self.root, handle[:2], handle)
+
+    def put(self, data):
+        handle = hashlib.sha256(data).hexdigest()
+        path = self.path(handle)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "wb") as f: f.write(data)
+            os.replace(tmp, path)
+        else: os.utime(path)
+        return handle
+
+    def open(self, handle):
+        return open(self.path(handle), "rb")
+
+    def read(self, handle):
+        with self.open(handle) as f: return f.read()
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+def sweep_blob_dirs():
+    # Catches stores whose session ended without the finalizer running (crash, restart)
+    if not os.path.isdir(BLOB_DIR): return
+    cutoff = time.time() - BLOB_MAX_AGE
+    for name in os.listdir(BLOB_DIR):
+        path = os.path.join(BLOB_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff: shutil.rmtree(path, ignore_errors=True)
+        except OSError: pass
+
+@shared
+def get_result_blob_store():
+    # Attachments of scans run by the CLI or a worker; kept with the job results, not per session
+    return BlobStore(os.path.join(RESULTS_DIR, "blobs"))
+
+def sweep_result_blobs(max_age):
+    # Stored files are touched whenever a scan sees them again, so mtime tracks last use
+    cutoff = time.time() - max_age
+    for folder, _, files in os.walk(get_result_blob_store().root):
+        for name in files:
+            path = os.path.join(folder, name)
+            try:
+                if os.path.getmtime(path) < cutoff: os.remove(path)
+            except OSError: pass
+
+# --- DOCUMENT PARSING ---
+@shared
+def get_parse_pool():
+    return ProcessPoolExecutor(max_workers=max(1, min(4, os.cpu_count() or 1)))
+
+PARSE_POOL_LOCK = threading.Lock()
+
+def submit_parse(file_bytes, filename):
+    # A file that kills its worker breaks the whole pool; later files go to a fresh one
+    pool = get_parse_pool()
+    try: return pool, pool.submit(timed_parse, file_bytes, filename)
+    except BrokenProcessPool:
+        drop_parse_pool(pool)
+        pool = get_parse_pool()
+        return pool, pool.submit(timed_parse, file_bytes, filename)
+
+def drop_parse_pool(pool):
+    # The fetcher and the collector both notice a break; only the first replaces the pool
+    with PARSE_POOL_LOCK:
+        if get_parse_pool() is pool: get_parse_pool.clear()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def parse_alone(file_bytes, filename):
+    # Every file in flight fails with the one that crashed, so each is re-parsed in a pool of its
+    # own: a second crash there pins the culprit
+    with ProcessPoolExecutor(max_workers=1) as solo:
+        try: return solo.submit(timed_parse, file_bytes, filename).result()
+        except BrokenProcessPool: return "", 0.0
+
+def timed_parse(file_bytes, filename):
+    # Runs in a pool worker, so the time returned is parsing alone, not time spent queued
+    start = time.perf_counter()
+    return read_file_content(file_bytes, filename), time.perf_counter() - start
+
+def decode_fname(header_val):
+    if not header_val: return ""
+    decoded_list = decode_header(header_val)
+    filename = ""
+    for text, encoding in decoded_list:
+        if isinstance(text, bytes): filename += text.decode(encoding if encoding else "utf-8", errors="ignore")
+        else: filename += text
+    return filename
+
+# --- MAILBOX SYNC STATE ---
+class SyncState:
+    # Per-mailbox high-water marks: IMAP UIDVALIDITY + last UID, or a Graph delta link
+    FIELDS = ("uidvalidity", "last_uid", "delta_token")
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS sync_state (mailbox TEXT PRIMARY KEY, uidvalidity INTEGER, last_uid INTEGER, delta_token TEXT, updated REAL NOT NULL)")
+        self.db.commit()
+        self.lock = threading.Lock()
+
+    def get(self, mailbox):
+        with self.lock:
+            row = self.db.execute("SELECT uidvalidity, last_uid, delta_token FROM sync_state WHERE mailbox = ?", (mailbox,)).fetchone()
+        return dict(zip(self.FIELDS, row)) if row else None
+
+    def put(self, mailbox, **fields):
+        state = {**(self.get(mailbox) or dict.fromkeys(self.FIELDS)), **fields}
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?)", (mailbox, state["uidvalidity"], state["last_uid"], state["delta_token"], time.time()))
+            self.db.commit()
+
+@shared
+def get_sync_state():
+    return SyncState(os.path.join(CACHE_DIR, "sync_state.db"))
+
+def imap_status_code(mail, code):
+    try: return int((mail.response(code)[1] or [0])[0] or 0)
+    except (TypeError, ValueError): return 0
+
+# --- IMAP FETCHING ---
+IMAP_STRUCTURE_BATCH = 200
+IMAP_PART_BATCH = 25
+
+def imap_raw(data):
+    # imaplib splits literals into (prefix, bytes) tuples; stitch them back into one stream
+    out = bytearray()
+    for item in data:
+        if isinstance(item, tuple): out += item[0] + b"\r\n" + item[1] + b"\r\n"
+        elif item: out += item + b"\r\n"
+    return bytes(out)
+
+def imap_parse(raw):
+    # Minimal IMAP s-expression parser: lists -> list, NIL -> None, atoms/strings/literals -> bytes
+    stack, i, n = [[]], 0, len(raw)
+    while i < n:
+        c = raw[i:i+1]
+        if c in b" \r\n": i += 1
+        elif c == b"(": stack.append([]); i += 1
+        elif c == b")":
+            done = stack.pop(); stack[-1].append(done); i += 1
+        elif c == b'"':
+            j, buf = i + 1, bytearray()
+            while j < n and raw[j:j+1] != b'"':
+                if raw[j:j+1] == b"\\": j += 1
+                buf += raw[j:j+1]; j += 1
+            stack[-1].append(bytes(buf)); i = j + 1
+        elif c == b"{":
+            j = raw.index(b"}", i)
+            start = raw.index(b"\n", j) + 1
+            size = int(raw[i+1:j])
+            stack[-1].append(raw[start:start+size]); i = start + size
+        else:
+            j = i
+            while j < n and raw[j:j+1] not in b" ()\r\n":
+                if raw[j:j+1] == b"[": j = raw.index(b"]", j)
+                j += 1
+            atom = raw[i:j]
+            stack[-1].append(None if atom.upper() == b"NIL" else atom); i = j
+    while len(stack) > 1:
+        done = stack.pop(); stack[-1].append(done)
+    return stack[0]
+
+def imap_fetch_items(data):
+    # Yields one {ITEM: value} dict per message in a FETCH response
+    tokens = imap_parse(imap_raw(data))
+    for tok in tokens:
+        if isinstance(tok, list):
+            yield {bytes(k).upper(): v for k, v in zip(tok[::2], tok[1::2]) if isinstance(k, bytes)}
+
+def imap_params(value):
+    if not isinstance(value, list): return {}
+    return {k.decode("utf-8", "ignore").lower(): (v or b"").decode("utf-8", "ignore") for k, v in zip(value[::2], value[1::2]) if isinstance(k, bytes)}
+
+def rfc2231_value(value):
+    charset, _, text = decode_rfc2231(value)
+    return unquote(text, encoding=charset or "utf-8", errors="replace")
+
+def param_filename(params, name):
+    if name in params: return decode_fname(params[name])
+    if name + "*" in params: return rfc2231_value(params[name + "*"])
+    chunks = []
+    for k, v in params.items():
+        m = re.fullmatch(re.escape(name) + r'\*(\d+)(\*?)', k)
+        if m: chunks.append((int(m.group(1)), v, m.group(2)))
+    if not chunks: return ""
+    chunks.sort()
+    joined = "".join(v for _, v, _ in chunks)
+    return rfc2231_value(joined) if chunks[0][2] else joined
+
+def find_attachment_parts(struct, path=(), encapsulated=False):
+    # Walks a BODYSTRUCTURE and returns [(section, filename, encoding)] for pdf/docx attachments
+    if not isinstance(struct, list) or not struct: return []
+    if isinstance(struct[0], list):
+        found = []
+        for idx, child in enumerate(struct, 1):
+            if not isinstance(child, list): break
+            found += find_attachment_parts(child, path + (idx,))
+        return found
+    if encapsulated or not path: path = path + (1,)
+    ctype = b"/".join(x or b"" for x in struct[:2]).lower()
+    if ctype == b"message/rfc822" and len(struct) > 8 and isinstance(struct[8], list):
+        return find_attachment_parts(struct[8], path, encapsulated=True)
+    disposition = next((x for x in struct[7:] if isinstance(x, list) and len(x) == 2 and isinstance(x[0], bytes) and x[0].lower() in (b"attachment", b"inline")), None)
+    if not disposition or disposition[0].lower() != b"attachment": return []
+    filename = param_filename(imap_params(disposition[1]), "filename") or param_filename(imap_params(struct[2]), "name")
+    if not filename.lower().endswith(('.pdf', '.docx')): return []
+    return [(".".join(map(str, path)), filename, (struct[5] or b"7bit").decode().lower())]
+
+def decode_part(payload, encoding):
+    if encoding == "base64": return base64.b64decode(payload)
+    if encoding == "quoted-printable": return quopri.decodestring(payload)
+    return payload
+
+def imap_reply(data):
+    return b" ".join(x for x in data if isinstance(x, bytes)).decode(errors="replace") or "no reason given"
+
+def plan_imap_attachments(mail, uids, start_dt, end_dt):
+    # One batched BODYSTRUCTURE pass: which parts of which messages are worth downloading
+    plan = []
+    for i in range(0, len(uids), IMAP_STRUCTURE_BATCH):
+        chunk = b",".join(uids[i:i + IMAP_STRUCTURE_BATCH]).decode()
+        typ, data = mail.uid("FETCH", chunk, "(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (DATE)])")
+        # A rejected batch raises rather than being skipped, so callers keep their sync marks
+        if typ != "OK": raise imaplib.IMAP4.error(f"BODYSTRUCTURE fetch failed for {len(uids[i:i + IMAP_STRUCTURE_BATCH])} messages: {imap_reply(data)}")
+        for item in imap_fetch_items(data):
+            header = next((v for k, v in item.items() if k.startswith(b"BODY[HEADER")), None)
+            msg_date_header = email.message_from_bytes(header).get("Date") if header else None
+            msg_date = None
+            if msg_date_header:
+                try:
+                    msg_date = parsedate_to_datetime(msg_date_header).replace(tzinfo=None)
+                    if msg_date < start_dt or msg_date > end_dt: continue 
+                except: pass
+            parts = find_attachment_parts(item.get(b"BODYSTRUCTURE"))
+            if parts and item.get(b"UID"): plan.append((item[b"UID"], parts, msg_date))
+    order = {uid: idx for idx, uid in enumerate(uids)}
+    plan.sort(key=lambda p: order.get(p[0], 0))
+    return plan
+
+def fetch_imap_attachments(mail, plan):
+    # Downloads only the planned MIME parts, batching messages that need the same sections
+    groups = {}
+    for uid, parts, received in plan: groups.setdefault(tuple(p[0] for p in parts), []).append((uid, (parts, received)))
+    for sections, members in groups.items():
+        for i in range(0, len(members), IMAP_PART_BATCH):
+            batch = dict(members[i:i + IMAP_PART_BATCH])
+            items = " ".join(f"BODY.PEEK[{s}]" for s in sections)
+            typ, data = mail.uid("FETCH", b",".join(batch).decode(), f"(UID {items})")
+            if typ != "OK": raise imaplib.IMAP4.error(f"Attachment fetch failed for {len(batch)} messages: {imap_reply(data)}")
+            for item in imap_fetch_items(data):
+                parts, received = batch.get(item.get(b"UID"), (None, None))
+                if not parts: continue
+                for section, filename, encoding in parts:
+                    payload = item.get(f"BODY[{section}]".encode())
+                    if payload: yield filename, decode_part(payload, encoding), received
+
+# --- BATCHED EXTRACTION ---
+# No JD in the prefix: profiles are JD-independent, so one extraction serves every role
+BATCH_PREFIX = """You are an expert IT Recruiter. You will receive several resumes, each wrapped in <resume id="..."> tags. Extract the candidate's profile from every resume.
+Respond STRICTLY with a valid JSON object of the form {"results": [...]} holding one entry per resume. Do not include markdown formatting or any other text.
+Each entry must contain exactly these keys:
+{
+    "id": "the resume id exactly as given",
+    "Name": "candidate full name or N/A",
+    "Email": "email or N/A",
+    "Phone": "phone or N/A",
+    "Experience": "calculate total years, e.g. 7 Years, or N/A",
+    "Skills": "comma-separated list of up to 15 skills and technologies, most significant first, or N/A",
+    "Titles": "comma-separated list of job titles held, most recent first, or N/A"
+}"""
+
+def parse_batch(raw_text, ids):
+    data = json.loads(raw_text)
+    if isinstance(data, dict):
+        if set(data) <= set(ids): data = [{"id": k, **v} for k, v in data.items() if isinstance(v, dict)]
+        else: data = data.get("results") or data.get("candidates") or []
+    return {str(row.get("id")): row for row in data if isinstance(row, dict)}
+
+def extract_batch(texts, key, ai_engine, notify=None, metrics=None):
+    # One request for several resumes; returns one meta dict per text, in order. Unparseable
+    # batches are split in half, and entries the model skipped are retried on their own.
+    metrics = metrics or ScanMetrics()
+    if len(texts) == 1 or not key: return [extract_details(text, key, ai_engine, notify, metrics) for text in texts]
+    ids = [f"R{i + 1}" for i in range(len(texts))]
+    body = "\n\n".join(f'<resume id="{rid}">\n{text[:PROMPT_CHARS]}\n</resume>' for rid, text in zip(ids, texts))
+    try: found = parse_batch(call_llm(body, key, ai_engine, prefix=BATCH_PREFIX, max_tokens=500 * len(texts), notify=notify, metrics=metrics), ids)
+    except (ValueError, TypeError): found = {}
+    except Exception as e:
+        metrics.count("ai_fallbacks", len(texts))
+        if notify: notify(f"AI Error: {e}")
+        return [extract_details(text, None, ai_engine, metrics=metrics) for text in texts]
+    results = [None] * len(ids)
+    for i, rid in enumerate(ids):
+        try: results[i] = normalize_meta(found[rid], engine_family(ai_engine)) if rid in found else None
+        except (ValueError, TypeError): pass
+    missing = [i for i, meta in enumerate(results) if meta is None]
+    if missing:
+        metrics.count("batch_retries")
+        retry = [texts[i] for i in missing]
+        if len(missing) == len(texts):
+            mid = len(retry) // 2
+            redone = extract_batch(retry[:mid], key, ai_engine, notify, metrics) + extract_batch(retry[mid:], key, ai_engine, notify, metrics)
+        else: redone = extract_batch(retry, key, ai_engine, notify, metrics)
+        for i, meta in zip(missing, redone): results[i] = meta
+    return results
+
+# --- LOCAL PRE-RANKING ---
+def local_meta(job, metrics=None):
+    # Offline extraction, computed once per job however often it is ranked
+    if "Local" not in job:
+        start = time.perf_counter()
+        job["Local"] = {**get_offline_extractor().extract(job["Text"]), "Source": "Local"}
+        if metrics: metrics.observe("offline_extract", time.perf_counter() - start)
+    return job["Local"]
+
+def triage_jobs(jobs, matcher, key, triage=None, notify=None, metrics=None):
+    # Returns (jobs for the LLM, jobs scored locally only); `matcher` is the scan's RoleMatcher
+    mode = (triage or {}).get("mode", "all")
+    if key and mode == "all": return jobs, []
+    if not key or mode == "local": return [], jobs
+    if not jobs or not matcher: return jobs, []
+    if mode == "top":
+        # A resume's local score is its best role's, so one top-K cut serves every role
+        best = matcher.scores([local_meta(j, metrics)["Profile"] for j in jobs]).max(axis=0)
+        ranked = np.argsort(-best, kind="stable")[:triage["top_k"]]
+        send = [jobs[i] for i in ranked if best[i] >= triage["min_score"]]
+        chosen = set(map(id, send))
+        if notify: notify(f"🔎 Local pre-rank: sending {len(send)} of {len(jobs)} resumes to AI")
+        return send, [j for j in jobs if id(j) not in chosen]
+    if mode == "threshold":
+        # The streaming form of a top-K cut: each resume goes to the AI if its local score clears the bar
+        best = matcher.scores([local_meta(j, metrics)["Profile"] for j in jobs]).max(axis=0)
+        return [j for j, s in zip(jobs, best) if s >= triage["min_score"]], [j for j, s in zip(jobs, best) if s < triage["min_score"]]
+    return jobs, []
+
+# --- AI RE-RANK ---
+RERANK_TOP = 10
+RERANK_PREFIX = """You are an expert IT Recruiter. Score how well each candidate fits the job description below.
+Job Description: {jd}
+You will receive candidate profiles as JSON, each wrapped in <candidate id="..."> tags.
+Respond STRICTLY with a valid JSON object of the form {{"results": [...]}} holding one entry per candidate. Do not include markdown formatting or any other text.
+Each entry must contain exactly these keys:
+{{
+    "id": "the candidate id exactly as given",
+    "Match": integer from 0 to 100 representing JD fit
+}}"""
+
+def rerank(cands, matcher, key, ai_engine, top=RERANK_TOP, notify=None, metrics=None):
+    # Optional second opinion on the local shortlist: one small request per role over its top
+    # candidates' profiles (no resume text). Their score becomes the model's. Returns how many changed.
+    metrics = metrics or ScanMetrics()
+    done = 0
+    for name, jd in matcher.roles:
+        pick = sorted((c for c in cands if c.get("Role", name) == name), key=lambda c: c.get("Match %", 0), reverse=True)[:top]
+        if not pick: continue
+        ids = [f"C{i + 1}" for i in range(len(pick))]
+        body = "\n".join(f'<candidate id="{cid}">{json.dumps(brief(c))}</candidate>' for cid, c in zip(ids, pick))
+        try: found = parse_batch(call_llm(body, key, ai_engine, prefix=RERANK_PREFIX.format(jd=jd), max_tokens=40 * len(pick) + 50, notify=notify, metrics=metrics), ids)
+        except Exception as e:
+            metrics.count("rerank_errors")
+            if notify: notify(f"AI re-rank skipped: {e}")
+            continue
+        for cid, c in zip(ids, pick):
+            try: score = max(0, min(100, int(found[cid]["Match"])))
+            except (KeyError, TypeError, ValueError): continue
+            c["Match %"], c["Reranked"] = score, True
+            if "Matches" in c: c["Matches"][name] = score
+            done += 1
+    return done
+
+# --- DUPLICATE DETECTION ---
+MINHASH_PRIME = (1 << 31) - 1
+
+class DuplicateIndex:
+    # Exact copies by content hash; near-copies (re-sends, PDF vs DOCX of the same CV) by MinHash
+    # over word 5-shingles, with LSH banding so each new resume is only compared to likely matches.
+    def __init__(self, threshold=0.8, perms=64, bands=16):
+        rng = np.random.default_rng(7)
+        self.a = rng.integers(1, MINHASH_PRIME, perms, dtype=np.uint64)
+        self.b = rng.integers(0, MINHASH_PRIME, perms, dtype=np.uint64)
+        self.bands, self.rows = bands, perms // bands
+        self.threshold = threshold
+        self.by_hash, self.buckets, self.sigs = {}, {}, []
+
+    def signature(self, text):
+        words = re.findall(r'[a-z0-9]+', text.lower())
+        shingles = {" ".join(words[i:i + 5]) for i in range(max(1, len(words) - 4))}
+        hashes = np.array([zlib.crc32(x.encode("utf-8")) for x in shingles], dtype=np.uint64) % MINHASH_PRIME
+        return ((np.outer(hashes, self.a) + self.b) % MINHASH_PRIME).min(axis=0)
+
+    def add(self, content_hash, text):
+        # Returns (group id, True if this is the first copy of the resume seen)
+        if content_hash in self.by_hash: return self.by_hash[content_hash], False
+        sig = self.signature(text)
+        keys = [(band, sig[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+        for gid in sorted({gid for key in keys for gid in self.buckets.get(key, [])}):
+            if np.mean(self.sigs[gid] == sig) >= self.threshold:
+                self.by_hash[content_hash] = gid
+                return gid, False
+        gid = len(self.sigs)
+        self.sigs.append(sig)
+        self.by_hash[content_hash] = gid
+        for key in keys: self.buckets.setdefault(key, []).append(gid)
+        return gid, True
+
+def merge_duplicate(keep, dup):
+    # The group keeps its newest file; every other copy is linked under "Duplicates"
+    if (dup.get("Received") or datetime.min) > (keep.get("Received") or datetime.min):
+        keep["Duplicates"].append(keep["Filename"])
+        keep["Filename"], keep["Blob"], keep["Received"] = dup["Filename"], dup["Blob"], dup["Received"]
+    else: keep["Duplicates"].append(dup["Filename"])
+    if keep.get("Candidate"):
+        keep["Candidate"].update({"Filename": keep["Filename"], "Blob": keep["Blob"], "Received": keep["Received"], "Duplicates": list(keep["Duplicates"])})
+
+# --- SCAN PIPELINE ---
+PIPELINE_QUEUE_SIZE = 32
+
+def stream_scan(source, jd_text, key, ai_engine, workers=None, triage=None, batch_size=1, min_chars=5, expected=None, store=None, metrics=None, index=None):
+    # fetch -> parse -> extract -> emit. Fetching, parsing and AI calls run on background threads
+    # joined by bounded queues; this generator only relays their events so the caller can redraw.
+    # `source(emit)` yields (filename, bytes, received) and may emit its own progress events. It may
+    # also yield a checkpoint, a callable run on the caller's thread once every file yielded before
+    # it has been relayed as a candidate, collapsed as a duplicate or found unreadable.
+    # `index` (a candidate_index.IndexWriter) persists every scored candidate with its text.
+    # `jd_text` may hold several roles split by a --- line; each resume is scored against all of them.
+    metrics = metrics or ScanMetrics()
+    matcher = RoleMatcher(jd_text)
+    started = time.perf_counter()
+    events = queue.Queue()
+    notify = lambda message: events.put(("notice", message))
+    stop = threading.Event()
+    parse_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    work_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    workers = (workers or ENGINE_LIMITS[engine_family(ai_engine)]["workers"]) if key else 1
+    store = store or get_result_blob_store()
+    cache = get_extraction_cache() if key else None
+    # Only a top-K cut needs every resume before anything can be routed; local scores stream
+    hold_back = bool(matcher) and bool(key) and (triage or {}).get("mode", "all") == "top"
+    counts = {"Fetch": 0, "Parse": 0, "Score": 0, "Queued": 0, "Duplicates collapsed": 0}
+    dedup, groups = DuplicateIndex(), {}
+    lock = threading.Lock()
+    # Files finish out of order; `settled` holds those done ahead of the oldest unfinished one
+    order, settled, marks = {"fetched": 0, "settled": 0}, set(), []
+
+    def settle(seq=None):
+        with lock:
+            if seq is not None: settled.add(seq)
+            while order["settled"] in settled:
+                settled.remove(order["settled"])
+                order["settled"] += 1
+            while marks and marks[0][0] <= order["settled"]: events.put(("checkpoint", marks.pop(0)[1]))
+
+    def bump(stage, total=None, n=1):
+        with lock:
+            counts[stage] += n
+            done = counts[stage]
+            total = total if total is not None else {"Parse": counts["Fetch"], "Score": counts["Queued"]}.get(stage)
+        if stage != "Queued": events.put(("progress", stage, done, total))
+
+    def emit(job, meta):
+        bump("Score")
+        meta = with_profile(meta, job["Text"])
+        with lock: job["Candidate"] = to_candidate(meta, job)
+        matcher.apply([job["Candidate"]])
+        if index: index.add(job["Candidate"], job["Text"])
+        events.put(("candidate", job["Candidate"]))
+        settle(job["Seq"])
+
+    def fetcher():
+        try:
+            waited = time.perf_counter()
+            for item in source(events.put):
+                if callable(item):
+                    with lock: marks.append((order["fetched"], item))
+                    settle()
+                    continue
+                filename, file_bytes, received = item
+                metrics.observe("fetch", time.perf_counter() - waited)
+                metrics.count("attachment_bytes", len(file_bytes))
+                if stop.is_set(): break
+                parse_q.put((order["fetched"], filename, file_bytes, received) + submit_parse(file_bytes, filename))
+                order["fetched"] += 1
+                bump("Fetch", expected)
+                waited = time.perf_counter()
+        except Exception as e: events.put(("error", f"Fetch failed: {e}"))
+        finally: parse_q.put(None)
+
+    held, buffer = [], []
+    def route(jobs):
+        ai_jobs, local_only = triage_jobs(jobs, matcher, key, triage, notify, metrics)
+        bump("Queued", n=len(jobs))
+        if key and local_only: metrics.count("scored_locally", len(local_only))
+        for job in local_only: emit(job, local_meta(job, metrics))
+        for job in ai_jobs:
+            meta = None
+            if cache:
+                job["CacheKey"] = cache.make_key(job["Blob"], ai_engine)
+                meta = cache.get(job["CacheKey"])
+                metrics.count("cache_hits" if meta is not None else "cache_misses")
+            if meta is not None:
+                emit(job, meta)
+                continue
+            buffer.append(job)
+            if len(buffer) >= batch_size:
+                work_q.put(buffer[:]); buffer.clear()
+
+    def collector():
+        try:
+            while True:
+                item = parse_q.get()
+                if item is None: break
+                if stop.is_set(): continue
+                seq, filename, file_bytes, received, pool, fut = item
+                try:
+                    try: content, seconds = fut.result()
+                    except BrokenProcessPool:
+                        drop_parse_pool(pool)
+                        content, seconds = parse_alone(file_bytes, filename)
+                    metrics.observe("parse", seconds)
+                except Exception: content = ""
+                bump("Parse")
+                if len(content) <= min_chars:
+                    metrics.count("unreadable_documents")
+                    settle(seq)
+                    continue
+                job = {"Text": content, "Filename": filename, "Blob": store.put(file_bytes), "Received": received, "Duplicates": [], "Seq": seq}
+                # Copies are collapsed before they can cost an LLM call
+                gid, first = dedup.add(job["Blob"], content)
+                if not first:
+                    keep = groups[gid]
+                    with lock:
+                        kept_blob = keep["Blob"]
+                        merge_duplicate(keep, job)
+                        scored = keep.get("Candidate")
+                    if index and scored:
+                        if keep["Blob"] != kept_blob: index.drop(kept_blob)
+                        index.add(scored, keep["Text"])
+                    bump("Duplicates collapsed")
+                    metrics.count("duplicates_collapsed")
+                    settle(seq)
+                    continue
+                groups[gid] = job
+                if hold_back: held.append(job)
+                else: route([job])
+            if held and not stop.is_set(): route(held)
+            if buffer: work_q.put(buffer[:])
+        except Exception as e: events.put(("error", f"Parse failed: {e}"))
+        finally:
+            for _ in range(workers): work_q.put(None)
+
+    def extractor():
+        try:
+            while True:
+                batch = work_q.get()
+                if batch is None: break
+                if stop.is_set(): continue
+                with metrics.timer("extract"): metas = extract_batch([job["Text"] for job in batch], key, ai_engine, notify, metrics)
+                for job, meta in zip(batch, metas):
+                    # Cached with its profile, so a hit skips the taxonomy pass too
+                    meta = with_profile(meta, job["Text"])
+                    if cache and meta.get("Source") != "Offline": cache.put(job["CacheKey"], meta)
+                    emit(job, meta)
+        except Exception as e: events.put(("error", f"AI Error: {e}"))
+        finally: events.put(("worker_done",))
+
+    threads = [threading.Thread(target=fetcher, daemon=True), threading.Thread(target=collector, daemon=True)]
+    threads += [threading.Thread(target=extractor, daemon=True) for _ in range(workers)]
+    for t in threads: t.start()
+    finished = 0
+    try:
+        # Every other thread's events are queued before the last extractor signs off
+        while finished < workers:
+            event = events.get()
+            if event[0] == "worker_done": finished += 1
+            elif event[0] == "checkpoint":
+                # Reached only after the consumer has handled every candidate before it
+                try: event[1]()
+                except Exception as e: yield ("error", f"Saving the sync mark failed: {e}")
+            else: yield event
+        top = (triage or {}).get("rerank_top", 0)
+        if key and matcher and top:
+            scored = [job for job in groups.values() if job.get("Candidate")]
+            with metrics.timer("rerank"): changed = rerank([job["Candidate"] for job in scored], matcher, key, ai_engine, top, notify, metrics)
+            while not events.empty(): yield events.get()
+            if index:
+                for job in scored:
+                    if job["Candidate"].get("Reranked"): index.add(job["Candidate"], job["Text"])
+            if changed: yield ("notice", f"🤖 AI re-ranked the top {changed} candidates")
+    finally:
+        stop.set()
+        metrics.observe("pipeline", time.perf_counter() - started)
+        if index:
+            try: index.flush()
+            except Exception as e: events.put(("error", f"Saving candidates failed: {e}"))
+
+def to_candidate(meta, job):
+    return {
+        "Name": meta.get("Name", "Candidate"), "Email": meta.get("Email", "N/A"),
+        "Phone": meta.get("Phone", "N/A"), "Experience": meta.get("Experience", "N/A"),
+        "Skills": meta.get("Skills", "N/A"), "Match %": meta.get("Match %", 0),
+        "Filename": job["Filename"], "Blob": job["Blob"],
+        "Received": job.get("Received"), "Duplicates": list(job.get("Duplicates", [])),
+        "Profile": meta.get("Profile")
+    }
+
+def export_row(c):
+    return {"Score (%)": c.get('Match %', 0), "Name": c.get('Name', 'N/A'), "Phone": c.get('Phone', 'N/A'), "Email": c.get('Email', 'N/A'), "Experience": c.get('Experience', 'N/A'), "Skills": c.get('Skills', 'N/A')}
+
+def run_gmail_scan(user, password, start_dt, end_dt, jd_text, current_key, current_engine, workers=None, incremental=False, triage=None, batch_size=1, store=None, metrics=None, index=None):
+    metrics = metrics or ScanMetrics()
+    started = time.perf_counter()
+    mail = imaplib.IMAP4_SSL("imap.gmail.com")
+    try: mail.login(user, password)
+    except Exception as e:
+        yield ("status", f"Login Failed: {e}")
+        return
+    metrics.observe("login", time.perf_counter() - started)
+
+    mail.select("INBOX")
+    uidvalidity = imap_status_code(mail, "UIDVALIDITY")
+    uidnext = imap_status_code(mail, "UIDNEXT")
+    sync_key = f"gmail:{user.lower()}:INBOX"
+    state = get_sync_state().get(sync_key) if incremental else None
+    since_uid = 0
+    if state and state["uidvalidity"] == uidvalidity: since_uid = state["last_uid"] or 0
+    elif state: yield ("notice", "Mailbox UIDVALIDITY changed - running a full resync")
+
+    imap_after = (start_dt - timedelta(days=1)).strftime("%Y/%m/%d")
+    imap_before = (end_dt + timedelta(days=2)).strftime("%Y/%m/%d")
+    uid_range = f"UID {since_uid + 1}:* " if since_uid else ""
+    search_cmd = f'({uid_range}X-GM-RAW "(filename:pdf OR filename:docx) after:{imap_after} before:{imap_before}")'
+    with metrics.timer("search"): typ, data = mail.uid("SEARCH", None, search_cmd)
+    # "n:*" always matches the newest message, even when its UID is below n
+    uids = [uid for uid in (data[0] or b"").split() if int(uid) > since_uid]
+    high_water = max([uidnext - 1, since_uid] + [int(uid) for uid in uids])
+    
+    if not uids:
+        if incremental: get_sync_state().put(sync_key, uidvalidity=uidvalidity, last_uid=high_water)
+        mail.logout()
+        yield ("metrics", metrics.snapshot())
+        yield ("status", "No new resumes since last scan." if since_uid else "No resumes found.")
+        return
+
+    uids = list(reversed(uids))
+    try:
+        with metrics.timer("plan"): plan = plan_imap_attachments(mail, uids, start_dt, end_dt)
+    except imaplib.IMAP4.error as e:
+        mail.logout()
+        yield ("status", f"Fetch failed: {e}")
+        return
+    total_parts = sum(len(parts) for _, parts, _ in plan)
+    def source(emit):
+        try: yield from fetch_imap_attachments(mail, plan)
+        finally: mail.logout()
+
+    failed = False
+    for event in stream_scan(source, jd_text, current_key, current_engine, workers, triage, batch_size, min_chars=20, expected=total_parts, store=store, metrics=metrics, index=index):
+        failed = failed or event[0] == "error"
+        yield event
+    # A scan that lost messages to errors must not advance the high-water mark, and a full scan
+    # leaves it where the last incremental scan put it
+    if incremental and not failed: get_sync_state().put(sync_key, uidvalidity=uidvalidity, last_uid=high_water)
+    metrics.count("emails_matched", len(uids))
+    yield ("metrics", metrics.snapshot())
+    yield ("status", "Success")
+
+# --- OUTLOOK FETCHING ---
+OUTLOOK_PAGE_SIZE = 50
+OUTLOOK_DOWNLOAD_WORKERS = 8
+RESUME_CONTENT_TYPES = {"application/pdf": ".pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx"}
+
+def iter_outlook_messages(account_obj, start_dt, end_dt, resource=None, folder=None):
+    # Date range and hasAttachments are filtered by Graph; pages are pulled lazily with no cap.
+    # `resource` is a shared mailbox's address, `folder` a folder's display name (default: inbox).
+    mailbox = account_obj.mailbox(resource=resource) if resource else account_obj.mailbox()
+    inbox = mailbox.get_folder(folder_name=folder) if folder else mailbox.inbox_folder()
+    if inbox is None: raise ValueError(f"No folder named {folder}")
+    query = inbox.new_query().select("id", "subject", "receivedDateTime", "createdDateTime", "hasAttachments")
+    query = query.on_attribute("receivedDateTime").greater_equal(start_dt).chain("and").on_attribute("receivedDateTime").less_equal(end_dt)
+    query = query.chain("and").on_attribute("hasAttachments").equals(True)
+    return inbox.get_messages(limit=None, query=query, batch=OUTLOOK_PAGE_SIZE)
+
+def outlook_resume_attachments(account_obj, message_id, received=None, resource=None):
+    # Lists attachment metadata only, then pulls raw bytes for pdf/docx file attachments
+    base = f"{account_obj.protocol.service_url}{'users/' + resource if resource else 'me'}/messages/{message_id}/attachments"
+    listing = account_obj.con.get(base, params={"$select": "id,name,contentType,size"}).json()
+    found = []
+    for att in listing.get("value", []):
+        if att.get("@odata.type", "").lower() != "#microsoft.graph.fileattachment": continue
+        name = att.get("name") or ""
+        ext = RESUME_CONTENT_TYPES.get((att.get("contentType") or "").lower())
+        if not name.lower().endswith(('.pdf', '.docx')):
+            if not ext: continue
+            name += ext
+        file_bytes = account_obj.con.get(f"{base}/{att['id']}/$value").content
+        if file_bytes: found.append((name, file_bytes, received))
+    return found
+
+def finished_downloads(futures, metrics, on_error):
+    # (future, message id) pairs; a failed download is counted and handed to on_error, never dropped quietly
+    for fut, message_id in futures:
+        try: found = fut.result()
+        except Exception as e:
+            metrics.count("download_errors")
+            on_error(message_id, e)
+            continue
+        yield from found
+
+def outlook_downloads(account_obj, messages, start_dt, end_dt, metrics, on_error, on_message=None, resource=None, keep=None):
+    # Downloads run on a small pool while the message listing keeps paging; `keep` gets the last
+    # word on each in-range message. on_error(message id, exception) decides what a failed download means.
+    with ThreadPoolExecutor(max_workers=OUTLOOK_DOWNLOAD_WORKERS) as pool:
+        pending = {}
+        for msg in messages:
+            if on_message: on_message()
+            msg_date = getattr(msg, 'received', getattr(msg, 'created', None))
+            if msg_date:
+                msg_date = msg_date.replace(tzinfo=None)
+                if msg_date < start_dt or msg_date > end_dt: continue 
+                    
+            if getattr(msg, 'has_attachments', False) and (not keep or keep(msg)):
+                pending[pool.submit(metrics.timed, "download", outlook_resume_attachments, account_obj, msg.object_id, msg_date, resource)] = msg.object_id
+            ready = [(fut, pending.pop(fut)) for fut in [f for f in pending if f.done()]]
+            yield from finished_downloads(ready, metrics, on_error)
+        yield from finished_downloads(((fut, pending[fut]) for fut in as_completed(pending)), metrics, on_error)
+
+def outlook_sync_key(account_obj):
+    # Delta links belong to a mailbox, so the key is the signed-in user's Graph id; the app's
+    # client id is shared by everyone who signs in through the same registration
+    me = account_obj.con.get(f"{account_obj.protocol.service_url}me", params={"$select": "id,userPrincipalName"}).json()
+    return f"outlook:{me.get('id') or me['userPrincipalName'].lower()}:inbox"
+
+def iter_outlook_delta(account_obj, start_dt, cursor, notify=None):
+    # Walks a Graph messages delta query; cursor["delta_link"] is replaced by the new link when done
+    first_url = f"{account_obj.protocol.service_url}me/mailFolders/inbox/messages/delta"
+    first_params = {"$select": "id,subject,receivedDateTime,createdDateTime,hasAttachments", "$filter": f"receivedDateTime ge {start_dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}"}
+    inbox = account_obj.mailbox().inbox_folder()
+    url, params = (cursor["delta_link"], None) if cursor.get("delta_link") else (first_url, first_params)
+    while url:
+        try: data = account_obj.con.get(url, params=params, headers={"Prefer": "odata.maxpagesize=50"}).json()
+        except Exception as e:
+            if params is None and url == cursor.get("delta_link") and ("410" in str(e) or "syncstate" in str(e).lower()):
+                if notify: notify("Outlook sync token expired - running a full resync")
+                cursor["delta_link"] = None
+                url, params = first_url, first_params
+                continue
+            raise
+        params = None
+        for item in data.get("value", []):
+            if "@removed" not in item: yield inbox.message_constructor(parent=inbox, **{inbox._cloud_data_key: item})
+        url = data.get("@odata.nextLink")
+        if data.get("@odata.deltaLink"): cursor["delta_link"] = data["@odata.deltaLink"]
+
+def run_outlook_scan(account_obj, start_dt, end_dt, jd_text, current_key, current_engine, workers=None, incremental=False, triage=None, batch_size=1, store=None, metrics=None, index=None):
+    if not account_obj.is_authenticated:
+        yield ("status", "Please authenticate with Outlook first.")
+        return
+    metrics = metrics or ScanMetrics()
+    sync_key, cursor = None, None
+    if incremental:
+        try: sync_key = outlook_sync_key(account_obj)
+        except Exception as e:
+            yield ("status", f"Could not identify the signed-in Outlook mailbox: {e}")
+            return
+        cursor = {"delta_link": (get_sync_state().get(sync_key) or {}).get("delta_token")}
+    processed = 0
+
+    def checked(emit):
+        nonlocal processed
+        processed += 1
+        if processed % 25 == 0: emit(("progress", "Emails checked", processed, None))
+
+    def source(emit):
+        if cursor is not None: messages = iter_outlook_delta(account_obj, start_dt, cursor, lambda message: emit(("notice", message)))
+        else: messages = iter_outlook_messages(account_obj, start_dt, end_dt)
+        # A failed download is an error, so the delta link is not saved past the message
+        lost = lambda message_id, e: emit(("error", f"Download failed for an Outlook message: {e}"))
+        yield from outlook_downloads(account_obj, messages, start_dt, end_dt, metrics, lost, lambda: checked(emit))
+
+    found, failed = 0, False
+    for event in stream_scan(source, jd_text, current_key, current_engine, workers, triage, batch_size, min_chars=5, store=store, metrics=metrics, index=index):
+        found += event[0] == "candidate"
+        failed = failed or event[0] == "error"
+        yield event
+                            
+    if cursor and cursor.get("delta_link") and not failed: get_sync_state().put(sync_key, delta_token=cursor["delta_link"])
+    metrics.count("emails_checked", processed)
+    yield ("metrics", metrics.snapshot())
+    yield ("status", "Success" if found else f"Done! Scanned {processed} emails, but found 0 resumes.")
+
+# --- SHARDED SCANS ---
+SHARD_DAYS = 7
+SHARD_CONNECTIONS = 4
+SHARD_RETRIES = 1
+SHARD_PROGRESS_EVERY = 10
+
+def split_window(start_dt, end_dt, days):
+    # Consecutive, non-overlapping slices of at most `days`, newest first; 0 keeps the window whole
+    if not days: return [(start_dt, end_dt)]
+    slices, step, tick = [], timedelta(days=days), timedelta(microseconds=1)
+    while start_dt <= end_dt:
+        stop = min(start_dt + step - tick, end_dt)
+        slices.append((start_dt, stop))
+        start_dt = stop + tick
+    return slices[::-1]
+
+def plan_shards(mailboxes, start_dt, end_dt, days=SHARD_DAYS):
+    # One shard per (mailbox, folder, date slice). Mailboxes are dicts: {"provider": "gmail", "user",
+    # "password", "folders"} or {"provider": "outlook", "account", "resource", "folders"}.
+    shards = []
+    for lo, hi in split_window(start_dt, end_dt, days):
+        for box in mailboxes:
+            for folder in box.get("folders") or ["INBOX" if box["provider"] == "gmail" else None]:
+                owner = box.get("user") or box.get("resource") or "me"
+                label = f"{owner}/{folder or 'Inbox'} {lo:%Y-%m-%d}..{hi:%Y-%m-%d}"
+                shards.append({**box, "folder": folder, "start": lo, "end": hi, "label": label})
+    return shards
+
+def imap_quote(value):
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+class IMAPConnections:
+    # One logged-in connection per (shard thread, account), reused across that thread's shards.
+    # Gmail allows 15 simultaneous IMAP connections per account, well above SHARD_CONNECTIONS.
+    def __init__(self, passwords, metrics):
+        self.passwords, self.metrics = passwords, metrics
+        self.local, self.opened, self.refused = threading.local(), [], {}
+        self.lock = threading.Lock()
+
+    def get(self, user):
+        conns = self.local.__dict__.setdefault("conns", {})
+        if user in conns: return conns[user]
+        # A rejected password fails every later shard of the account at once, without another login
+        if user in self.refused: raise RuntimeError(f"Login Failed: {self.refused[user]}")
+        started = time.perf_counter()
+        mail = imaplib.IMAP4_SSL("imap.gmail.com")
+        with self.lock: self.opened.append(mail)
+        try: mail.login(user, self.passwords.get(user, ""))
+        except imaplib.IMAP4.error as e:
+            self.refused[user] = e
+            raise RuntimeError(f"Login Failed: {e}")
+        self.metrics.observe("login", time.perf_counter() - started)
+        conns[user] = mail
+        return mail
+
+    def discard(self, user):
+        mail = getattr(self.local, "conns", {}).pop(user, None)
+        if mail:
+            try: mail.logout()
+            except Exception: pass
+
+    def close(self):
+        with self.lock: opened, self.opened = self.opened, []
+        for mail in opened:
+            try: mail.logout()
+            except Exception: pass
+
+def gmail_shard_attachments(conns, shard, claim, metrics):
+    mail = conns.get(shard["user"])
+    typ, _ = mail.select(imap_quote(shard["folder"]))
+    if typ != "OK": raise ValueError(f"No folder named {shard['folder']}")
+    imap_after = (shard["start"] - timedelta(days=1)).strftime("%Y/%m/%d")
+    imap_before = (shard["end"] + timedelta(days=2)).strftime("%Y/%m/%d")
+    with metrics.timer("search"): typ, data = mail.uid("SEARCH", None, f'(X-GM-RAW "(filename:pdf OR filename:docx) after:{imap_after} before:{imap_before}")')
+    uids = list(reversed((data[0] or b"").split()))
+    # Searches are padded by a day either side; the Date header decides which shard owns a message
+    with metrics.timer("plan"): plan = plan_imap_attachments(mail, uids, shard["start"], shard["end"])
+    yield from fetch_imap_attachments(mail, [p for p in plan if claim(("gmail", shard["user"], shard["folder"], p[0]))])
+
+def outlook_shard_attachments(shard, claim, metrics):
+    account_obj, resource = shard["account"], shard.get("resource")
+    if not account_obj.is_authenticated: raise RuntimeError("Please authenticate with Outlook first.")
+    messages = iter_outlook_messages(account_obj, shard["start"], shard["end"], resource, shard["folder"])
+    # Claimed only once in range, so a message listed by a neighbouring slice is left to its owner.
+    # Failed downloads fail the shard once the rest are delivered.
+    lost = []
+    yield from outlook_downloads(account_obj, messages, shard["start"], shard["end"], metrics, lambda message_id, e: lost.append(e), resource=resource,
+                                 keep=lambda m: claim(("outlook", resource, m.object_id)))
+    if lost: raise RuntimeError(f"{len(lost)} attachment downloads failed: {lost[0]}")
+
+def run_sharded_scan(mailboxes, start_dt, end_dt, jd_text, current_key, current_engine, workers=None, triage=None, batch_size=1, store=None, metrics=None, index=None,
+                     shard_days=SHARD_DAYS, connections=SHARD_CONNECTIONS):
+    # Several accounts, shared mailboxes and folders, with long windows split into date slices,
+    # fetched by a pool of `connections` shard threads into one pipeline: a single duplicate
+    # index and extraction stage, so the candidate list comes out merged. A failing shard is
+    # retried once if it had not delivered anything yet, then reported without stopping the rest.
+    metrics = metrics or ScanMetrics()
+    shards = plan_shards(mailboxes, start_dt, end_dt, shard_days)
+    if not shards:
+        yield ("status", "No mailboxes to scan.")
+        return
+    for shard in shards: yield ("shard", shard["label"], "queued", 0, "")
+    conns = IMAPConnections({box["user"]: box.get("password", "") for box in mailboxes if box["provider"] == "gmail"}, metrics)
+    claimed, claim_lock, outcome = set(), threading.Lock(), {}
+
+    def source(emit):
+        out, cancel = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE), threading.Event()
+
+        def put(item):
+            while not cancel.is_set():
+                try: return out.put(item, timeout=0.5)
+                except queue.Full: continue
+
+        def run(shard):
+            label, found, started = shard["label"], 0, time.perf_counter()
+            try:
+                if cancel.is_set(): return
+                emit(("shard", label, "running", 0, ""))
+                for attempt in range(SHARD_RETRIES + 1):
+                    mine = []
+                    def claim(key):
+                        with claim_lock:
+                            if key in claimed: return False
+                            claimed.add(key)
+                        mine.append(key)
+                        return True
+                    try:
+                        if shard["provider"] == "gmail": attachments = gmail_shard_attachments(conns, shard, claim, metrics)
+                        else: attachments = outlook_shard_attachments(shard, claim, metrics)
+                        for item in attachments:
+                            if cancel.is_set(): return
+                            put(item)
+                            found += 1
+                            if found % SHARD_PROGRESS_EVERY == 0: emit(("shard", label, "running", found, ""))
+                        outcome[label] = ("done", found, "")
+                        emit(("shard", label, "done", found, ""))
+                        return
+                    except Exception as e:
+                        if shard["provider"] == "gmail": conns.discard(shard["user"])
+                        # Messages this attempt claimed but never delivered are free for the retry
+                        with claim_lock: claimed.difference_update(mine)
+                        # Only a shard that has handed nothing on can start over without repeats
+                        if found or attempt == SHARD_RETRIES:
+                            metrics.count("shards_failed")
+                            outcome[label] = ("failed", found, str(e))
+                            emit(("shard", label, "failed", found, str(e)))
+                            return
+                        metrics.count("shard_retries")
+                        emit(("shard", label, "retrying", 0, str(e)))
+            finally:
+                metrics.observe("shard", time.perf_counter() - started)
+                put(None)
+
+        pool = ThreadPoolExecutor(max_workers=connections)
+        try:
+            for shard in shards: pool.submit(run, shard)
+            remaining = len(shards)
+            while remaining:
+                item = out.get()
+                if item is None: remaining -= 1
+                else: yield item
+        finally:
+            cancel.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+            conns.close()
+
+    for event in stream_scan(source, jd_text, current_key, current_engine, workers, triage, batch_size, min_chars=5, store=store, metrics=metrics, index=index):
+        yield event
+    metrics.count("shards", len(shards))
+    yield ("metrics", metrics.snapshot())
+    failed = [(label, detail) for label, (state, _, detail) in outcome.items() if state == "failed"]
+    if not failed: yield ("status", "Success")
+    else: yield ("status", f"Finished with {len(failed)} of {len(shards)} shards failed: " + "; ".join(f"{label} ({detail})" for label, detail in failed[:3]))
+
+# --- CONTINUOUS INGESTION ---
+# A watch is the scan pipeline over a source that waits for new mail instead of ending. During a
+# burst the pipeline's bounded queues stall the source, so mail waits on the server while the AI
+# works through it at the rate limiter's pace.
+# IDLE is re-issued well inside Gmail's 29-minute limit, and each round's progress event doubles
+# as a background job's heartbeat (job_queue.JOB_STALE_AFTER).
+WATCH_IDLE_SECONDS = 5 * 60
+WATCH_POLL_SECONDS = 60
+WATCH_WAKE_SECONDS = 1.0
+WATCH_FETCH_BATCH = 50
+WATCH_BACKOFF = (5, 300)
+WATCH_SEEN_IDS = 5000
+
+def backoff_delay(failures):
+    # Exponential with jitter, so watchers that lost the same server do not all return at once
+    low, high = WATCH_BACKOFF
+    return min(high, low * 2 ** (failures - 1)) * random.uniform(0.5, 1.0)
+
+def imap_buffered(mail):
+    # peek() fills an empty buffer with a blocking read, so it runs with the socket non-blocking
+    timeout = mail.sock.gettimeout()
+    mail.sock.settimeout(0.0)
+    try: return bool(mail.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError): return False
+    finally: mail.sock.settimeout(timeout)
+
+def imap_idle(mail, seconds, halt):
+    # RFC 2177 IDLE by hand (imaplib has no idle() before Python 3.14). True once the server
+    # reports new mail; False after `seconds` or when `halt` is set.
+    tag = mail._new_tag()
+    mail.send(tag + b" IDLE\r\n")
+    if not mail.readline().startswith(b"+"): raise imaplib.IMAP4.error("Server refused IDLE")
+    deadline, arrived = time.monotonic() + seconds, False
+    while not arrived and not halt.is_set() and time.monotonic() < deadline:
+        # imaplib's reader or TLS can already hold bytes the socket no longer reports as readable
+        if not (imap_buffered(mail) or select.select([mail.sock], [], [], WATCH_WAKE_SECONDS)[0]): continue
+        line = mail.readline()
+        if not line: raise imaplib.IMAP4.abort("Connection closed while idling")
+        arrived = line.rstrip().upper().endswith(b"EXISTS")
+    mail.send(b"DONE\r\n")
+    while True:
+        line = mail.readline()
+        if not line: raise imaplib.IMAP4.abort("Connection closed while idling")
+        if line.startswith(tag): break
+        arrived = arrived or line.rstrip().upper().endswith(b"EXISTS")
+    mail.tagged_commands.pop(tag, None)
+    return arrived
+
+def watch_gmail_source(user, password, halt, metrics):
+    # source(emit) that catches up from the inbox's saved UID high-water mark, then IDLEs until
+    # new mail arrives. The mark moves once every resume in a slice of messages has been scored and
+    # saved, so a restarted watch fetches again whatever was still in flight. A rejected password
+    # ends the watch; anything else reconnects.
+    sync_key = f"gmail:{user.lower()}:INBOX"
+
+    def source(emit):
+        failures, rounds = 0, 0
+        while not halt.is_set():
+            mail = None
+            try:
+                started = time.perf_counter()
+                mail = imaplib.IMAP4_SSL("imap.gmail.com")
+                try: mail.login(user, password)
+                except imaplib.IMAP4.error as e: raise RuntimeError(f"Login Failed: {e}")
+                metrics.observe("login", time.perf_counter() - started)
+                mail.select("INBOX")
+                uidvalidity, uidnext = imap_status_code(mail, "UIDVALIDITY"), imap_status_code(mail, "UIDNEXT")
+                state = get_sync_state().get(sync_key)
+                if state and state["uidvalidity"] == uidvalidity: last_uid = state["last_uid"] or 0
+                else:
+                    # First watch of this inbox, or its UIDs were reset: only mail from now on
+                    if state: emit(("notice", "Mailbox UIDVALIDITY changed - watching for new mail from now"))
+                    last_uid = max(uidnext - 1, 0)
+                    get_sync_state().put(sync_key, uidvalidity=uidvalidity, last_uid=last_uid)
+                if failures: emit(("notice", "📡 Reconnected to Gmail"))
+                failures = 0
+                while not halt.is_set():
+                    with metrics.timer("search"): typ, data = mail.uid("SEARCH", None, f'(UID {last_uid + 1}:* X-GM-RAW "filename:pdf OR filename:docx")')
+                    uids = sorted((uid for uid in (data[0] or b"").split() if int(uid) > last_uid), key=int)
+                    for i in range(0, len(uids), WATCH_FETCH_BATCH):
+                        chunk = uids[i:i + WATCH_FETCH_BATCH]
+                        with metrics.timer("plan"): plan = plan_imap_attachments(mail, chunk, datetime.min, datetime.max)
+                        yield from fetch_imap_attachments(mail, plan)
+                        last_uid = int(chunk[-1])
+                        yield functools.partial(get_sync_state().put, sync_key, uidvalidity=uidvalidity, last_uid=last_uid)
+                        metrics.count("emails_matched", len(chunk))
+                    rounds += 1
+                    emit(("progress", "Inbox checks", rounds, None))
+                    emit(("metrics", metrics.snapshot()))
+                    imap_idle(mail, WATCH_IDLE_SECONDS, halt)
+            except (imaplib.IMAP4.error, OSError) as e:
+                failures += 1
+                delay = backoff_delay(failures)
+                metrics.count("reconnects")
+                emit(("notice", f"⚠️ Gmail connection lost ({e}) - reconnecting in {delay:.0f}s"))
+                emit(("progress", "Reconnects", failures, None))
+                halt.wait(delay)
+            finally:
+                if mail:
+                    try: mail.logout()
+                    except Exception: pass
+    return source
+
+def watch_outlook_source(account_obj, halt, metrics, poll=WATCH_POLL_SECONDS):
+    # source(emit) that polls the inbox's Graph delta link every `poll` seconds, starting from the
+    # link an incremental scan or earlier watch saved. Delta also reports read and flag changes,
+    # so recently seen messages are skipped. A round with a failed download keeps the old link and
+    # forgets the messages it did not finish, so the next poll lists them again. A round's link is
+    # saved once its resumes are scored, like the Gmail watch's UID mark.
+
+    def source(emit):
+        sync_key, cursor = None, None
+        seen, since, failures, rounds = {}, datetime.now(), 0, 0
+
+        def fresh(msg):
+            if msg.object_id in seen or msg.object_id in listed: return False
+            listed[msg.object_id] = True
+            return True
+
+        while not halt.is_set():
+            try:
+                if not account_obj.is_authenticated: raise RuntimeError("Please authenticate with Outlook first.")
+                if sync_key is None:
+                    sync_key = outlook_sync_key(account_obj)
+                    cursor = {"delta_link": (get_sync_state().get(sync_key) or {}).get("delta_token")}
+                listed, lost, prior = {}, {}, cursor["delta_link"]
+                messages = iter_outlook_delta(account_obj, since, cursor, lambda message: emit(("notice", message)))
+                yield from outlook_downloads(account_obj, messages, datetime.min, datetime.max, metrics, lost.__setitem__, keep=fresh)
+                for message_id in lost: listed.pop(message_id)
+                seen.update(listed)
+                while len(seen) > WATCH_SEEN_IDS: seen.pop(next(iter(seen)))
+                if lost:
+                    cursor["delta_link"] = prior
+                    emit(("notice", f"⚠️ {len(lost)} Outlook download(s) failed ({next(iter(lost.values()))}) - retrying at the next poll"))
+                else: yield functools.partial(get_sync_state().put, sync_key, delta_token=cursor["delta_link"])
+                if failures: emit(("notice", "📡 Reconnected to Outlook"))
+                failures, rounds = 0, rounds + 1
+                emit(("progress", "Inbox checks", rounds, None))
+                emit(("metrics", metrics.snapshot()))
+                halt.wait(poll)
+            except OSError as e:
+                failures += 1
+                delay = backoff_delay(failures)
+                metrics.count("reconnects")
+                emit(("notice", f"⚠️ Outlook request failed ({e}) - retrying in {delay:.0f}s"))
+                emit(("progress", "Reconnects", failures, None))
+                halt.wait(delay)
+    return source
+
+def watch_scan(source, halt, jd_text, current_key, current_engine, workers=None, triage=None, batch_size=1, store=None, metrics=None, index=None):
+    # Runs until `halt` is set (resumes already fetched are still scored), the source gives up, or
+    # the caller stops iterating. Candidates are saved to the index as they arrive.
+    metrics = metrics or ScanMetrics()
+    triage = {k: v for k, v in (triage or {}).items() if k != "rerank_top"}
+    if triage.get("mode") == "top":
+        # A top-K cut needs the whole batch up front; a stream can only apply the score bar
+        triage = {"mode": "threshold", "min_score": triage.get("min_score", 0)}
+        yield ("notice", f"🔎 Watching: resumes scoring {triage['min_score']}+ locally go to AI")
+    failed = None
+    try:
+        for event in stream_scan(source, jd_text, current_key, current_engine, workers, triage, batch_size, min_chars=20, store=store, metrics=metrics, index=index):
+            if event[0] == "error": failed = event[1]
+            yield event
+            if index and event[0] == "candidate": index.flush()
+    finally:
+        halt.set()
+    yield ("metrics", metrics.snapshot())
+    yield ("status", f"Watch ended: {failed}" if failed else "Watch stopped")
+
+def watch_gmail_inbox(user, password, jd_text, current_key, current_engine, workers=None, triage=None, batch_size=1, store=None, metrics=None, index=None, stop=None):
+    metrics, stop = metrics or ScanMetrics(), stop or threading.Event()
+    return watch_scan(watch_gmail_source(user, password, stop, metrics), stop, jd_text, current_key, current_engine, workers, triage, batch_size, store, metrics, index)
+
+def watch_outlook_inbox(account_obj, jd_text, current_key, current_engine, workers=None, triage=None, batch_size=1, store=None, metrics=None, index=None, stop=None, poll=WATCH_POLL_SECONDS):
+    metrics, stop = metrics or ScanMetrics(), stop or threading.Event()
+    return watch_scan(watch_outlook_source(account_obj, stop, metrics, poll), stop, jd_text, current_key, current_engine, workers, triage, batch_size, store, metrics, index)
+
+# --- HEADLESS DRIVER ---
+class ScanProgress:
+    # Callback interface for whatever drives a scan (dashboard, CLI, worker). Hooks run on the
+    # thread that called drive_scan, never on pipeline threads; unneeded hooks can be left alone.
+    def on_progress(self, stage, done, total): pass
+    def on_candidate(self, candidate): pass
+    def on_notice(self, message): pass
+    def on_error(self, message): pass
+    def on_status(self, status): pass
+    def on_metrics(self, snapshot): pass
+    def on_shard(self, label, state, found, detail): pass
+
+def drive_scan(events, progress):
+    # Feeds a scan's event stream to `progress` and returns the final status
+    status = None
+    for event in events:
+        kind = event[0]
+        if kind == "progress": progress.on_progress(*event[1:])
+        elif kind == "candidate": progress.on_candidate(event[1])
+        elif kind == "notice": progress.on_notice(event[1])
+        elif kind == "error": progress.on_error(event[1])
+        elif kind == "metrics": progress.on_metrics(event[1])
+        elif kind == "shard": progress.on_shard(*event[1:])
+        elif kind == "status":
+            status = event[1]
+            progress.on_status(status)
+    return status
+
+def scan_events(provider, params, store=None, index=None, stop=None):
+    # Builds a scan from plain, JSON-safe parameters so it can be queued or run from a shell.
+    # Missing secrets fall back to the environment of the process running the scan.
+    # `index` is a candidate index; results are saved under params["owner"].
+    # "multi" scans params["mailboxes"] in shards; Gmail passwords may also come from
+    # RECRUITER_EMAIL_PASSWORDS, a JSON object of address -> app password.
+    # params["watch"] keeps a Gmail or Outlook inbox under watch until `stop` is set.
+    start_dt, end_dt = datetime.fromisoformat(params["start"]), datetime.fromisoformat(params["end"])
+    key = params.get("api_key") or os.environ.get("RECRUITER_API_KEY") or None
+    options = (params.get("jd", ""), key, params.get("engine", "OpenAI"), params.get("workers"), params.get("incremental", False), params.get("triage"), params.get("batch_size", 1))
+    writer = index.writer(params.get("owner", ""), params.get("jd", "")) if index else None
+    if provider == "gmail":
+        password = params.get("password") or os.environ.get("RECRUITER_EMAIL_PASSWORD", "")
+        if params.get("watch"): return watch_gmail_inbox(params["user"], password, *options[:4], *options[5:], store=store, index=writer, stop=stop)
+        return run_gmail_scan(params["user"], password, start_dt, end_dt, *options, store=store, index=writer)
+    elif provider == "outlook":
+        from O365 import Account
+        secret = params.get("client_secret") or os.environ.get("RECRUITER_CLIENT_SECRET", "")
+        if params.get("watch"): return watch_outlook_inbox(Account((params["client_id"], secret)), *options[:4], *options[5:], store=store, index=writer, stop=stop)
+        return run_outlook_scan(Account((params["client_id"], secret)), start_dt, end_dt, *options, store=store, index=writer)
+    elif provider == "multi":
+        passwords, accounts, mailboxes = json.loads(os.environ.get("RECRUITER_EMAIL_PASSWORDS") or "{}"), {}, []
+        for box in params["mailboxes"]:
+            if box["provider"] == "gmail":
+                mailboxes.append({**box, "password": box.get("password") or passwords.get(box["user"]) or os.environ.get("RECRUITER_EMAIL_PASSWORD", "")})
+                continue
+            from O365 import Account
+            client_id = box.get("client_id") or params.get("client_id")
+            if client_id not in accounts:
+                accounts[client_id] = Account((client_id, box.get("client_secret") or params.get("client_secret") or os.environ.get("RECRUITER_CLIENT_SECRET", "")))
+            mailboxes.append({**box, "account": accounts[client_id]})
+        return run_sharded_scan(mailboxes, start_dt, end_dt, params.get("jd", ""), key, params.get("engine", "OpenAI"), params.get("workers"), params.get("triage"), params.get("batch_size", 1), store=store, index=writer,
+                                shard_days=params.get("shard_days", SHARD_DAYS), connections=params.get("connections", SHARD_CONNECTIONS))
+    raise ValueError(f"Unknown provider: {provider}")
@@ -0,0 +1,127 @@
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager
+
+# Per-scan instrumentation shared by every pipeline thread of one scan: stage timers, event
+# counters and LLM token usage. Snapshots are plain dicts, so they can be stored with a job
+# and exported later as JSON or Prometheus text.
+METRIC_PREFIX = "recruiter_scan"
+SAMPLE_LIMIT = 5000
+# USD per million tokens. List prices for the models call_llm uses; update when they change.
+ENGINE_PRICES = {
+    "Claude": {"input": 3.00, "cached": 0.30, "cache_write": 3.75, "output": 15.00},
+    "OpenAI": {"input": 0.15, "cached": 0.075, "cache_write": 0.15, "output": 0.60},
+    "Gemini": {"input": 0.30, "cached": 0.075, "cache_write": 0.30, "output": 2.50},
+}
+TOKEN_KINDS = ("input", "cached", "cache_write", "output")
+# What each stage timer covers, for the dashboard and the exported help text
+STAGES = {
+    "login": "IMAP login",
+    "search": "IMAP search for messages with attachments",
+    "plan": "IMAP BODYSTRUCTURE pass",
+    "download": "Graph attachment listing and download, per message",
+    "fetch": "Wait for the next attachment from the mailbox",
+    "parse": "PDF/DOCX text extraction in a pool worker",
+    "offline_extract": "Offline extraction of a resume's profile",
+    "extract": "One AI extraction batch, retries included",
+    "llm": "One LLM request",
+    "rate_limit_wait": "Held by the requests/minute budget",
+    "backoff_wait": "Held by a 429 backoff",
+    "rerank": "AI second opinion on the top local matches",
+    "shard": "One mailbox/folder/date shard of a sharded scan, retries included",
+    "pipeline": "Whole scan pipeline",
+}
+
+class ScanMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started, self.clock = time.time(), time.perf_counter()
+        self.timers, self.counters, self.tokens = {}, {}, {}
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            t = self.timers.setdefault(stage, {"count": 0, "total": 0.0, "max": 0.0, "samples": []})
+            t["count"] += 1
+            t["total"] += seconds
+            t["max"] = max(t["max"], seconds)
+            # Reservoir sample keeps percentiles honest on long scans without unbounded memory
+            if len(t["samples"]) < SAMPLE_LIMIT: t["samples"].append(seconds)
+            else:
+                slot = random.randrange(t["count"])
+                if slot < SAMPLE_LIMIT: t["samples"][slot] = seconds
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try: yield
+        finally: self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage, fn, *args):
+        with self.timer(stage): return fn(*args)
+
+    def count(self, name, n=1):
+        with self.lock: self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_usage(self, family, usage):
+        if not usage: return
+        with self.lock:
+            t = self.tokens.setdefault(family, {"requests": 0, **{k: 0 for k in TOKEN_KINDS}})
+            t["requests"] += 1
+            for k in TOKEN_KINDS: t[k] += int(usage.get(k) or 0)
+
+    def snapshot(self):
+        with self.lock:
+            stages = {}
+            for stage, t in self.timers.items():
+                samples = sorted(t["samples"])
+                pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+                stages[stage] = {"count": t["count"], "total_s": t["total"], "mean_s": t["total"] / t["count"],
+                                 "p50_s": pick(0.5), "p95_s": pick(0.95), "max_s": t["max"]}
+            tokens = {}
+            for family, t in self.tokens.items():
+                prices = ENGINE_PRICES.get(family, {})
+                tokens[family] = {**t, "cost_usd": sum(t[k] * prices.get(k, 0.0) for k in TOKEN_KINDS) / 1e6}
+            return {"started": self.started, "elapsed_s": time.perf_counter() - self.clock, "stages": stages,
+                    "counters": dict(self.counters), "tokens": tokens, "cost_usd": sum(t["cost_usd"] for t in tokens.values())}
+
+def summary(snapshot):
+    # One line for logs and the CLI
+    stages = snapshot.get("stages", {})
+    busiest = sorted(((s["total_s"], name) for name, s in stages.items() if name != "pipeline"), reverse=True)[:3]
+    tokens = sum(t["input"] + t["cached"] + t["cache_write"] + t["output"] for t in snapshot.get("tokens", {}).values())
+    parts = [f"{snapshot.get('elapsed_s', 0):.1f}s", ", ".join(f"{name} {total:.1f}s" for total, name in busiest) or "no stage timings"]
+    if tokens: parts.append(f"{tokens} tokens, ${snapshot.get('cost_usd', 0):.4f}")
+    return " | ".join(parts)
+
+def to_json(snapshot):
+    return json.dumps(snapshot, indent=1, sort_keys=True)
+
+def label_text(labels):
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}" if labels else ""
+
+def sample_text(value):
+    # Counters are written exactly; floats with repr, the shortest text that reads back the same
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+def to_prometheus(snapshot, labels=None):
+    # Text exposition format; `labels` (e.g. job and provider) are added to every sample
+    base = dict(labels or {})
+    line = lambda name, value, **extra: f"{METRIC_PREFIX}_{name}{label_text({**base, **extra})} {sample_text(value)}"
+    out = [f"# HELP {METRIC_PREFIX}_stage_seconds Time spent per scan stage.", f"# TYPE {METRIC_PREFIX}_stage_seconds summary"]
+    for stage, s in sorted(snapshot.get("stages", {}).items()):
+        out += [line("stage_seconds", s["p50_s"], stage=stage, quantile="0.5"), line("stage_seconds", s["p95_s"], stage=stage, quantile="0.95"),
+                line("stage_seconds_sum", s["total_s"], stage=stage), line("stage_seconds_count", s["count"], stage=stage)]
+    out += [f"# HELP {METRIC_PREFIX}_events_total Scan events: cache hits, retries, 429s, duplicates.", f"# TYPE {METRIC_PREFIX}_events_total counter"]
+    out += [line("events_total", n, event=name) for name, n in sorted(snapshot.get("counters", {}).items())]
+    out += [f"# HELP {METRIC_PREFIX}_llm_tokens_total LLM tokens by engine and kind.", f"# TYPE {METRIC_PREFIX}_llm_tokens_total counter"]
+    out += [line("llm_tokens_total", t[k], engine=family, kind=k) for family, t in sorted(snapshot.get("tokens", {}).items()) for k in TOKEN_KINDS]
+    out += [f"# HELP {METRIC_PREFIX}_llm_requests_total Successful LLM requests by engine.", f"# TYPE {METRIC_PREFIX}_llm_requests_total counter"]
+    out += [line("llm_requests_total", t["requests"], engine=family) for family, t in sorted(snapshot.get("tokens", {}).items())]
+    out += [f"# HELP {METRIC_PREFIX}_llm_cost_usd Estimated LLM cost at list prices.", f"# TYPE {METRIC_PREFIX}_llm_cost_usd gauge"]
+    out += [line("llm_cost_usd", t["cost_usd"], engine=family) for family, t in sorted(snapshot.get("tokens", {}).items())]
+    out += [f"# HELP {METRIC_PREFIX}_duration_seconds Wall time of the scan.", f"# TYPE {METRIC_PREFIX}_duration_seconds gauge",
+            line("duration_seconds", snapshot.get("elapsed_s", 0.0))]
+    return "\n".join(out) + "\n"
@@ -0,0 +1,76 @@
+import os
+import tempfile
+from datetime import datetime
+
+os.environ.setdefault("RECRUITER_CACHE_DIR", tempfile.mkdtemp(prefix="recruiter-test-"))
+from candidate_index import CandidateIndex
+
+# Tests for the candidate index: upserts, search and Supabase sync.
+
+def candidate(blob, name, skills, score, experience="N/A", received=None, **extra):
+    return {"Blob": blob, "Name": name, "Skills": skills, "Match %": score, "Experience": experience, "Received": received, "Filename": f"{name}.pdf", **extra}
+
+def test_upsert_keeps_one_row_per_file_and_search_filters(tmp_path):
+    index = CandidateIndex(str(tmp_path / "candidates.db"))
+    index.upsert("hr", [(candidate("a1", "Ada", "C++, Rust", 60, "8 Years", datetime(2026, 3, 1)), "Systems work in C++ and Rust"),
+                        (candidate("b2", "Bob", "Python", 90, "2 Years", datetime(2026, 5, 1), Profile={"skills": ["Python"]}), "Django services"),
+                        (candidate("c3", "Cy", "C#", 75), "Unity games")])
+    # A rescan of the same file updates its row, here with a better score
+    index.upsert("hr", [(candidate("a1", "Ada", "C++, Rust", 95, "8 Years", datetime(2026, 3, 1)), "Systems work in C++ and Rust")])
+    index.upsert("other", [(candidate("a1", "Ada", "C++", 10), "")])
+    assert index.count("hr") == 3 and index.count("other") == 1
+    assert [c["Name"] for c in index.search("hr")] == ["Ada", "Bob", "Cy"]
+    assert [c["Name"] for c in index.search("hr", ["c++"])] == ["Ada"] and [c["Name"] for c in index.search("hr", ["c#"])] == ["Cy"]
+    assert [c["Name"] for c in index.search("hr", ["django", "python"])] == ["Bob"] and index.search("hr", ["rust", "python"]) == []
+    # FTS syntax typed into the search box is taken literally
+    assert index.search("hr", ['rust" OR "python']) == [] and index.search("hr", ["NEAR(x"]) == []
+    assert [c["Name"] for c in index.search("hr", min_years=5)] == ["Ada"] and [c["Name"] for c in index.search("hr", min_score=80)] == ["Ada", "Bob"]
+    assert [c["Name"] for c in index.search("hr", since=datetime(2026, 4, 1), until=datetime(2026, 6, 1))] == ["Bob"]
+    bob = index.search("hr", ["django"])[0]
+    assert bob["Received"] == datetime(2026, 5, 1) and bob["Profile"] == {"skills": ["Python"]} and bob["Duplicates"] == []
+    index.remove("hr", ["b2"])
+    assert index.search("hr", ["django"]) == []
+
+def test_search_falls_back_to_like_without_fts(tmp_path):
+    index = CandidateIndex(str(tmp_path / "candidates.db"))
+    index.fts = False
+    index.upsert("hr", [(candidate("a1", "Ada", "Rust", 60), "Kubernetes operator"), (candidate("b2", "Bob", "Python", 90), "Django")])
+    assert [c["Name"] for c in index.search("hr", ["kubernetes"])] == ["Ada"] and [c["Name"] for c in index.search("hr", ["bob"])] == ["Bob"]
+
+class Remote:
+    # Records Supabase upserts; `during` runs while a push is in flight
+    def __init__(self, during=None):
+        self.pushed, self.during = [], during
+    def table(self, name):
+        assert name == "candidates"
+        return self
+    def upsert(self, payload, on_conflict):
+        assert on_conflict == "owner,hash"
+        self.pushed.append(payload)
+        if self.during: self.during(); self.during = None
+        return self
+    def execute(self): pass
+
+def test_sync_pushes_changed_rows_once_without_resume_text(tmp_path):
+    index = CandidateIndex(str(tmp_path / "candidates.db"))
+    index.upsert("hr", [(candidate(f"h{i}", f"C{i}", "Go", i, Duplicates=["old.pdf"]), "secret text") for i in range(3)])
+    rescan = lambda: index.upsert("hr", [(candidate("h0", "C0", "Go, Rust", 50), "secret text")])
+    remote = Remote(during=rescan)
+    # The row rescanned mid-push goes out again, with its new data, in the next round
+    assert index.sync(remote, "hr") == 4
+    first, second = remote.pushed
+    assert sorted(r["hash"] for r in first) == ["h0", "h1", "h2"] and "text" not in first[0] and first[0]["duplicates"] == ["old.pdf"]
+    assert [(r["hash"], r["skills"]) for r in second] == [("h0", "Go, Rust")]
+    assert index.sync(Remote(), "hr") == 0
+
+def test_index_writer_batches_and_drops_replaced_files(tmp_path):
+    index = CandidateIndex(str(tmp_path / "candidates.db"))
+    writer = index.writer("hr", "Backend Engineer")
+    writer.add(candidate("a1", "Ada", "Go", 50), "first copy")
+    writer.flush()
+    # A newer copy of the same resume replaces the row stored under the old file
+    writer.drop("a1")
+    writer.add(candidate("a2", "Ada", "Go", 50, Duplicates=["Ada-old.pdf"]), "second copy")
+    assert index.count("hr") == 1
+    writer.flush()
+    assert [(c["Blob"], c["Duplicates"]) for c in index.search("hr")] == [("a2", ["Ada-old.pdf"])]
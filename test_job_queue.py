@@ -0,0 +1,53 @@
+import os
+import json
+import tempfile
+
+os.environ.setdefault("RECRUITER_CACHE_DIR", tempfile.mkdtemp(prefix="recruiter-test-"))
+from job_queue import JOB_STALE_AFTER, ScanJobs
+
+# Tests for the scan queue: claiming, credentials and stale jobs.
+
+# --- JOB QUEUE ---
+PASSWORD = "hunter2-typed-in-the-dashboard"
+
+def test_claim_strips_credentials_from_the_queue_and_its_files(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    jobs = ScanJobs(path)
+    params = {"user": "hr@example.com", "password": PASSWORD, "mailboxes": [{"user": "b@example.com", "password": PASSWORD}]}
+    job_id = jobs.enqueue("multi", params)
+    job = jobs.claim("w1")
+    # The worker that claims the job gets the credentials; the queue keeps none of them
+    assert job == {"id": job_id, "provider": "multi", "params": params}
+    stored = json.loads(jobs.db.execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()[0])
+    assert stored == {"user": "hr@example.com", "mailboxes": [{"user": "b@example.com"}]}
+    for name in (path, path + "-wal"):
+        if os.path.exists(name):
+            with open(name, "rb") as f: assert PASSWORD.encode() not in f.read()
+
+def test_a_stale_running_job_is_handed_to_another_worker(tmp_path):
+    jobs = ScanJobs(str(tmp_path / "jobs.db"))
+    scan, watch = jobs.enqueue("gmail", {"user": "a"}), jobs.enqueue("gmail", {"user": "b", "watch": True})
+    assert jobs.claim("w1")["id"] == scan and jobs.claim("w1")["id"] == watch
+    for job_id in (scan, watch): jobs.report(job_id, candidates=[{"Name": "Ada"}])
+    assert jobs.claim("w2") is None
+    # Jobs whose worker has not reported for JOB_STALE_AFTER are handed out again
+    jobs.db.execute("UPDATE jobs SET updated = updated - ?", (JOB_STALE_AFTER + 1,))
+    assert jobs.claim("w2")["id"] == scan and jobs.claim("w2")["id"] == watch
+    assert jobs.get(scan)["worker"] == "w2"
+    # A scan starts over; a watch keeps what its last worker found
+    assert jobs.results(scan) == [] and jobs.results(watch) == [{"Name": "Ada"}]
+
+def test_a_stopping_watch_whose_worker_died_is_closed(tmp_path):
+    jobs = ScanJobs(str(tmp_path / "jobs.db"))
+    job_id = jobs.enqueue("gmail", {"user": "a", "watch": True})
+    jobs.claim("w1")
+    assert jobs.stop(job_id) and not jobs.stop(job_id)
+    jobs.db.execute("UPDATE jobs SET updated = updated - ?", (JOB_STALE_AFTER + 1,))
+    assert jobs.claim("w2") is None
+    assert jobs.get(job_id)["status"] == "done" and jobs.get(job_id)["message"] == "Watch stopped"
+
+def test_a_started_job_cannot_be_claimed_by_a_worker(tmp_path):
+    jobs = ScanJobs(str(tmp_path / "jobs.db"))
+    job = jobs.start("gmail", {"user": "a", "password": PASSWORD}, "cli")
+    assert job["params"]["password"] == PASSWORD and jobs.get(job["id"])["status"] == "running"
+    assert jobs.claim("w1") is None and jobs.claim("w1", job["id"]) is None
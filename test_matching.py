@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+os.environ.setdefault("RECRUITER_CACHE_DIR", tempfile.mkdtemp(prefix="recruiter-test-"))
+from matching import RoleMatcher, parse_roles
+from offline_extract import get_offline_extractor
+
+# Tests for JD parsing and role matching over extracted profiles.
+
+# --- JD MATCHING ---
+def test_parse_roles_splits_on_dash_lines_and_names_duplicates():
+    jd = "Backend Engineer\nPython, Django\n---\nData Engineer\nSpark\n-----\nBackend Engineer\nGo\n---\n"
+    assert parse_roles(jd) == [("Backend Engineer", "Backend Engineer\nPython, Django"), ("Data Engineer", "Data Engineer\nSpark"),
+                               ("Backend Engineer (2)", "Backend Engineer\nGo")]
+    assert parse_roles("  \n") == []
+
+def test_role_matcher_scores_each_role_and_picks_the_best():
+    matcher = RoleMatcher("Backend Engineer\n5+ years of Python, Django and PostgreSQL\n---\nData Engineer\nSpark and Airflow, 3 years")
+    backend = {"Profile": {"skills": ["Python", "Django", "PostgreSQL"], "titles": ["Backend Engineer"], "years": 6.0, "terms": []}}
+    data = {"Profile": {"skills": ["Apache Spark", "Apache Airflow"], "titles": [], "years": 1.5, "terms": []}}
+    backend, data = matcher.apply([backend, data])
+    assert backend["Role"] == "Backend Engineer" and backend["Match %"] == 100
+    assert data["Role"] == "Data Engineer" and data["Matches"]["Data Engineer"] > data["Matches"]["Backend Engineer"]
+    assert RoleMatcher("Backend Engineer\nPython").apply([dict(backend)])[0].get("Role") is None
+
+def test_jd_words_outside_the_taxonomy_count_alongside_its_skills():
+    ex = get_offline_extractor()
+    with_tools = ex.extract("Data Engineer\nBuilt ETL jobs in Informatica and MuleSoft for five years")
+    without = ex.extract("Data Engineer\nBuilt ETL jobs in Python and Airflow for five years")
+    with_tools, without = RoleMatcher("ETL Developer\nInformatica, MuleSoft").apply([with_tools, without])
+    assert with_tools["Match %"] == 100 and without["Match %"] < with_tools["Match %"]
+    # A JD with no taxonomy skills at all ranks on its keywords
+    assert RoleMatcher("Informatica MuleSoft").scores([with_tools["Profile"], without["Profile"]]).tolist() == [[100, 0]]
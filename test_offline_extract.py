@@ -0,0 +1,43 @@
+import os
+import tempfile
+from datetime import datetime
+
+os.environ.setdefault("RECRUITER_CACHE_DIR", tempfile.mkdtemp(prefix="recruiter-test-"))
+from offline_extract import get_offline_extractor
+
+# Tests for the offline extractor and its taxonomy matcher.
+
+RESUME = """Jane Doe
+jane.doe@example.com | +1 (415) 555-0134
+Senior Backend Engineer
+7+ years building services in Python, Django and Postgres. Ran Kubernetes on AWS.
+Built Informatica and MuleSoft pipelines.
+"""
+
+def test_extract_reads_contacts_years_and_taxonomy_names():
+    meta = get_offline_extractor().extract(RESUME)
+    assert (meta["Name"], meta["Email"], meta["Phone"], meta["Experience"]) == ("Jane Doe", "jane.doe@example.com", "+1 (415) 555-0134", "7 Years")
+    profile = meta["Profile"]
+    # Aliases map onto taxonomy names, and a sentence's closing dot does not hide a skill
+    assert profile["skills"] == ["AWS", "Django", "Kubernetes", "PostgreSQL", "Python"]
+    assert profile["titles"] == ["Backend Engineer"] and profile["years"] == 7.0
+    assert {"informatica", "mulesoft", "aws"} <= set(profile["terms"]) and not {"and", "in", "7"} & set(profile["terms"])
+
+def test_terms_keep_every_keyword_most_frequent_first():
+    text = "kafka kafka kafka " + " ".join(f"tool{i}" for i in range(200))
+    terms = get_offline_extractor().features(text)[3]
+    assert len(terms) == 201 and terms[0] == "kafka"
+
+def test_experience_falls_back_to_the_union_of_year_ranges():
+    ex = get_offline_extractor()
+    assert ex.experience("acme 2015 - 2018, globex 2017 to 2020") == 5.0
+    assert ex.experience("since 2019 - present") == float(datetime.now().year - 2019)
+    assert ex.experience("no dates here") is None
+
+def test_jd_profile_keeps_only_words_the_taxonomy_does_not_cover():
+    profile = get_offline_extractor().profile("ETL Developer\nInformatica, MuleSoft. 4 years required")
+    assert profile["skills"] == {"ETL"} and profile["titles"] == {"Data Engineer"} and profile["years"] == 4.0
+    assert profile["terms"] == {"informatica", "mulesoft"}
+
+def test_canonical_maps_listed_names_and_keeps_unknown_ones():
+    assert get_offline_extractor().canonical(["postgres", "k8s", "Informatica", "Postgres"], "skills") == ["PostgreSQL", "Kubernetes", "Informatica"]
@@ -0,0 +1,307 @@
+import os
+import re
+import json
+import time
+import socket
+import select
+import imaplib
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+import pytest
+
+os.environ.setdefault("RECRUITER_CACHE_DIR", tempfile.mkdtemp(prefix="recruiter-test-"))
+import scan_engine
+from scan_engine import (BlobStore, DuplicateIndex, ExtractionCache, RateLimiter, ScanProgress, WATCH_WAKE_SECONDS, drive_scan,
+                         extract_batch, find_attachment_parts, get_parse_pool, get_sync_state, imap_buffered, imap_fetch_items,
+                         imap_idle, imap_parse, merge_duplicate, plan_shards, run_sharded_scan, split_window, stream_scan,
+                         watch_gmail_inbox)
+from scan_metrics import ScanMetrics
+
+# Unit tests for the scan pipeline, run with python -m pytest. No network and no API keys: the mailbox,
+# the AI and the parse workers are replaced by in-process stand-ins where a test needs them.
+
+# --- RATE LIMITING ---
+class RateLimited(Exception):
+    def __init__(self, headers, message="429 Too Many Requests"):
+        super().__init__(message)
+        self.status_code = 429
+        self.response = type("Response", (), {"headers": headers})()
+
+def test_retry_after_sets_the_backoff():
+    limiter = RateLimiter(rpm=6000, burst=5)
+    assert limiter.penalize(RateLimited({"retry-after": "2"}), 0) == 2.0
+    assert limiter.penalize(RateLimited({"retry-after-ms": "1500"}), 0) == 1.5
+    assert 9 <= limiter.penalize(RateLimited({"retry-after": (datetime.now(timezone.utc) + timedelta(seconds=10)).strftime("%a, %d %b %Y %H:%M:%S GMT")}), 0) <= 10
+    assert limiter.penalize(RateLimited({}, "429 retry_delay { seconds: 7 }"), 0) == 7.0
+    assert limiter.penalize(RateLimited({}), 1) == 8.0
+
+def test_acquire_waits_out_the_backoff():
+    limiter = RateLimiter(rpm=6000, burst=5)
+    limiter.penalize(RateLimited({"retry-after-ms": "200"}), 0)
+    start = time.monotonic()
+    paced, backed_off = limiter.acquire()
+    assert time.monotonic() - start >= 0.19 and backed_off >= 0.19
+
+# --- EXTRACTION CACHE ---
+def test_cache_evicts_least_recently_used_over_budget(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ExtractionCache(path)
+    meta = {"Name": "x" * 100}
+    size = len(json.dumps(meta))
+    for key in ("a", "b", "c"):
+        cache.put(key, meta)
+        time.sleep(0.01)
+    assert cache.get("a") == meta
+    cache.db.close()
+    cache = ExtractionCache(path, max_bytes=2 * size)
+    assert cache.evictions == 1
+    assert cache.get("b") is None and cache.get("a") == meta and cache.get("c") == meta
+
+def test_cache_drops_entries_past_max_age(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ExtractionCache(path).put("a", {"Name": "x"})
+    assert ExtractionCache(path, max_age_days=0).get("a") is None
+
+# --- IMAP ---
+PDF = b'("application" "pdf" ("name" "cv.pdf") NIL NIL "base64" 1200 NIL ("attachment" ("filename" "cv.pdf")) NIL NIL)'
+TEXT = b'("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 20 1 NIL NIL NIL NIL)'
+
+def fetch_response(uid, structure, date="Mon, 05 Oct 2026 09:30:00 +0000"):
+    # What imaplib returns for UID FETCH (UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (DATE)])
+    header = f"Date: {date}\r\n\r\n".encode()
+    return [(b"1 (UID %d BODYSTRUCTURE %s BODY[HEADER.FIELDS (DATE)] {%d}" % (uid, structure, len(header)), header), b")"]
+
+def test_imap_parse_handles_nil_quoted_strings_and_literals():
+    assert imap_parse(b'(NIL "a \\"b\\"" {3}\r\nx y ATOM[1.2])') == [[None, b'a "b"', b"x y", b"ATOM[1.2]"]]
+
+def test_bodystructure_finds_attachments_by_section():
+    docx = b'("application" "vnd.openxmlformats-officedocument.wordprocessingml.document" NIL NIL NIL "base64" 900 NIL ("attachment" ("filename" "cv.docx")) NIL NIL)'
+    image = b'("image" "png" NIL NIL NIL "base64" 50 NIL ("inline" ("filename" "logo.png")) NIL NIL)'
+    structure = b"(" + TEXT + PDF + b"(" + image + docx + b' "related" NIL NIL NIL) "mixed" NIL NIL NIL)'
+    [item] = imap_fetch_items(fetch_response(7, structure))
+    assert item[b"UID"] == b"7"
+    assert item[b"BODY[HEADER.FIELDS (DATE)]"].startswith(b"Date: Mon, 05 Oct 2026")
+    assert find_attachment_parts(item[b"BODYSTRUCTURE"]) == [("2", "cv.pdf", "base64"), ("3.2", "cv.docx", "base64")]
+
+def test_bodystructure_single_part_and_forwarded_message():
+    [single] = imap_fetch_items(fetch_response(1, PDF))
+    assert find_attachment_parts(single[b"BODYSTRUCTURE"]) == [("1", "cv.pdf", "base64")]
+    inner = b"(" + TEXT + PDF + b' "mixed" NIL NIL NIL)'
+    forwarded = b'("message" "rfc822" NIL NIL NIL "7bit" 3000 NIL ' + inner + b" 60 NIL NIL NIL NIL)"
+    [item] = imap_fetch_items(fetch_response(2, b"(" + TEXT + forwarded + b' "mixed" NIL NIL NIL)'))
+    assert find_attachment_parts(item[b"BODYSTRUCTURE"]) == [("2.2", "cv.pdf", "base64")]
+
+def test_rfc2231_filenames():
+    encoded = b"(\"application\" \"pdf\" NIL NIL NIL \"base64\" 10 NIL (\"attachment\" (\"filename*\" \"utf-8''R%C3%A9sum%C3%A9%20Jos%C3%A9.pdf\")) NIL NIL)"
+    continued = b'("application" "pdf" NIL NIL NIL "base64" 10 NIL ("attachment" ("filename*1" "_cv.pdf" "filename*0" "very_long_name")) NIL NIL)'
+    continued_encoded = b"(\"application\" \"pdf\" NIL NIL NIL \"base64\" 10 NIL (\"attachment\" (\"filename*0*\" \"utf-8''%C3%89ric\" \"filename*1*\" \"%20CV.pdf\")) NIL NIL)"
+    by_name = b'("application" "pdf" ("name" "=?utf-8?q?Fran=C3=A7ois.pdf?=") NIL NIL "base64" 10 NIL ("attachment" NIL) NIL NIL)'
+    structure = b"(" + encoded + continued + continued_encoded + by_name + b' "mixed" NIL NIL NIL)'
+    parts = find_attachment_parts(imap_parse(structure)[0])
+    assert [name for _, name, _ in parts] == ["Résumé José.pdf", "very_long_name_cv.pdf", "Éric CV.pdf", "François.pdf"]
+
+# --- PARSE POOL ---
+def parse_or_crash(file_bytes, filename):
+    if filename == "crash.pdf": os._exit(1)
+    return file_bytes.decode()
+
+def test_a_crashing_file_does_not_take_the_other_resumes_with_it(monkeypatch, tmp_path):
+    get_parse_pool().shutdown()
+    get_parse_pool.clear()
+    # Pool workers are forked after the patch, so they crash on the one file too
+    monkeypatch.setattr(scan_engine, "read_file_content", parse_or_crash)
+    names = [f"good{i}.pdf" for i in range(6)] + ["crash.pdf"] + [f"good{i}.pdf" for i in range(6, 11)]
+    def source(emit):
+        for name in names: yield name, " ".join(f"{name}-word{j}" for j in range(40)).encode(), None
+    metrics = ScanMetrics()
+    events = list(stream_scan(source, "Engineer\nPython", None, "OpenAI", store=BlobStore(str(tmp_path)), metrics=metrics))
+    assert not [e for e in events if e[0] == "error"]
+    assert sorted(e[1]["Filename"] for e in events if e[0] == "candidate") == sorted(n for n in names if n != "crash.pdf")
+    assert metrics.counters["unreadable_documents"] == 1
+    get_parse_pool().shutdown()
+    get_parse_pool.clear()
+
+# --- BATCHED EXTRACTION ---
+def test_extract_batch_splits_unparseable_batches_and_retries_skipped(monkeypatch):
+    calls = []
+    def fake_llm(prompt, key, ai_engine, prefix=None, **kwargs):
+        batch = re.findall(r'<resume id="(R\d+)">\n(\w+)', prompt)
+        calls.append(len(batch) or 1)
+        if not batch: return json.dumps({"Name": re.search(r"Resume Text: (\w+)", prompt).group(1)})
+        if len(batch) > 2: return "Sorry, here are the profiles: {"
+        # Pairs come back without their second entry
+        return json.dumps({"results": [{"id": batch[0][0], "Name": batch[0][1]}]})
+    monkeypatch.setattr(scan_engine, "call_llm", fake_llm)
+    names = ["ada", "bob", "cy", "dee", "eve"]
+    assert [meta["Name"] for meta in extract_batch(names, "sk-test", "OpenAI")] == names
+    # 5 fails, 2 + 3 split, 3 fails into 1 + 2, then each pair's skipped entry alone
+    assert calls == [5, 2, 1, 3, 1, 2, 1]
+
+# --- DUPLICATES ---
+RESUME = ("Jane Doe senior backend engineer with ten years of Python Django PostgreSQL and AWS experience "
+          "leading payments platform teams at Acme and Globex building event driven services on Kubernetes "
+          "mentoring engineers and owning on call for high traffic APIs across three regions")
+
+def test_minhash_groups_near_copies_and_keeps_distinct_resumes_apart():
+    index = DuplicateIndex()
+    assert index.add("a" * 64, RESUME) == (0, True)
+    assert index.add("a" * 64, RESUME) == (0, False)
+    # The DOCX twin of the same CV: same words, different whitespace and one extra line
+    assert index.add("b" * 64, RESUME.upper().replace(" ", "\n") + " references available") == (0, False)
+    other = "John Smith data scientist with five years of R Spark and Airflow experience building forecasting models for retail chains"
+    assert index.add("c" * 64, other) == (1, True)
+
+def test_merge_duplicate_keeps_the_newest_file():
+    now = datetime.now()
+    keep = {"Filename": "old.pdf", "Blob": "1", "Received": now - timedelta(days=3), "Duplicates": [], "Candidate": {"Name": "Jane"}}
+    merge_duplicate(keep, {"Filename": "new.docx", "Blob": "2", "Received": now})
+    merge_duplicate(keep, {"Filename": "older.pdf", "Blob": "3", "Received": now - timedelta(days=9)})
+    assert (keep["Filename"], keep["Blob"], keep["Duplicates"]) == ("new.docx", "2", ["old.pdf", "older.pdf"])
+    assert keep["Candidate"]["Filename"] == "new.docx" and keep["Candidate"]["Duplicates"] == ["old.pdf", "older.pdf"]
+
+# --- SHARDED SCANS ---
+BENCHMARKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+
+def test_split_window_covers_the_range_newest_slice_first():
+    start, end = datetime(2026, 1, 1), datetime(2026, 1, 17, 12)
+    slices = split_window(start, end, 7)
+    assert [lo.day for lo, _ in slices] == [15, 8, 1] and slices[0][1] == end and slices[-1][0] == start
+    # Back to back with no overlap and no gap
+    assert all(older[1] + timedelta(microseconds=1) == newer[0] for newer, older in zip(slices, slices[1:]))
+    assert split_window(start, end, 0) == [(start, end)] and split_window(start, start, 7) == [(start, start)]
+
+def test_plan_shards_splits_every_mailbox_and_folder_by_slice():
+    boxes = [{"provider": "gmail", "user": "a@example.com", "password": "pw", "folders": ["INBOX", "Jobs"]},
+             {"provider": "outlook", "account": None, "resource": "hr@example.com"}]
+    shards = plan_shards(boxes, datetime(2026, 1, 1), datetime(2026, 1, 10), days=7)
+    assert len(shards) == 6
+    assert [s["label"] for s in shards[:3]] == ["a@example.com/INBOX 2026-01-08..2026-01-10", "a@example.com/Jobs 2026-01-08..2026-01-10",
+                                                "hr@example.com/Inbox 2026-01-08..2026-01-10"]
+    assert shards[2]["folder"] is None and shards[0]["password"] == "pw"
+
+@pytest.fixture
+def inbox(monkeypatch):
+    monkeypatch.syspath_prepend(BENCHMARKS)
+    import corpus, fakes
+    box = corpus.mailbox(40, 7)
+    imap, graph = fakes.mailbox_servers(box)
+    connect = lambda host=None: imaplib.IMAP4("127.0.0.1", imap.server_address[1])
+    monkeypatch.setattr(imaplib, "IMAP4_SSL", connect)
+    yield box, connect, lambda: fakes.deliver(box, 7)
+    imap.shutdown(); graph.shutdown()
+
+WINDOW = timedelta(days=30)
+
+def sharded_scan(tmp_path, end):
+    # The stand-in's mail spans the last 28 days, so a 30-day window in 7-day shards sees all of it
+    events = list(run_sharded_scan([{"provider": "gmail", "user": "a@example.com", "password": "pw"}], end - WINDOW, end, "Backend Engineer\nPython",
+                                   None, "OpenAI", store=BlobStore(str(tmp_path)), shard_days=7))
+    return events, max([e[2] for e in events if e[:2] == ("progress", "Fetch")], default=0)
+
+def attachments_in(box, lo, hi):
+    return sum(len(m["attachments"]) for m in box if lo <= m["date"] <= hi)
+
+def test_sharded_scan_fetches_each_message_once_and_retries_a_failed_shard(inbox, monkeypatch, tmp_path):
+    box, connect, deliver = inbox
+    plan, failures = scan_engine.plan_imap_attachments, []
+    def flaky(mail, uids, start_dt, end_dt):
+        if not failures:
+            failures.append(start_dt)
+            raise imaplib.IMAP4.abort("connection reset")
+        return plan(mail, uids, start_dt, end_dt)
+    monkeypatch.setattr(scan_engine, "plan_imap_attachments", flaky)
+    end = datetime.now()
+    events, fetched = sharded_scan(tmp_path, end)
+    # Searches are padded a day either side, so neighbouring slices see the same messages
+    assert fetched == attachments_in(box, end - WINDOW, end) > 0
+    assert [e[3] for e in events if e[0] == "shard" and e[2] == "retrying"] == [0]
+    assert events[-1] == ("status", "Success")
+
+def test_a_failing_shard_is_reported_without_stopping_the_rest(inbox, monkeypatch, tmp_path):
+    box, connect, deliver = inbox
+    end, plan = datetime.now(), scan_engine.plan_imap_attachments
+    slices = split_window(end - WINDOW, end, 7)
+    def broken(mail, uids, start_dt, end_dt):
+        if end_dt == end: raise imaplib.IMAP4.abort("connection reset")
+        return plan(mail, uids, start_dt, end_dt)
+    monkeypatch.setattr(scan_engine, "plan_imap_attachments", broken)
+    events, fetched = sharded_scan(tmp_path, end)
+    assert fetched == attachments_in(box, slices[-1][0], slices[1][1])
+    assert [e[1] for e in events if e[0] == "shard" and e[2] == "failed"] == [f"a@example.com/INBOX {slices[0][0]:%Y-%m-%d}..{slices[0][1]:%Y-%m-%d}"]
+    assert events[-1][1].startswith(f"Finished with 1 of {len(slices)} shards failed: a@example.com/INBOX")
+
+# --- WATCHING ---
+class Wire:
+    # The two attributes imap_buffered reads off an imaplib connection
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.file = self.sock.makefile("rb")
+
+def test_imap_buffered_sees_lines_the_socket_no_longer_reports():
+    wire = Wire()
+    wire.peer.sendall(b"+ idling\r\n* 3 EXISTS\r\n")
+    assert wire.file.readline() == b"+ idling\r\n"
+    assert imap_buffered(wire) and not select.select([wire.sock], [], [], 0)[0]
+    assert wire.file.readline() == b"* 3 EXISTS\r\n"
+    assert not imap_buffered(wire) and wire.sock.gettimeout() is None
+
+def test_imap_idle_returns_on_new_mail_timeout_or_halt(inbox):
+    box, connect, deliver = inbox
+    mail, halt = connect(), threading.Event()
+    mail.login("idle@example.com", "secret")
+    mail.select("INBOX")
+    threading.Timer(0.3, deliver).start()
+    assert imap_idle(mail, 10, halt)
+    assert not imap_idle(mail, 0.2, halt)
+    # Mail that arrived in between comes in the same packet as the continuation
+    deliver()
+    start = time.monotonic()
+    assert imap_idle(mail, 10, halt) and time.monotonic() - start < WATCH_WAKE_SECONDS
+    halt.set()
+    assert not imap_idle(mail, 10, halt)
+    assert mail.uid("SEARCH", None, "ALL")[0] == "OK"
+    mail.logout()
+
+class WatchProgress(ScanProgress):
+    def __init__(self, sync_key):
+        self.sync_key, self.ready, self.errors, self.marks = sync_key, threading.Event(), [], []
+    def on_progress(self, stage, done, total):
+        if stage == "Inbox checks": self.ready.set()
+    def on_candidate(self, candidate): self.marks.append(get_sync_state().get(self.sync_key)["last_uid"])
+    def on_error(self, message): self.errors.append(message)
+
+def watch(user, progress, key=None):
+    stop = threading.Event()
+    events = watch_gmail_inbox(user, "secret", "Backend Engineer\nPython", key, "OpenAI", stop=stop)
+    thread = threading.Thread(target=drive_scan, args=(events, progress), daemon=True)
+    thread.start()
+    assert progress.ready.wait(10)
+    return stop, thread
+
+def wait_for(check, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not check() and time.monotonic() < deadline: time.sleep(0.02)
+    return check()
+
+def test_watch_moves_its_mark_only_after_a_resume_is_scored(inbox):
+    box, connect, deliver = inbox
+    progress = WatchProgress("gmail:scored@example.com:INBOX")
+    stop, thread = watch("scored@example.com", progress)
+    before = get_sync_state().get(progress.sync_key)["last_uid"]
+    uid = deliver()["uid"]
+    assert wait_for(lambda: get_sync_state().get(progress.sync_key)["last_uid"] == uid)
+    stop.set(); thread.join(10)
+    assert progress.marks and set(progress.marks) == {before} and not progress.errors
+
+def test_watch_keeps_its_mark_when_a_resume_is_never_scored(inbox, monkeypatch):
+    def unreachable(*args, **kwargs): raise RuntimeError("AI unreachable")
+    monkeypatch.setattr(scan_engine, "extract_batch", unreachable)
+    box, connect, deliver = inbox
+    progress = WatchProgress("gmail:lost@example.com:INBOX")
+    stop, thread = watch("lost@example.com", progress, key="sk-test")
+    before = get_sync_state().get(progress.sync_key)["last_uid"]
+    deliver()
+    assert wait_for(lambda: progress.errors)
+    stop.set(); thread.join(10)
+    assert get_sync_state().get(progress.sync_key)["last_uid"] == before
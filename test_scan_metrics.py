@@ -0,0 +1,27 @@
+import os
+import json
+import tempfile
+
+os.environ.setdefault("RECRUITER_CACHE_DIR", tempfile.mkdtemp(prefix="recruiter-test-"))
+from scan_metrics import ScanMetrics, to_json, to_prometheus
+
+# Tests for scan metrics and their JSON and Prometheus exports.
+
+def samples(text):
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+
+def test_prometheus_writes_counters_exactly_and_floats_in_full():
+    metrics = ScanMetrics()
+    metrics.count("attachment_bytes", 123456789)
+    metrics.observe("parse", 0.123456789)
+    metrics.add_usage("OpenAI", {"input": 12345678, "output": 7})
+    found = samples(to_prometheus(metrics.snapshot(), {"job": 'a"b'}))
+    assert found['recruiter_scan_events_total{job="a\\"b",event="attachment_bytes"}'] == "123456789"
+    assert found['recruiter_scan_llm_tokens_total{job="a\\"b",engine="OpenAI",kind="input"}'] == "12345678"
+    assert found['recruiter_scan_stage_seconds_count{job="a\\"b",stage="parse"}'] == "1"
+    assert float(found['recruiter_scan_stage_seconds_sum{job="a\\"b",stage="parse"}']) == 0.123456789
+    assert float(found['recruiter_scan_llm_cost_usd{job="a\\"b",engine="OpenAI"}']) == metrics.snapshot()["tokens"]["OpenAI"]["cost_usd"]
+
+def test_prometheus_reads_snapshots_loaded_back_from_json():
+    snapshot = json.loads(to_json(ScanMetrics().snapshot()))
+    assert samples(to_prometheus(snapshot))["recruiter_scan_duration_seconds"] == repr(snapshot["elapsed_s"])